@@ -2,6 +2,8 @@
 ASGI config for Quiz4 project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server, e.g. ``uvicorn Quiz4.asgi:application``, for
+the async views and the live count streams in posts/live.py.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -0,0 +1,286 @@
+"""
+Shared plumbing for the streaming bulk import/export management commands.
+
+Rows flow through generators end to end, so memory stays flat whatever
+the size of the file: the reader yields one record at a time, imports
+are inserted chunk by chunk in their own transactions and exports read
+the database through ``QuerySet.iterator()``.
+
+A record that cannot be read, such as a line of invalid JSON or a text
+column holding a number, is reported and skipped like any other invalid
+row; it never aborts the import.
+
+The checkpoint is written after each chunk commits, so a crash between
+the two makes ``--resume`` import that one chunk again. provision_users
+rejects the accounts it already created; after resuming a job or post
+import that died that way, look for duplicates of the last chunk.
+"""
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+FORMATS = ('csv', 'jsonl')
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    if path.endswith('.jsonl') or path.endswith('.ndjson'):
+        return 'jsonl'
+    return 'csv'
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def read_rows(stream, fmt):
+    """
+    Yields one dict per record of a CSV or JSON Lines stream, or an
+    InvalidRecord in place of a line that is not a JSON object.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield InvalidRecord(f'invalid JSON ({e.msg}).')
+                continue
+            yield record if isinstance(record, dict) else InvalidRecord('not a JSON object.')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class NullCheckpoint:
+    """Stands in for a checkpoint when the source cannot be resumed."""
+
+    def load(self):
+        return 0
+
+    def save(self, done):
+        pass
+
+    def clear(self):
+        pass
+
+
+class Checkpoint:
+    """Remembers how many source records have been committed."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def save(self, done):
+        # Write then rename so a crash never leaves a half-written file.
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(done))
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class BulkImportCommand(BaseCommand):
+    """
+    Base class for commands that stream a CSV/JSONL file into a model.
+
+    Subclasses set ``model`` and implement ``build_objects()``, which turns
+    a chunk of ``(record_number, row)`` pairs into unsaved instances and
+    calls ``report_error()`` for rows that fail validation. Records that
+    are not objects, or whose ``text_fields`` are not strings, are
+    reported before they reach it. Override ``save_objects()`` to write
+    more than one table per chunk; it runs inside the chunk's transaction.
+    """
+    model = None
+    text_fields = ('user_email',)
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="Path to a .csv or .jsonl file, or '-' for stdin.")
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--user', help='Email of the owner for rows without a user_email column.')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help=(
+                'Skip the records committed by a previous run of the same file. '
+                'If that run died right after a commit, its last chunk is imported again.'
+            ),
+        )
+        parser.add_argument('--checkpoint', help='Checkpoint file (defaults to <source>.checkpoint).')
+
+    def handle(self, *args, source, format, chunk_size, user, resume, checkpoint, **options):
+        self.verbosity = options['verbosity']
+        self.errors = 0
+        self.default_user_id = self.get_user_id(user) if user else None
+        fmt = detect_format(source, format)
+        if source == '-':
+            if resume:
+                raise CommandError('--resume needs a file source.')
+            checkpoint = NullCheckpoint()
+            self.run(sys.stdin, fmt, chunk_size, checkpoint, 0)
+            return
+
+        checkpoint = Checkpoint(checkpoint or f'{source}.checkpoint')
+        skip = checkpoint.load() if resume else 0
+        with open(source, newline='', encoding='utf-8') as stream:
+            self.run(stream, fmt, chunk_size, checkpoint, skip)
+        checkpoint.clear()
+
+    def run(self, stream, fmt, chunk_size, checkpoint, skip):
+        records = enumerate(read_rows(stream, fmt), start=1)
+        if skip:
+            self.stdout.write(f'Resuming after record {skip}.')
+            records = islice(records, skip, None)
+
+        done, created = skip, 0
+        started = time.monotonic()
+        for chunk in chunked(records, chunk_size):
+            objects = self.build_objects(self.readable(chunk))
+            with transaction.atomic():
+                self.save_objects(objects, chunk_size)
+            done = chunk[-1][0]
+            created += len(objects)
+            checkpoint.save(done)
+            if self.verbosity > 1:
+                self.stdout.write(f'{done} records read, {created} created, {self.rate(created, started)}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {created} {self.model._meta.verbose_name_plural} '
+            f'({self.errors} rows rejected) {self.rate(created, started)}.'
+        ))
+
+    def readable(self, chunk):
+        """The records of a chunk that build_objects() can safely inspect."""
+        records = []
+        for number, row in chunk:
+            if isinstance(row, InvalidRecord):
+                self.report_error(number, str(row))
+                continue
+            wrong = [name for name in self.text_fields if not isinstance(row.get(name), (str, type(None)))]
+            if wrong:
+                self.report_error(number, f'{", ".join(wrong)} must be text.')
+                continue
+            records.append((number, row))
+        return records
+
+    def build_objects(self, chunk):
+        raise NotImplementedError
+
+    def save_objects(self, objects, chunk_size):
+        self.model.objects.bulk_create(objects, batch_size=chunk_size)
+
+    def report_error(self, number, message):
+        self.errors += 1
+        self.stderr.write(f'Record {number}: {message}')
+
+    def get_user_id(self, email):
+        User = get_user_model()
+        try:
+            return User.objects.with_email(email.strip()).values_list('pk', flat=True).get()
+        except User.DoesNotExist:
+            raise CommandError(f'No user with email {email}.')
+
+    def resolve_users(self, chunk):
+        """Maps the lowercased user_email values of a chunk to user ids in one query."""
+        emails = {row['user_email'].strip() for _, row in chunk if row.get('user_email')}
+        users = get_user_model().objects.with_emails(emails).values_list('email_lower', 'pk')
+        return dict(users)
+
+    def user_id_for(self, row, users):
+        email = (row.get('user_email') or '').strip().lower()
+        if email:
+            return users.get(email)
+        return self.default_user_id
+
+    @staticmethod
+    def rate(count, started):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        return f'in {elapsed:.1f}s, {count / elapsed:.0f} rows/s'
+
+
+class BulkExportCommand(BaseCommand):
+    """
+    Base class for commands that stream a model out as CSV/JSONL.
+
+    Subclasses set ``fields`` and implement ``get_queryset()`` returning a
+    ``values_list()`` of those fields ordered by primary key, with the
+    primary key first.
+    """
+    fields = ()
+
+    def add_arguments(self, parser):
+        parser.add_argument('destination', nargs='?', default='-', help="Output path, or '-' for stdout.")
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument(
+            '--after-id', type=int, default=0,
+            help='Only export rows with a larger id, to resume an interrupted export.',
+        )
+
+    def handle(self, *args, destination, format, chunk_size, after_id, **options):
+        fmt = detect_format(destination, format)
+        queryset = self.get_queryset().filter(pk__gt=after_id)
+        if destination == '-':
+            self.export(self.stdout, fmt, queryset, chunk_size, header=True)
+            return
+        header = not (after_id and os.path.exists(destination))
+        with open(destination, 'a' if after_id else 'w', newline='', encoding='utf-8') as stream:
+            count, last_id, elapsed = self.export(stream, fmt, queryset, chunk_size, header)
+        self.stderr.write(
+            f'Exported {count} rows (last id {last_id}) in {elapsed:.1f}s, '
+            f'{count / max(elapsed, 1e-9):.0f} rows/s.'
+        )
+
+    def export(self, stream, fmt, queryset, chunk_size, header):
+        started = time.monotonic()
+        count, last_id = 0, None
+        if fmt == 'csv':
+            writer = csv.writer(stream)
+            if header:
+                writer.writerow(self.fields)
+            write = writer.writerow
+        else:
+            def write(values):
+                stream.write(json.dumps(dict(zip(self.fields, values)), default=str) + '\n')
+
+        try:
+            for values in queryset.iterator(chunk_size=chunk_size):
+                write(self.format_row(values))
+                count += 1
+                last_id = values[0]
+        except BaseException:
+            if last_id is not None:
+                self.stderr.write(f'Export stopped; rerun with --after-id {last_id} to continue.')
+            raise
+        return count, last_id, time.monotonic() - started
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def format_row(self, values):
+        return values
@@ -0,0 +1,141 @@
+"""
+Primary/replica database routing.
+
+Writes always go to ``default``. Reads go to a replica from
+``settings.DATABASE_REPLICAS`` only inside views marked with
+``@replica_reads`` (the feed and the job pages), and only while the
+visitor is not pinned: once a request writes, that browser reads from
+the primary for ``DATABASE_STICKY_SECONDS`` so people always see their
+own changes even if the replicas lag behind.
+"""
+import contextvars
+import random
+import time
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'db_primary'
+
+
+@dataclass
+class RoutingState:
+    replica: str | None = None
+    replica_ok: bool = False
+    pinned: bool = False
+    wrote: bool = False
+
+
+_state = contextvars.ContextVar('db_routing_state', default=None)
+
+
+def replica_reads(view):
+    """Lets ``view`` read from a replica; works like ``csrf_exempt``."""
+    view.replica_reads = True
+    return view
+
+
+def _allows_replica(view_func):
+    view_class = getattr(view_func, 'view_class', None)
+    return getattr(view_func, 'replica_reads', False) or getattr(view_class, 'replica_reads', False)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None or state.replica is None or not state.replica_ok
+            or state.pinned or state.wrote
+            # Reads inside a transaction must see its own writes.
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas are copies of the primary and are never migrated directly.
+        return db == DEFAULT_DB_ALIAS
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Tracks one request's routing state and pins visitors who wrote.
+
+    The pin is a signed cookie that expires after DATABASE_STICKY_SECONDS,
+    so setting it costs no session save. Without replicas there is nothing
+    to route or pin, and requests pass straight through.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Django would run a sync process_view in a thread.
+            self.process_view = self.aprocess_view
+
+    def _start(self, request):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas:
+            return None
+        sticky = getattr(settings, 'DATABASE_STICKY_SECONDS', 5)
+        return RoutingState(
+            # One replica per request keeps its reads consistent with each other.
+            replica=random.choice(replicas),
+            pinned=request.get_signed_cookie(PIN_COOKIE, None, salt=PIN_COOKIE, max_age=sticky) is not None,
+        )
+
+    def _finish(self, state, response):
+        if state is not None and state.wrote:
+            response.set_signed_cookie(
+                PIN_COOKIE, '1', salt=PIN_COOKIE, max_age=getattr(settings, 'DATABASE_STICKY_SECONDS', 5),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self._start(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._finish(state, response)
+
+    async def __acall__(self, request):
+        state = self._start(request)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._finish(state, response)
+
+    def _allow_replica(self, request, view_func):
+        state = _state.get()
+        if state is not None and request.method in ('GET', 'HEAD') and _allows_replica(view_func):
+            state.replica_ok = True
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self._allow_replica(request, view_func)
+        return None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        # Not process_view(), which is this method in async mode.
+        self._allow_replica(request, view_func)
+        return None
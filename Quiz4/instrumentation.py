@@ -0,0 +1,278 @@
+"""
+Per-request SQL and timing metrics.
+
+``RequestMetricsMiddleware`` records every query a request runs (on every
+database alias), along with the time spent rendering templates, and
+reports it three ways:
+
+* a ``Server-Timing`` header, which browsers show in their network panel;
+* a JSON log line on the ``Quiz4.requests`` logger for a sample of
+  requests (``METRICS_SAMPLE_RATE``);
+* a warning with the repeated queries and the code that ran them for
+  requests slower than ``METRICS_SLOW_REQUEST_MS``.
+
+Every connection gets one execute wrapper when it opens. It records into
+the metrics held in a context variable, which follows a request into the
+threads that ``sync_to_async`` runs the ORM in, so async views are
+measured too; with no metrics active it only calls through. The code
+that ran a query is looked up only for SQL seen before in the request,
+as repeated queries are the only ones reported with call sites, and only
+for requests whose slow-request log would be sampled.
+
+Tests can put the same recorder around any block with ``max_queries()``.
+"""
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger('Quiz4.requests')
+
+_PROJECT_ROOT = str(settings.BASE_DIR) + os.sep
+_THIS_FILE = os.path.abspath(__file__)
+
+# The metrics recording right now, innermost last: max_queries() around a
+# test client request sees the queries the request's own metrics see.
+_current = contextvars.ContextVar('request_metrics', default=())
+
+
+def _call_site():
+    """
+    Where the current query comes from: the innermost project frame, e.g.
+    ``posts/views.py:70 in get``, or the template line for queries run
+    lazily while rendering, e.g. ``posts/post_detail.html line 12``.
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin, token = getattr(node, 'origin', None), getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                return f'{origin.template_name} line {token.lineno}'
+        filename = code.co_filename
+        if (
+            filename.startswith(_PROJECT_ROOT) and filename != _THIS_FILE
+            and 'site-packages' not in filename
+        ):
+            return f'{filename[len(_PROJECT_ROOT):]}:{frame.f_lineno} in {code.co_name}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+def _record(execute, sql, params, many, context):
+    active = _current.get()
+    if not active:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        alias = context['connection'].alias
+        for metrics in active:
+            metrics.add(alias, sql, duration)
+
+
+def install_recorder(connection, **kwargs):
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+connection_created.connect(install_recorder)
+
+
+class RequestMetrics:
+    def __init__(self, call_sites=True):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.seen = set()
+        self.call_sites = call_sites
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+    def add(self, alias, sql, duration):
+        self.db_time += duration
+        call_site = None
+        if sql in self.seen:
+            if self.call_sites:
+                call_site = _call_site()
+        else:
+            self.seen.add(sql)
+        self.queries.append((alias, sql, duration, call_site))
+
+    @contextmanager
+    def recording(self):
+        # Connections opened before this module was imported have no recorder yet.
+        for connection in connections.all():
+            install_recorder(connection)
+        token = _current.set((*_current.get(), self))
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def repeated_queries(self):
+        """Queries whose SQL ran more than once (usually an N+1), most frequent first."""
+        groups = defaultdict(list)
+        for alias, sql, duration, call_site in self.queries:
+            groups[sql].append(call_site)
+        # The first run of each SQL has no call site; a repeat usually comes
+        # from the same line.
+        repeated = [
+            {'sql': sql, 'count': len(sites), 'call_sites': sorted(set(filter(None, sites)))}
+            for sql, sites in groups.items() if len(sites) > 1
+        ]
+        return sorted(repeated, key=lambda group: -group['count'])
+
+    def server_timing(self, total_time):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{len(self.queries)} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'total;dur={total_time * 1000:.1f}',
+        ])
+
+    def as_dict(self, total_time):
+        return {
+            'queries': len(self.queries),
+            'db_ms': round(self.db_time * 1000, 1),
+            'template_ms': round(self.template_time * 1000, 1),
+            'total_ms': round(total_time * 1000, 1),
+        }
+
+
+class RequestMetricsMiddleware:
+    """
+    Place it near the top of MIDDLEWARE so the timings cover the whole
+    stack. Under ASGI it runs in the event loop like the async views.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', True)
+        self.slow_seconds = getattr(settings, 'METRICS_SLOW_REQUEST_MS', 500) / 1000
+        self.sample_rate = getattr(settings, 'METRICS_SAMPLE_RATE', 0.0)
+        self.slow_sample_rate = getattr(settings, 'METRICS_SLOW_SAMPLE_RATE', 1.0)
+
+    def start(self):
+        # Whether the request would be logged if slow is drawn up front, so
+        # call sites are only collected for requests that may report them.
+        return RequestMetrics(call_sites=random.random() < self.slow_sample_rate)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = self.start()
+        with metrics.recording():
+            response = self.get_response(request)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = self.start()
+        with metrics.recording():
+            response = await self.get_response(request)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        # Streaming responses are timed up to the first byte only.
+        total_time = metrics.total_time
+        if self.server_timing:
+            response['Server-Timing'] = metrics.server_timing(total_time)
+        self.log(request, response, metrics, total_time)
+        return response
+
+    def log(self, request, response, metrics, total_time):
+        slow = total_time >= self.slow_seconds
+        if slow:
+            sampled = metrics.call_sites
+        else:
+            sampled = self.sample_rate and random.random() < self.sample_rate
+        if not sampled:
+            return
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **metrics.as_dict(total_time),
+        }
+        if slow:
+            record['repeated_queries'] = metrics.repeated_queries()
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, adding render time to the request's metrics."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        active = _current.get()
+        if not active:
+            return self.template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            # Includes queries run lazily from the template.
+            duration = time.perf_counter() - start
+            for metrics in active:
+                metrics.template_time += duration
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def max_queries(limit):
+    """
+    Fails when the block runs more than ``limit`` queries.
+
+    The error lists the repeated queries and the lines that ran them,
+    which usually points straight at the missing select_related().
+    """
+    metrics = RequestMetrics()
+    with metrics.recording():
+        yield metrics
+    if len(metrics.queries) > limit:
+        details = '\n'.join(
+            f'  {group["count"]}x {group["sql"]}\n    from ' + '\n    from '.join(group['call_sites'])
+            for group in metrics.repeated_queries()
+        )
+        raise QueryBudgetExceeded(
+            f'{len(metrics.queries)} queries run, budget is {limit}.'
+            + (f' Repeated:\n{details}' if details else '')
+        )
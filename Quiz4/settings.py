@@ -44,15 +44,31 @@ INSTALLED_APPS = [
     'accounts',
     'jobs',
     'posts',
+    'tasks',
+    'blobs',
+    'benchmarks',
 ]
 
 AUTH_USER_MODEL = 'accounts.CustomUser'
 LOGIN_REDIRECT_URL = reverse_lazy('posts:post-list')
 LOGIN_URL = 'auth:signin'
+# ModelBackend with request.user cached, see accounts/backends.py
+AUTHENTICATION_BACKENDS = ['accounts.backends.CachedModelBackend']
+ACCOUNTS_USER_CACHE_TIMEOUT = 60
+# Sign-in and sign-up attempts per (count, seconds), per client IP and per
+# email, checked before any password hashing. See accounts/ratelimit.py
+ACCOUNTS_RATE_LIMIT_ENABLED = True
+ACCOUNTS_RATE_LIMITS = {
+    'signin': {'ip': (20, 60), 'email': (5, 300)},
+    'signup': {'ip': (5, 3600), 'email': (3, 3600)},
+}
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'Quiz4.staticfiles.StaticFilesMiddleware',
+    'Quiz4.instrumentation.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'Quiz4.db_router.DatabaseRoutingMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -64,7 +80,8 @@ ROOT_URLCONF = 'Quiz4.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates plus render timing, see Quiz4/instrumentation.py
+        'BACKEND': 'Quiz4.instrumentation.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -89,9 +106,124 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # WAL lets readers run alongside the writer; NORMAL sync is safe
+            # in WAL mode and only fsyncs at checkpoints.
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA busy_timeout=5000;'
+            ),
+            # Take the write lock when a transaction starts instead of failing
+            # with "database is locked" when it tries to upgrade mid-way.
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+# Read replicas, e.g. DB_REPLICAS=/srv/replica1.sqlite3,/srv/replica2.sqlite3
+# Locally a replica can be any copy of the primary, such as one made with
+# `sqlite3 db.sqlite3 ".backup replica1.sqlite3"`. See Quiz4/db_router.py
+DATABASE_REPLICAS = []
+for _index, _path in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{_index}'] = {
+        **DATABASES['default'],
+        'NAME': _path,
+        'OPTIONS': {
+            'init_command': 'PRAGMA query_only=ON;PRAGMA mmap_size=268435456;PRAGMA busy_timeout=5000;',
+        },
+        'TEST': {'MIRROR': 'default'},
     }
+    DATABASE_REPLICAS.append(f'replica{_index}')
+
+DATABASE_ROUTERS = ['Quiz4.db_router.PrimaryReplicaRouter']
+# How long a browser keeps reading from the primary after it writes.
+DATABASE_STICKY_SECONDS = 5
+
+# Request metrics, see Quiz4/instrumentation.py
+METRICS_SERVER_TIMING = True
+METRICS_SLOW_REQUEST_MS = 500
+# Share of ordinary and of slow requests written to the Quiz4.requests log.
+METRICS_SAMPLE_RATE = 0.0
+METRICS_SLOW_SAMPLE_RATE = 1.0
+
+# Sampled and slow requests are logged as one JSON line each to stderr;
+# point the handler elsewhere to collect them. The test runner silences
+# them, see Quiz4/test_runner.py
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'Quiz4.requests': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }
 
+TEST_RUNNER = 'Quiz4.test_runner.TestRunner'
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Sessions, signed-in users, rate limits and job pages are cached, and
+# every process must see the same entries, so deployments set REDIS_URL,
+# e.g. redis://127.0.0.1:6379/0. `check --deploy` rejects the per-process
+# fallback, see accounts/checks.py
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Anonymous job list/detail pages, see jobs/page_cache.py
+JOBS_PAGE_CACHE_ALIAS = 'default'
+JOBS_PAGE_CACHE_TIMEOUT = 60 * 15
+
+# Sessions are read from the cache and written through to the database,
+# so they survive a cache restart.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+
+# Live like and comment counts over Server-Sent Events, see posts/live.py
+# Stream only under Quiz4/asgi.py; WSGI servers send the counts once and
+# let the browser poll. Swap the backend for one that spans processes when
+# running more than one.
+POSTS_LIVE_BACKEND = 'posts.live.InProcessBackend'
+POSTS_LIVE_MAX_EVENTS_PER_SECOND = 2
+
+# Buffer like count changes from the batch like API and write them every
+# POSTS_LIKE_FLUSH_INTERVAL seconds, see posts/like_batch.py
+# reconcile_post_counters double-counts deltas still buffered when it runs.
+POSTS_LIKE_WRITE_BEHIND = False
+POSTS_LIKE_FLUSH_INTERVAL = 2
+
+
+# Background tasks, see tasks/queue.py
+# Run them with `python manage.py run_workers`.
+TASKS_EAGER = False
+TASKS_VISIBILITY_TIMEOUT = 300
+
+# Uploaded files are stored once per unique content, see blobs/storage.py
+# Unreferenced blobs are deleted after this many seconds.
+BLOBS_GRACE_PERIOD = 60 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -133,6 +265,14 @@ STATICFILES_DIRS = [ BASE_DIR / 'static_my_project']
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'static', 'static_root')
 
+# Outside development collectstatic writes hashed, precompressed files that
+# StaticFilesMiddleware serves with immutable caching, see Quiz4/staticfiles.py
+if not DEBUG:
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'Quiz4.staticfiles.CompressedManifestStaticFilesStorage'},
+    }
+
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'static', 'media_root')
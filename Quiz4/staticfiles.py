@@ -0,0 +1,185 @@
+"""
+Static files built once and served with long-lived caching.
+
+``collectstatic`` with ``CompressedManifestStaticFilesStorage`` writes every
+asset under a content-hashed name (``bootstrap.min.5c2e1b7a9f3d.css``) plus a
+manifest, and next to each text asset a ``.gz`` sibling and, when the
+optional ``brotli`` package is installed, a ``.br`` one. A hashed name
+changes whenever the bytes do, so ``StaticFilesMiddleware`` can tell
+browsers to keep those files forever and send the smallest encoding the
+client accepts without compressing anything per request.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+from email.utils import formatdate
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, HttpResponseNotModified
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.map', '.svg', '.txt', '.html', '.json', '.xml', '.ico', '.ttf', '.otf', '.eot'}
+# Below this size the compressed copy does not save a network packet.
+MIN_COMPRESS_SIZE = 512
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Files without a hash in their name (e.g. linked from outside the site).
+REVALIDATE = 'public, max-age=60'
+
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def compress_file(path):
+    """Writes ``path.gz`` (and ``path.br``) when they are smaller; returns their paths."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    written = []
+    if len(data) < MIN_COMPRESS_SIZE:
+        return written
+    candidates = [('.gz', lambda: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        candidates.append(('.br', lambda: brotli.compress(data, quality=11)))
+    for suffix, compress in candidates:
+        compressed = compress()
+        # Skip encodings that do not pay for the Content-Encoding overhead.
+        if len(compressed) < len(data) * 0.95:
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        hashed = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        # The unhashed copies are compressed too, for references the
+        # manifest cannot rewrite.
+        for name in sorted(hashed | set(paths)):
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS and self.exists(name):
+                compress_file(self.path(name))
+
+
+class StaticFile:
+    __slots__ = ('path', 'variants', 'content_type', 'cache_control', 'etag', 'last_modified')
+
+    def __init__(self, path, immutable):
+        self.path = path
+        self.variants = [(encoding, path + suffix) for encoding, suffix in ENCODINGS if os.path.exists(path + suffix)]
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.cache_control = IMMUTABLE if immutable else REVALIDATE
+        stat = os.stat(path)
+        self.etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+
+def build_index(root, url_prefix):
+    """Maps each URL under ``url_prefix`` to the collected file it serves."""
+    index = {}
+    if not root or not os.path.isdir(root):
+        return index
+    hashed_names = set(ManifestStaticFilesStorage(location=root).hashed_files.values())
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith(('.gz', '.br')) and os.path.exists(os.path.join(dirpath, filename[:-3])):
+                continue
+            path = os.path.join(dirpath, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            index[url_prefix + name] = StaticFile(path, immutable=name in hashed_names)
+    return index
+
+
+def accepted_encodings(request):
+    accepted = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.partition(';')
+        name, _, value = params.strip().partition('=')
+        try:
+            if name.strip() == 'q' and float(value) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticFilesMiddleware:
+    """
+    Serves ``STATIC_ROOT`` ahead of the rest of the stack.
+
+    Works the same under WSGI and ASGI, and under ASGI runs in the event
+    loop so the async views below it are not adapted to sync and back. The
+    directory is indexed once at startup, so a request costs a dict lookup
+    and an open(); re-run ``collectstatic`` and restart to pick up new
+    files. When the tree has not been collected (e.g. under runserver)
+    requests pass through.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        prefix = settings.STATIC_URL or ''
+        if not prefix.startswith(('/', 'http://', 'https://')):
+            prefix = '/' + prefix
+        self.prefix = prefix
+        self.files = build_index(settings.STATIC_ROOT, prefix)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        static_file = self.lookup(request)
+        if static_file is not None:
+            return self.serve(request, static_file)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        static_file = self.lookup(request)
+        if static_file is not None:
+            return self.serve(request, static_file)
+        return await self.get_response(request)
+
+    def lookup(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            return self.files.get(posixpath.normpath(request.path_info))
+        return None
+
+    def serve(self, request, static_file):
+        path, encoding = static_file.path, None
+        accepted = accepted_encodings(request)
+        for coding, variant in static_file.variants:
+            if coding in accepted:
+                path, encoding = variant, coding
+                break
+        # Each encoding is a different representation with its own ETag.
+        etag = f'{static_file.etag[:-1]}-{encoding}"' if encoding else static_file.etag
+
+        if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(
+                open(path, 'rb'), content_type=static_file.content_type,
+                filename=os.path.basename(static_file.path),
+            )
+            if encoding:
+                response['Content-Encoding'] = encoding
+            response['Last-Modified'] = static_file.last_modified
+        if static_file.variants:
+            response['Vary'] = 'Accept-Encoding'
+        response['ETag'] = etag
+        response['Cache-Control'] = static_file.cache_control
+        return response
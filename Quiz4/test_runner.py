@@ -0,0 +1,22 @@
+"""
+The project's test runner: Django's, with the request log switched off.
+
+Every test request that hashes a password is a slow request, and logging
+each one buries the test output. Tests that check the log still see it
+through ``assertLogs()``, which sets its own level.
+"""
+import logging
+
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        logger = logging.getLogger('Quiz4.requests')
+        self._request_log_level = logger.level
+        logger.setLevel(logging.CRITICAL + 1)
+
+    def teardown_test_environment(self, **kwargs):
+        logging.getLogger('Quiz4.requests').setLevel(self._request_log_level)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,268 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import CustomUser
+from jobs.models import Job, JobApplicant
+from posts.models import Comment, Post
+from .db_router import PIN_COOKIE, DatabaseRoutingMiddleware, PrimaryReplicaRouter, replica_reads
+from .instrumentation import QueryBudgetExceeded, RequestMetricsMiddleware, max_queries
+from .staticfiles import StaticFilesMiddleware
+
+STYLE = 'body { margin: 0; }\n' * 100
+
+
+class StaticPipelineTests(SimpleTestCase):
+    def setUp(self):
+        source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        os.makedirs(os.path.join(source, 'css'))
+        with open(os.path.join(source, 'css', 'site.css'), 'w') as f:
+            f.write(STYLE)
+
+        override = override_settings(
+            STATICFILES_DIRS=[source], STATIC_ROOT=self.root, STATIC_URL='/static/',
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'Quiz4.staticfiles.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(self.root, 'staticfiles.json')) as f:
+            self.hashed = json.load(f)['paths']['css/site.css']
+
+    def test_collectstatic_writes_hashed_and_gzipped_files(self):
+        self.assertNotEqual(self.hashed, 'css/site.css')
+        self.assertEqual(staticfiles_storage.url('css/site.css'), f'/static/{self.hashed}')
+        self.assertTrue(os.path.exists(os.path.join(self.root, self.hashed + '.gz')))
+
+    def test_hashed_file_is_served_compressed_and_immutable(self):
+        response = self.client.get(f'/static/{self.hashed}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertLess(int(response['Content-Length']), len(STYLE))
+
+        revisit = self.client.get(
+            f'/static/{self.hashed}', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(revisit.status_code, 304)
+
+    def test_unhashed_name_is_served_uncompressed_when_not_accepted(self):
+        response = self.client.get('/static/css/site.css', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(b''.join(response.streaming_content).decode(), STYLE)
+
+    async def test_async_chain_stays_in_the_event_loop(self):
+        async def get_response(request):
+            return HttpResponse('app')
+
+        middleware = StaticFilesMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        factory = AsyncRequestFactory()
+        response = await middleware(factory.get(f'/static/{self.hashed}', headers={'accept-encoding': 'gzip'}))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        response = await middleware(factory.get('/feed/'))
+        self.assertEqual(response.content, b'app')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class DatabaseRoutingTests(TransactionTestCase):
+    # Not TestCase: its wrapping transaction would keep every read on the primary.
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.cookies = {}
+        self.seen = []
+
+    def request(self, view, method='get'):
+        """Runs ``view`` through the middleware and returns where it read from."""
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES = dict(self.cookies)
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = DatabaseRoutingMiddleware(get_response)
+        response = middleware(request)
+        self.cookies.update({name: morsel.value for name, morsel in response.cookies.items()})
+        return self.seen.pop()
+
+    def reader(self, write=False):
+        def view(request):
+            if write:
+                self.router.db_for_write(Post)
+            self.seen.append(self.router.db_for_read(Post))
+            return HttpResponse()
+        return view
+
+    def test_only_marked_views_read_from_replicas(self):
+        self.assertEqual(self.request(self.reader()), 'default')
+        self.assertIn(self.request(replica_reads(self.reader())), ['replica1', 'replica2'])
+        self.assertEqual(self.request(replica_reads(self.reader()), method='post'), 'default')
+
+    def test_write_pins_the_browser_to_the_primary(self):
+        self.assertEqual(self.request(replica_reads(self.reader(write=True))), 'default')
+        self.assertIn(PIN_COOKIE, self.cookies)
+        self.assertEqual(self.request(replica_reads(self.reader())), 'default')
+
+        self.cookies[PIN_COOKIE] = 'forged'
+        self.assertIn(self.request(replica_reads(self.reader())), ['replica1', 'replica2'])
+
+    @override_settings(DATABASE_STICKY_SECONDS=0)
+    def test_pin_expires(self):
+        self.request(replica_reads(self.reader(write=True)))
+        time.sleep(1)
+        self.assertIn(self.request(replica_reads(self.reader())), ['replica1', 'replica2'])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_nothing_is_pinned_without_replicas(self):
+        self.assertEqual(self.request(self.reader(write=True)), 'default')
+        self.assertEqual(self.cookies, {})
+
+    def test_reads_inside_a_transaction_use_the_primary(self):
+        read = self.reader()
+
+        def view(request):
+            with transaction.atomic():
+                return read(request)
+        self.assertEqual(self.request(replica_reads(view)), 'default')
+
+    async def test_async_chain_routes_and_pins_without_threads(self):
+        async def get_response(request):
+            self.assertIsNone(await middleware.process_view(request, view, (), {}))
+            return view(request)
+
+        view = replica_reads(self.reader(write=True))
+        middleware = DatabaseRoutingMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertTrue(iscoroutinefunction(middleware.process_view))
+        response = await middleware(AsyncRequestFactory().get('/'))
+        self.assertEqual(self.seen.pop(), 'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_replicas_are_never_migrated(self):
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+
+class AsyncMiddlewareTests(SimpleTestCase):
+    @override_settings(DEBUG=True)
+    def test_no_middleware_is_adapted_under_asgi(self):
+        # Django logs each adaptation between sync and async code at debug
+        # level when DEBUG is on.
+        with mock.patch.object(logging.getLogger('django.request'), 'debug') as debug:
+            ASGIHandler()
+        adapted = [call.args[1] for call in debug.call_args_list if 'adapted' in call.args[0]]
+        self.assertEqual(adapted, [])
+
+
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='metrics@example.com')
+        cls.staff = CustomUser.objects.create_user(email='staff@example.com', is_staff=True)
+        cls.post = Post.objects.create(user=cls.user, content='Measured post')
+        for i in range(3):
+            commenter = CustomUser.objects.create_user(email=f'c{i}@example.com')
+            Comment.objects.create(user=commenter, post=cls.post, content=f'comment {i}')
+        cls.job = Job.objects.create(
+            user=cls.staff, job_title='Analyst', job_description='Numbers.',
+            min_offer=1, max_offer=2, location='Cebu',
+        )
+        for i in range(3):
+            applicant = CustomUser.objects.create_user(email=f'a{i}@example.com')
+            JobApplicant.objects.create(job=cls.job, user=applicant, resume='resumes/cv.pdf')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_server_timing_header(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('posts:post-list'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+
+    @override_settings(METRICS_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_with_repeated_queries(self):
+        self.client.force_login(self.user)
+        with self.assertLogs('Quiz4.requests', 'WARNING') as logs:
+            self.client.get(self.post.get_absolute_url())
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], self.post.get_absolute_url())
+        self.assertGreater(record['queries'], 0)
+        self.assertIn('repeated_queries', record)
+
+    @override_settings(METRICS_SLOW_REQUEST_MS=0, METRICS_SLOW_SAMPLE_RATE=0.0)
+    def test_call_sites_are_only_collected_for_sampled_requests(self):
+        self.client.force_login(self.user)
+        with mock.patch('Quiz4.instrumentation._call_site') as call_site, self.assertNoLogs('Quiz4.requests'):
+            self.client.get(self.post.get_absolute_url())
+        call_site.assert_not_called()
+
+    async def test_async_views_are_measured_in_the_event_loop(self):
+        async def get_response(request):
+            return HttpResponse('app')
+
+        self.assertTrue(iscoroutinefunction(RequestMetricsMiddleware(get_response)))
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('posts:post-feed-page'))
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+    def test_budget_failure_names_the_call_site(self):
+        with self.assertRaises(QueryBudgetExceeded) as caught, max_queries(1):
+            for comment in Comment.objects.all():
+                comment.user.email
+        self.assertIn('Quiz4/tests.py', str(caught.exception))
+
+    def test_view_query_budgets(self):
+        # Includes loading the user (with profile) into the cold user cache;
+        # the session comes from the cache. Raise a budget only together with
+        # the change that needs it.
+        pages = [
+            (self.user, reverse('posts:post-list'), 3),
+            (self.user, reverse('posts:post-feed-page'), 2),
+            (self.user, self.post.get_absolute_url(), 5),
+            (None, reverse('jobs:list'), 1),
+            (None, reverse('jobs:detail', args=[self.job.pk]), 1),
+            (self.staff, reverse('jobs:detail', args=[self.job.pk]), 4),
+            (self.user, reverse('auth:profile'), 1),
+        ]
+        for user, url, budget in pages:
+            with self.subTest(url=url, user=user):
+                self.client.logout()
+                if user:
+                    self.client.force_login(user)
+                with max_queries(budget):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_toggle_like_query_budget(self):
+        # Liking, unliking and liking again with the user cached: no session
+        # or pin write may be added on top of the like itself.
+        self.client.force_login(self.user)
+        url = reverse('posts:toggle-like', args=[self.post.slug])
+        self.client.post(url)
+        # The like counts the savepoints of get_or_create() too.
+        for liked, budget in [(False, 5), (True, 7)]:
+            with self.subTest(liked=liked), max_queries(budget):
+                self.assertEqual(self.client.post(url).json()['liked'], liked)
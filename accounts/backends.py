@@ -0,0 +1,53 @@
+"""
+Authentication backend that keeps request.user in the cache.
+
+AuthenticationMiddleware loads the signed-in user on every request, and
+the header then loads their profile. Both are served from one cache entry
+(the user with the profile already attached) for
+``ACCOUNTS_USER_CACHE_TIMEOUT`` seconds. The entry is deleted whenever
+the user or the profile changes, see accounts/signals.py.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+UserModel = get_user_model()
+
+
+def user_cache_key(user_id):
+    return f'accounts:user:{user_id}'
+
+
+def invalidate_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+def _timeout():
+    return getattr(settings, 'ACCOUNTS_USER_CACHE_TIMEOUT', 60)
+
+
+def _queryset():
+    return UserModel._default_manager.select_related('profile')
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = _queryset().filter(pk=user_id).first()
+            if user is None:
+                return None
+            cache.set(key, user, _timeout())
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            user = await _queryset().filter(pk=user_id).afirst()
+            if user is None:
+                return None
+            await cache.aset(key, user, _timeout())
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,48 @@
+"""
+Deployment check for the state the project keeps in the cache.
+
+cached_db sessions trust a cached session without asking the database,
+and CachedModelBackend trusts a cached user. A logout, a password change
+or a deactivation deletes the entry once, from the cache its own worker
+sees. With a process-local cache every other worker keeps serving its
+copy, a session for up to SESSION_COOKIE_AGE and a user for up to
+ACCOUNTS_USER_CACHE_TIMEOUT, so ``check --deploy`` rejects one. The
+rate limits of accounts/ratelimit.py would count per process too, and a
+job change would invalidate the cached job pages (jobs/page_cache.py) of
+one process only.
+"""
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+CACHED_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+
+def cached_state():
+    """(description, cache alias) of everything that must be shared between processes."""
+    if settings.SESSION_ENGINE in CACHED_SESSION_ENGINES:
+        yield 'Sessions', settings.SESSION_CACHE_ALIAS
+    if 'accounts.backends.CachedModelBackend' in settings.AUTHENTICATION_BACKENDS:
+        yield 'Signed-in users', DEFAULT_CACHE_ALIAS
+    if getattr(settings, 'ACCOUNTS_RATE_LIMIT_ENABLED', True):
+        yield 'Rate limit counters', DEFAULT_CACHE_ALIAS
+    yield 'Anonymous job pages', getattr(settings, 'JOBS_PAGE_CACHE_ALIAS', DEFAULT_CACHE_ALIAS)
+
+
+@register(Tags.caches, Tags.security, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    errors = []
+    for description, alias in cached_state():
+        backend = settings.CACHES.get(alias, {}).get('BACKEND')
+        if backend in PROCESS_LOCAL_CACHES:
+            errors.append(Error(
+                f'{description} are cached in {alias!r}, which every process keeps for itself.',
+                hint='Set REDIS_URL, or configure a cache all processes share.',
+                id='accounts.E001',
+            ))
+    return errors
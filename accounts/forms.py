@@ -1,7 +1,11 @@
 from django import forms
+from posts.images import validate_image_upload
 from .models import Profile
 
 class ProfileForm(forms.ModelForm):
     class Meta:
         model = Profile
-        fields = ['first_name', 'last_name', 'bio', 'profile_picture']
\ No newline at end of file
+        fields = ['first_name', 'last_name', 'bio', 'profile_picture']
+
+    def clean_profile_picture(self):
+        return validate_image_upload(self.cleaned_data.get('profile_picture'))
@@ -0,0 +1,102 @@
+"""
+Creates user accounts in bulk from a CSV or JSON Lines file.
+
+``create_user()`` hashes each password and saves the user, then the
+``create_profile`` receiver inserts its Profile: three statements and one
+deliberately slow hash per account, one account at a time. Here the
+passwords of a chunk are hashed in a pool of processes, one per core by
+default, and the chunk is written with two bulk INSERTs, users then
+profiles, in one transaction. bulk_create() sends no post_save, so the
+profiles are created here and a chunk is committed with all of them or
+not at all.
+
+Addresses are normalized as ``create_user()`` does, lowercasing only the
+domain. One that differs only in case from an existing account or an
+earlier row is skipped: addresses match in any case, see
+accounts/models.py
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import connection
+
+from accounts.models import CustomUser, Profile
+from Quiz4.bulkio import BulkImportCommand
+
+
+class Command(BulkImportCommand):
+    help = (
+        'Streams new users from a CSV or JSON Lines file into the database in chunks, '
+        'each with its profile. Columns: email and optionally password, first_name '
+        'and last_name; users without a password cannot sign in until they reset it.'
+    )
+    model = CustomUser
+    text_fields = ('email', 'password', 'first_name', 'last_name')
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processes hashing passwords (defaults to one per core).',
+        )
+
+    def handle(self, *args, workers, **options):
+        self.workers = max(1, workers)
+        if self.workers == 1:
+            self.pool = None
+            return super().handle(*args, **options)
+        # Each worker sets Django up so make_password() sees the hasher
+        # settings under the spawn start method too.
+        with ProcessPoolExecutor(self.workers, initializer=django.setup) as self.pool:
+            return super().handle(*args, **options)
+
+    def hash_passwords(self, passwords):
+        if self.pool is None:
+            return list(map(make_password, passwords))
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self.pool.map(make_password, passwords, chunksize=chunksize))
+
+    def build_objects(self, chunk):
+        # Keyed by the lowercased address; earlier chunks were committed
+        # and are found among the existing accounts.
+        rows = {}
+        for number, row in chunk:
+            email = CustomUser.objects.normalize_email((row.get('email') or '').strip())
+            try:
+                validate_email(email)
+            except ValidationError:
+                self.report_error(number, 'missing or invalid email.')
+                continue
+            if email.lower() in rows:
+                self.report_error(number, f'{email} appears earlier in the file.')
+                continue
+            rows[email.lower()] = email, number, row
+
+        existing = set(CustomUser.objects.with_emails(rows).values_list('email_lower', flat=True))
+        for email_lower in existing:
+            email, number, _ = rows.pop(email_lower)
+            self.report_error(number, f'{email} already has an account.')
+
+        passwords = self.hash_passwords([row.get('password') or None for _, _, row in rows.values()])
+        return [
+            Profile(
+                user=CustomUser(email=email, password=password),
+                first_name=(row.get('first_name') or '').strip() or None,
+                last_name=(row.get('last_name') or '').strip() or None,
+            )
+            for (email, _, row), password in zip(rows.values(), passwords)
+        ]
+
+    def save_objects(self, profiles, chunk_size):
+        users = [profile.user for profile in profiles]
+        CustomUser.objects.bulk_create(users, batch_size=chunk_size)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            ids = dict(CustomUser.objects.filter(email__in=[user.email for user in users]).values_list('email', 'pk'))
+            for user in users:
+                user.pk = ids[user.email]
+        # Profile.user_id is filled in from the now saved users.
+        Profile.objects.bulk_create(profiles, batch_size=chunk_size)
@@ -1,11 +1,27 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.base_user import BaseUserManager
 
+from blobs.storage import blob_storage
+
 
 # ✅ FIXED: Simplified the UserManager to work with Django's built-in fields
 class UserManager(BaseUserManager):
+    # Addresses are stored as normalize_email() leaves them, with only the
+    # domain lowercased, and matched in any case: Bob@example.com and
+    # bob@example.com are one account.
+    def with_emails(self, emails):
+        """Users with any of ``emails``, annotated with ``email_lower``."""
+        return self.annotate(email_lower=Lower('email')).filter(email_lower__in=[email.lower() for email in emails])
+
+    def with_email(self, email):
+        return self.with_emails([email])
+
+    def get_by_natural_key(self, email):
+        return self.with_email(email).get()
+
     def create_user(self, email, password=None, **extra_fields):
         if not email:
             raise ValueError('Users must have an email address')
@@ -39,6 +55,9 @@ class CustomUser(AbstractUser):
 
     objects = UserManager()
 
+    class Meta:
+        indexes = [models.Index(Lower('email'), name='accounts_user_email_lower')]
+
     def __str__(self):
         return self.email
 
@@ -50,7 +69,9 @@ class Profile(models.Model):
     last_name = models.CharField(max_length=50, blank=True, null=True)
     bio = models.TextField(blank=True, null=True)
     # This simplified path is safe and works correctly
-    profile_picture = models.ImageField(upload_to='profile_pics/', default='profile_pics/default.png')
+    profile_picture = models.ImageField(upload_to='profile_pics/', storage=blob_storage, default='profile_pics/default.png')
+    # Resized copies of `profile_picture`, filled in by posts/images.py.
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return f'{self.user.email} Profile'
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+Sliding-window rate limits for sign in and sign up.
+
+Both views hash a password on every POST, which is deliberately slow, so
+a credential-stuffing burst would otherwise keep every worker busy. Each
+attempt is checked against a limit per client IP and per email address
+before any hashing happens; over the limit the view answers 429 with
+``Retry-After``.
+
+The window is approximated from two fixed-window counters, the current
+one and the previous one weighted by how much of it still overlaps the
+window. That is two small cache entries per key, each expiring on its
+own, however many attempts are made. An attempt increments its counter
+before comparing it, so a concurrent burst cannot pass the check in full
+before any counter moves. The counters must be in a cache every process
+shares, or each process allows the full limit; see accounts/checks.py
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# (attempts, seconds) for each scope and key kind.
+DEFAULT_RATES = {
+    'signin': {'ip': (20, 60), 'email': (5, 300)},
+    'signup': {'ip': (5, 3600), 'email': (3, 3600)},
+}
+
+
+class SlidingWindow:
+    def __init__(self, name, limit, window):
+        self.name = name
+        self.limit = limit
+        self.window = window
+
+    def _keys(self, key, now):
+        digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+        current = int(now // self.window)
+        return f'ratelimit:{self.name}:{digest}:{current}', f'ratelimit:{self.name}:{digest}:{current - 1}'
+
+    def _wait(self, current, previous, now):
+        into_window = now % self.window
+        overlap = 1 - into_window / self.window
+        if previous * overlap + current < self.limit:
+            return 0
+        if current >= self.limit:
+            # Wait for the next window, then for this one's weight to fall off.
+            wait = self.window - into_window + self.window * (1 - self.limit / current)
+        else:
+            wait = self.window * (1 - (self.limit - current) / previous) - into_window
+        return max(1, math.ceil(wait))
+
+    def retry_after(self, key, now=None):
+        """Seconds until ``key`` may make another attempt; 0 if it may now."""
+        now = time.time() if now is None else now
+        current_key, previous_key = self._keys(key, now)
+        counts = cache.get_many([current_key, previous_key])
+        return self._wait(counts.get(current_key, 0), counts.get(previous_key, 0), now)
+
+    def hit(self, key, now=None):
+        """Counts one attempt by ``key`` and returns the current window's count."""
+        now = time.time() if now is None else now
+        current_key, _ = self._keys(key, now)
+        # Kept for two windows: one as the current count, one as the previous.
+        cache.add(current_key, 0, 2 * self.window)
+        try:
+            return cache.incr(current_key)
+        except ValueError:  # Expired between add() and incr().
+            cache.add(current_key, 1, 2 * self.window)
+            return 1
+
+    def unhit(self, key, now):
+        current_key, _ = self._keys(key, now)
+        try:
+            cache.decr(current_key)
+        except ValueError:
+            pass
+
+    def attempt(self, key, now=None):
+        """
+        Counts one attempt by ``key`` and returns 0, or takes it back and
+        returns the seconds to wait if the attempt is over the limit.
+
+        The count is incremented before it is compared, so each of many
+        concurrent attempts sees a different count and no more than the
+        limit get through.
+        """
+        now = time.time() if now is None else now
+        current = self.hit(key, now)
+        _, previous_key = self._keys(key, now)
+        wait = self._wait(current - 1, cache.get(previous_key, 0), now)
+        if wait:
+            self.unhit(key, now)
+        return wait
+
+
+def _limiters(scope):
+    rates = getattr(settings, 'ACCOUNTS_RATE_LIMITS', DEFAULT_RATES)[scope]
+    return {kind: SlidingWindow(f'{scope}:{kind}', *rate) for kind, rate in rates.items()}
+
+
+def client_ip(request):
+    # Behind a reverse proxy, have it set REMOTE_ADDR to the client address.
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def check_attempt(request, scope, email):
+    """
+    Counts one ``scope`` attempt by this client for ``email``.
+
+    Returns 0 when it may go ahead, or the number of seconds to wait; a
+    rejected attempt is not counted.
+    """
+    if not getattr(settings, 'ACCOUNTS_RATE_LIMIT_ENABLED', True):
+        return 0
+    now = time.time()
+    keys = {'ip': client_ip(request), 'email': (email or '').strip().lower()}
+    counted = []
+    for kind, limiter in _limiters(scope).items():
+        wait = limiter.attempt(keys[kind], now)
+        if wait:
+            # Take back the attempt the other limits already counted.
+            for done_kind, done in counted:
+                done.unhit(keys[done_kind], now)
+            return wait
+        counted.append((kind, limiter))
+    return 0
@@ -1,9 +1,38 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.conf import settings
+
+from posts.images import variants_stored
+from .backends import invalidate_user
 from .models import Profile
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_profile(sender, instance, created, **kwargs):
     if created:
-        Profile.objects.create(user=instance)
\ No newline at end of file
+        Profile.objects.create(user=instance)
+
+
+def _invalidate(user_id):
+    # Now, and again after commit in case a concurrent request cached the
+    # old row while the transaction was still open.
+    invalidate_user(user_id)
+    transaction.on_commit(lambda: invalidate_user(user_id))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    _invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    _invalidate(instance.user_id)
+
+
+@receiver(variants_stored, sender=Profile)
+def profile_variants_stored(sender, instance, **kwargs):
+    # The variants are written with queryset.update(), which sends no post_save.
+    invalidate_user(instance.user_id)
@@ -1,3 +1,279 @@
-from django.test import TestCase
+import csv
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from Quiz4.instrumentation import max_queries
+from posts.images import variants_stored
+from posts.models import Post
+from .backends import user_cache_key
+from .checks import check_shared_cache
+from .ratelimit import SlidingWindow
+from .models import CustomUser, Profile
+
+# Any statement on the session table, including a re-save, but only reads
+# of the user tables, which a view may legitimately write to.
+AUTH_TABLES = ('"django_session"', 'FROM "accounts_customuser"', 'FROM "accounts_profile"')
+
+
+def auth_queries(metrics):
+    return [sql for alias, sql, duration, call_site in metrics.queries if any(table in sql for table in AUTH_TABLES)]
+
+
+class CachedAuthTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='cached@example.com', password='pass12345')
+        Profile.objects.filter(user=self.user).update(first_name='Ada')
+        self.post = Post.objects.create(user=self.user, content='hello')
+        self.client.force_login(self.user)
+
+    def warm(self):
+        self.client.get(reverse('posts:post-list'))
+
+    def test_feed_runs_no_auth_queries_once_warm(self):
+        self.warm()
+        with max_queries(10) as metrics:
+            response = self.client.get(reverse('posts:post-list'))
+        self.assertContains(response, 'Ada')
+        self.assertEqual(auth_queries(metrics), [])
+
+    def test_toggle_like_runs_no_auth_queries_once_warm(self):
+        self.warm()
+        with max_queries(10) as metrics:
+            response = self.client.post(reverse('posts:toggle-like', args=[self.post.slug]))
+        self.assertEqual(response.json()['liked'], True)
+        self.assertEqual(auth_queries(metrics), [])
+
+    async def test_async_views_use_the_cached_user(self):
+        await self.async_client.aforce_login(self.user)
+        await cache.adelete(user_cache_key(self.user.pk))
+        response = await self.async_client.get(reverse('posts:post-feed-page'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(await cache.aget(user_cache_key(self.user.pk)))
+
+    def test_profile_save_invalidates_the_cached_user(self):
+        self.warm()
+        profile = Profile.objects.get(user=self.user)
+        profile.first_name = 'Grace'
+        profile.save()
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        self.assertContains(self.client.get(reverse('posts:post-list')), 'Grace')
+
+    def test_stored_image_variants_invalidate_the_cached_user(self):
+        self.warm()
+        variants_stored.send(sender=Profile, instance=Profile.objects.get(user=self.user))
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+    def test_password_change_still_ends_other_sessions(self):
+        self.warm()
+        self.user.set_password('changed-password')
+        self.user.save()
+        response = self.client.get(reverse('posts:post-list'))
+        self.assertRedirects(response, f"{reverse('auth:signin')}?next={reverse('posts:post-list')}")
+
+    def test_deactivated_user_is_signed_out(self):
+        self.warm()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('posts:post-list')).status_code, 302)
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    def check_ids(self):
+        return [error.id for error in check_shared_cache(None)]
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_is_rejected_for_deployment(self):
+        self.assertEqual(self.check_ids(), ['accounts.E001'] * 4)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379'}})
+    def test_shared_cache_passes(self):
+        self.assertEqual(self.check_ids(), [])
+
+    @override_settings(
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'pages': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379'},
+        },
+        JOBS_PAGE_CACHE_ALIAS='pages',
+        SESSION_ENGINE='django.contrib.sessions.backends.db',
+        AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend'],
+        ACCOUNTS_RATE_LIMIT_ENABLED=False,
+    )
+    def test_process_local_cache_is_fine_when_nothing_relies_on_it(self):
+        self.assertEqual(self.check_ids(), [])
+
+
+@override_settings(ACCOUNTS_RATE_LIMITS={
+    'signin': {'ip': (3, 60), 'email': (2, 300)},
+    'signup': {'ip': (1, 3600), 'email': (1, 3600)},
+})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Attempts a second apart could otherwise fall into different windows.
+        clock = mock.patch('accounts.ratelimit.time', mock.Mock(time=lambda: 3600 * 24 * 365 + 1))
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def sign_in(self, email='someone@example.com', ip='198.51.100.1'):
+        return self.client.post(reverse('auth:signin'), {'email': email, 'password': 'wrong'}, REMOTE_ADDR=ip)
+
+    def test_ip_over_the_limit_gets_429_before_hashing(self):
+        for n in range(3):
+            self.assertEqual(self.sign_in(f'user{n}@example.com').status_code, 200)
+        with mock.patch('accounts.views.authenticate') as authenticate:
+            response = self.sign_in('user9@example.com')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        authenticate.assert_not_called()
+        self.assertEqual(self.sign_in('user9@example.com', ip='198.51.100.2').status_code, 200)
+
+    def test_email_is_limited_across_ips_and_normalized(self):
+        self.sign_in('victim@example.com', ip='198.51.100.1')
+        self.sign_in(' Victim@Example.com', ip='198.51.100.2')
+        self.assertEqual(self.sign_in('victim@example.com', ip='198.51.100.3').status_code, 429)
+
+    def test_signup_is_limited_before_creating_the_user(self):
+        data = {'email': 'new@example.com', 'password': 'x', 'confirm_password': 'y'}
+        self.client.post(reverse('auth:signup'), data)
+        with mock.patch('accounts.views.CustomUser.objects.create_user') as create_user:
+            response = self.client.post(reverse('auth:signup'), {**data, 'confirm_password': 'x'})
+        self.assertEqual(response.status_code, 429)
+        create_user.assert_not_called()
+
+    def test_rejected_email_attempt_is_not_counted_against_the_ip(self):
+        for n in range(2):
+            self.sign_in('victim@example.com', ip='198.51.100.1')
+        self.assertEqual(self.sign_in('victim@example.com', ip='198.51.100.1').status_code, 429)
+        # Two of the three attempts from this IP were counted, so it has one left.
+        self.assertEqual(self.sign_in('other@example.com', ip='198.51.100.1').status_code, 200)
+        self.assertEqual(self.sign_in('third@example.com', ip='198.51.100.1').status_code, 429)
+
+    @override_settings(ACCOUNTS_RATE_LIMIT_ENABLED=False)
+    def test_can_be_disabled(self):
+        for _ in range(4):
+            self.assertEqual(self.sign_in().status_code, 200)
+
+
+class SlidingWindowTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.window = SlidingWindow('test', limit=4, window=60)
+
+    def test_previous_window_is_weighted_by_its_overlap(self):
+        for _ in range(4):
+            self.window.hit('key', now=60 * 10 + 59)
+        # A quarter into the next window, 3 of the 4 still count.
+        self.assertEqual(self.window.retry_after('key', now=60 * 11 + 15), 0)
+        for _ in range(3):
+            self.window.hit('key', now=60 * 11 + 15)
+        # Allowed again once fewer than 1 of the previous 4 count, 45s in.
+        self.assertEqual(self.window.retry_after('key', now=60 * 11 + 15), 30)
+        self.assertEqual(self.window.retry_after('key', now=60 * 11 + 46), 0)
+
+    def test_attempts_over_the_limit_are_rejected_and_not_counted(self):
+        waits = [self.window.attempt('key', now=60 * 10) for _ in range(6)]
+        self.assertEqual(waits[:4], [0] * 4)
+        self.assertTrue(all(waits[4:]))
+        self.assertEqual(self.window.hit('key', now=60 * 10), 5)
+
+    def test_full_current_window_waits_into_the_next(self):
+        for _ in range(8):
+            self.window.hit('key', now=60 * 10)
+        # The next window starts in 60s and the weight of 8 must fall below 4.
+        self.assertEqual(self.window.retry_after('key', now=60 * 10), 90)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ProvisionUsersTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def write_csv(self, rows):
+        path = os.path.join(self.dir, 'users.csv')
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['email', 'password', 'first_name', 'last_name'])
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def row(self, i, **overrides):
+        return {'email': f'new{i}@example.com', 'password': f'secret-{i}', 'first_name': f'Ada{i}', 'last_name': '', **overrides}
+
+    def provision(self, rows, **options):
+        err = StringIO()
+        options.setdefault('workers', 1)
+        call_command('provision_users', self.write_csv(rows), stdout=StringIO(), stderr=err, **options)
+        return err.getvalue()
+
+    def test_creates_users_with_profiles_and_hashed_passwords(self):
+        self.provision([self.row(1), self.row(2, password='')], chunk_size=1)
+        first = CustomUser.objects.select_related('profile').get(email='new1@example.com')
+        self.assertTrue(first.check_password('secret-1'))
+        self.assertEqual((first.profile.first_name, first.profile.last_name), ('Ada1', None))
+        second = CustomUser.objects.get(email='new2@example.com')
+        self.assertFalse(second.has_usable_password())
+        self.assertFalse(CustomUser.objects.filter(profile__isnull=True).exists())
+
+    def test_hashes_in_a_process_pool(self):
+        self.provision([self.row(i) for i in range(4)], workers=2)
+        self.assertEqual(Profile.objects.filter(user__email__startswith='new').count(), 4)
+        self.assertTrue(CustomUser.objects.get(email='new3@example.com').check_password('secret-3'))
+
+    def test_skips_invalid_repeated_and_existing_emails(self):
+        CustomUser.objects.create_user(email='New1@example.com')
+        err = self.provision([
+            self.row(1), self.row(2, email='New2@Example.com'), self.row(3, email='new2@example.com'),
+            self.row(4, email='not-an-email'),
+        ])
+        # Only the domain is lowercased, as create_user() does.
+        self.assertEqual(
+            sorted(CustomUser.objects.filter(email__istartswith='new').values_list('email', flat=True)),
+            ['New1@example.com', 'New2@example.com'],
+        )
+        self.assertIn('Record 1: new1@example.com already has an account.', err)
+        self.assertIn('Record 3: new2@example.com appears earlier in the file.', err)
+        self.assertIn('Record 4: missing or invalid email.', err)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_provisioned_users_sign_in_with_the_address_as_given(self):
+        self.provision([self.row(1, email='Alice.Smith@Corp.com')])
+        response = self.client.post(reverse('auth:signin'), {'email': 'Alice.Smith@Corp.com', 'password': 'secret-1'})
+        self.assertRedirects(response, reverse('posts:post-list'))
+
+    def test_addresses_match_in_any_case(self):
+        self.provision([self.row(1, email='Bob@Example.com')])
+        self.assertEqual(CustomUser.objects.get_by_natural_key('bob@example.com').email, 'Bob@example.com')
+        self.client.post(reverse('auth:signup'), {'email': 'BOB@example.com', 'password': 'x', 'confirm_password': 'x'})
+        self.assertEqual(CustomUser.objects.with_email('bob@example.com').count(), 1)
+
+    def test_json_lines_values_that_are_not_text_are_reported(self):
+        path = os.path.join(self.dir, 'users.jsonl')
+        with open(path, 'w') as f:
+            f.write('{"email": "num@example.com", "password": 123}\n')
+            f.write('{"email": ["list@example.com"]}\n')
+            f.write('{"email": "ok@example.com", "password": "secret"}\n')
+        err = StringIO()
+        call_command('provision_users', path, workers=1, stdout=StringIO(), stderr=err)
+        self.assertIn('Record 1: password must be text.', err.getvalue())
+        self.assertIn('Record 2: email must be text.', err.getvalue())
+        self.assertEqual(list(CustomUser.objects.values_list('email', flat=True)), ['ok@example.com'])
+
+    def test_queries_do_not_grow_with_the_chunk(self):
+        with CaptureQueriesContext(connection) as small:
+            self.provision([self.row(i) for i in range(2)], chunk_size=50)
+        with CaptureQueriesContext(connection) as large:
+            self.provision([self.row(i) for i in range(10, 50)], chunk_size=50)
+        self.assertEqual(len(large), len(small))
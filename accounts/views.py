@@ -8,6 +8,15 @@ from django.db import IntegrityError
 from .models import Profile, CustomUser
 from .forms import ProfileForm  # ✅ IMPORT THE NEW PROFILE FORM
 from jobs.models import Job, JobApplicant
+from posts.images import AVATAR_WIDTHS, schedule_derivatives
+from .ratelimit import check_attempt
+
+
+def _too_many_attempts(request, template_name, retry_after, context=None):
+    messages.error(request, f'Too many attempts. Please try again in {retry_after} seconds.')
+    response = render(request, template_name, context, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
 
 
 def signup_view(request):
@@ -20,6 +29,11 @@ def signup_view(request):
         password = request.POST.get('password', '')
         confirm_password = request.POST.get('confirm_password', '')
 
+        # Checked before create_user(), which hashes the password.
+        retry_after = check_attempt(request, 'signup', email)
+        if retry_after:
+            return _too_many_attempts(request, 'auth/signup.html', retry_after, {'email': email})
+
         if not all([email, password, confirm_password]):
             messages.error(request, 'All fields are required.')
             return render(request, 'auth/signup.html', {'email': email})
@@ -28,9 +42,14 @@ def signup_view(request):
             messages.error(request, 'Passwords do not match.')
             return render(request, 'auth/signup.html', {'email': email})
 
+        # One account per address, whatever its case; see accounts/models.py
+        if CustomUser.objects.with_email(email).exists():
+            messages.error(request, 'An account with this email already exists.')
+            return render(request, 'auth/signup.html', {'email': email})
+
         try:
             user = CustomUser.objects.create_user(
-                email=email.lower(),
+                email=email,
                 password=password
             )
             login(request, user)
@@ -46,8 +65,12 @@ def signup_view(request):
 
 def signin_view(request):
     if request.method == 'POST':
-        email = request.POST.get('email')
+        email = (request.POST.get('email') or '').strip()
         password = request.POST.get('password')
+        # Checked before authenticate(), which hashes the password.
+        retry_after = check_attempt(request, 'signin', email)
+        if retry_after:
+            return _too_many_attempts(request, 'auth/signin.html', retry_after)
         user = authenticate(request, email=email, password=password)
         if user is not None:
             login(request, user)
@@ -67,7 +90,12 @@ def profile_edit_view(request):
     if request.method == 'POST':
         form = ProfileForm(request.POST, request.FILES, instance=profile)
         if form.is_valid():
+            picture_changed = 'profile_picture' in form.changed_data
+            if picture_changed:
+                profile.profile_picture_variants = {}
             form.save()
+            if picture_changed:
+                schedule_derivatives(profile, 'profile_picture', AVATAR_WIDTHS)
             messages.success(request, 'Your profile has been updated successfully!')
             return redirect('auth:profile')
     else:
@@ -80,7 +108,7 @@ def profile_edit_view(request):
 @login_required
 def profile_view(request):
     try:
-        profile = Profile.objects.get(user=request.user)
+        profile = request.user.profile  # Loaded along with the cached user.
     except Profile.DoesNotExist:
         messages.info(request, 'Please create your profile.')
         return redirect('auth:profile_edit')
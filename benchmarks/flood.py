@@ -0,0 +1,91 @@
+"""
+Sign-in throughput for real users while an attacker floods the form.
+
+Attacker threads post wrong passwords for made-up addresses from a few
+IPs as fast as they can. User threads sign seeded users in with the right
+password, each attempt from its own IP, and count the successful ones.
+Run once with the rate limiter off and once with it on: with it on, the
+attacker's requests are turned away before any password hashing, so the
+hashing time goes to the real users instead.
+"""
+import itertools
+import threading
+import time
+
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from accounts.models import CustomUser
+from .runner import percentile
+from .seed import SEED_PASSWORD
+
+
+def _worker(stop, attempt):
+    client = Client(raise_request_exception=False)
+    try:
+        while not stop.is_set():
+            attempt(client)
+    finally:
+        connections.close_all()
+
+
+def run_flood(emails, duration=60.0, users=2, attackers=8, attacker_ips=1, rate_limit=True):
+    """Runs the flood for ``duration`` seconds and returns the counts."""
+    url = reverse('auth:signin')
+    stop = threading.Event()
+    lock = threading.Lock()
+    signins, rejected, timings = [0], [0], []
+    next_email = itertools.cycle(emails).__next__
+    addresses = itertools.count(1)
+
+    def sign_in(client):
+        with lock:
+            email, n = next_email(), next(addresses)
+        start = time.perf_counter()
+        response = client.post(
+            url, {'email': email, 'password': SEED_PASSWORD}, REMOTE_ADDR=f'10.1.{n // 250 % 250}.{n % 250 + 1}',
+        )
+        elapsed = time.perf_counter() - start
+        client.cookies.clear()
+        with lock:
+            timings.append(elapsed)
+            signins[0] += response.status_code == 302
+
+    def attack(client):
+        with lock:
+            n = next(addresses)
+        response = client.post(
+            url, {'email': f'victim-{n}@example.com', 'password': 'guess'},
+            REMOTE_ADDR=f'203.0.113.{n % attacker_ips + 1}',
+        )
+        with lock:
+            rejected[0] += response.status_code == 429
+
+    with override_settings(ACCOUNTS_RATE_LIMIT_ENABLED=rate_limit):
+        threads = [threading.Thread(target=_worker, args=(stop, attack)) for _ in range(attackers)]
+        threads += [threading.Thread(target=_worker, args=(stop, sign_in)) for _ in range(users)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    timings.sort()
+    return {
+        'rate_limit': rate_limit,
+        'signins': signins[0],
+        'signins_per_second': round(signins[0] / elapsed, 2),
+        'signin_p95_ms': round(percentile(timings, 95) * 1000, 1) if timings else None,
+        'attacks_rejected': rejected[0],
+    }
+
+
+def seeded_emails(prefix='perf'):
+    emails = list(CustomUser.objects.filter(email__startswith=f'{prefix}-').values_list('email', flat=True))
+    if not emails:
+        raise ValueError('No seeded users to sign in; run seed_perf_data first.')
+    return emails
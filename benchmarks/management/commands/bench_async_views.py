@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from benchmarks.sync_views import run_comparison
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the async toggle_like and feed page views with synchronous copies '
+        'of them under ASGI, at the given concurrency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=400)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent requests.')
+
+    def handle(self, *args, iterations, warmup, concurrency, **options):
+        # The test client sends Host: testserver.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            try:
+                rows = run_comparison(iterations, warmup, concurrency)
+            except ValueError as exc:
+                raise CommandError(exc)
+        for row in rows:
+            self.stdout.write(
+                f"{row['label']:<35} {row['views']:<5} {row['status']:>3}  p50 {row['p50_ms']:>8.2f}ms  "
+                f"p95 {row['p95_ms']:>8.2f}ms  {row['rps']:>8.1f} req/s"
+            )
@@ -0,0 +1,54 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from benchmarks.flood import run_flood, seeded_emails
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures sign-in throughput for seeded users during a credential-stuffing flood, '
+        'with the rate limiter off and then on.'
+    )
+
+    def add_arguments(self, parser):
+        # The per-IP limit only bites once the attacker has used up its
+        # window, so runs much shorter than the window show little difference.
+        parser.add_argument('--duration', type=float, default=60.0, help='Seconds per run.')
+        parser.add_argument('--users', type=int, default=2, help='Threads signing in seeded users.')
+        parser.add_argument('--attackers', type=int, default=8, help='Threads flooding the form.')
+        parser.add_argument('--attacker-ips', type=int, default=1)
+        # Sign-ins cycle through these users; seed enough of them that none
+        # reaches the per-email limit.
+        parser.add_argument('--prefix', default='perf', help='Email prefix of the seeded users.')
+
+    def handle(self, *args, duration, users, attackers, attacker_ips, prefix, **options):
+        try:
+            emails = seeded_emails(prefix)
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        # The test client sends Host: testserver. Every hashing request is
+        # slow here, so keep the slow-request log quiet.
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], METRICS_SAMPLE_RATE=0, METRICS_SLOW_SAMPLE_RATE=0,
+        ):
+            # Every rejected attempt would otherwise log a "Too Many Requests" warning.
+            request_logger = logging.getLogger('django.request')
+            level = request_logger.level
+            request_logger.setLevel(logging.ERROR)
+            try:
+                self.run(emails, duration, users, attackers, attacker_ips)
+            finally:
+                request_logger.setLevel(level)
+
+    def run(self, emails, duration, users, attackers, attacker_ips):
+        for rate_limit in (False, True):
+            row = run_flood(emails, duration, users, attackers, attacker_ips, rate_limit)
+            self.stdout.write(
+                f"rate limit {'on ' if rate_limit else 'off'}  {row['signins']:>6} sign-ins  "
+                f"{row['signins_per_second']:>8.2f}/s  p95 {row['signin_p95_ms']}ms  "
+                f"{row['attacks_rejected']} attacks rejected"
+            )
@@ -0,0 +1,77 @@
+import json
+import subprocess
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from benchmarks import runner
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Times every URL of the project and reports latency percentiles, queries, '
+        'template render time and throughput.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--client', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--concurrency', type=int, default=1, help='Concurrent requests (ASGI client only).')
+        parser.add_argument('--only', action='append', default=[], help='Only run URL names containing this text.')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--compare', help='A previous --output file to print changes against.')
+
+    def handle(self, *args, iterations, warmup, client, concurrency, only, output, compare, **options):
+        try:
+            scenarios = runner.discover_scenarios()
+        except ValueError as exc:
+            raise CommandError(exc)
+        if only:
+            scenarios = [s for s in scenarios if any(text in s.name for text in only)]
+
+        rows = []
+        for scenario in scenarios:
+            # The test clients send Host: testserver.
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                if client == 'asgi':
+                    row = runner.run_asgi(scenario, iterations, warmup, concurrency)
+                else:
+                    row = runner.run_wsgi(scenario, iterations, warmup)
+            rows.append(row)
+            if options['verbosity']:
+                self.stdout.write(
+                    f"{row['label']:<45} {row['status']:>3}  p50 {row['p50_ms']:>8.2f}ms  "
+                    f"p95 {row['p95_ms']:>8.2f}ms  p99 {row['p99_ms']:>8.2f}ms  "
+                    f"{row['queries'] if row['queries'] is not None else '-':>6} q  "
+                    f"tpl {row['template_ms'] if row['template_ms'] is not None else '-':>6}ms  "
+                    f"{row['rps']:>8.1f} req/s"
+                )
+
+        results = {
+            'commit': _git_commit(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'client': client,
+            'concurrency': concurrency,
+            'iterations': iterations,
+            'results': rows,
+        }
+        if output:
+            with open(output, 'w') as f:
+                json.dump(results, f, indent=2)
+        if compare:
+            with open(compare) as f:
+                baseline = json.load(f)
+            for label, key, before, after in runner.compare(baseline, results):
+                self.stdout.write(f'{label:<45} {key:<8} {before} -> {after}')
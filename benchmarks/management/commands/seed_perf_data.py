@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from benchmarks.seed import SEED_PASSWORD, Seeder
+
+
+class Command(BaseCommand):
+    help = 'Fills the database with skewed synthetic users, posts, likes, comments, jobs and applicants.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--likes', type=int, default=50000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--jobs', type=int, default=200)
+        parser.add_argument('--applicants', type=int, default=5000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for repeatable data sets.')
+        parser.add_argument('--prefix', default='perf', help='Email prefix of the generated users.')
+
+    def handle(self, *args, **options):
+        seeder = Seeder(
+            users=options['users'], posts=options['posts'], likes=options['likes'],
+            comments=options['comments'], jobs=options['jobs'], applicants=options['applicants'],
+            batch_size=options['batch_size'], seed=options['seed'], prefix=options['prefix'],
+            stdout=self.stdout if options['verbosity'] > 1 else None,
+        )
+        seeder.run()
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded data; every generated user signs in with "{SEED_PASSWORD}".'
+        ))
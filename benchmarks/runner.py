@@ -0,0 +1,192 @@
+"""
+Drives every URL in the project through Django's test clients and times it.
+
+Scenarios are discovered from the URL resolver, so a new view is
+benchmarked without being listed here. URL arguments are filled from the
+seeded data: the most-liked post for ``<slug>`` and the job with the most
+applicants for ``<pk>``. Each request is made as the owner of that object
+so that owner-only pages render rather than redirect. Query counts and
+template render times come from the Server-Timing header written by
+Quiz4/instrumentation.py.
+"""
+import asyncio
+import math
+import re
+import statistics
+import time
+
+from django.db import reset_queries
+from django.db.models import Count
+from django.test import AsyncClient, Client
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from jobs.models import Job
+from posts.models import Post
+
+# Views that change state in a way that would break the rest of the run,
+# and the batch like API, which needs a JSON body.
+SKIP = {'auth:signout', 'auth:signin', 'auth:signup', 'posts:like-batch'}
+# Views that only accept POST. toggle-like flips back and forth, so an even
+# number of iterations leaves the data as it was.
+POST = {'posts:toggle-like'}
+# Cached for anonymous visitors, so also measured without a session.
+ANONYMOUS = {'jobs:list', 'jobs:detail'}
+
+_QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+_TEMPLATE_RE = re.compile(r'tpl;dur=([\d.]+)')
+
+
+class Scenario:
+    def __init__(self, name, url, method='get', user=None):
+        self.name = name
+        self.url = url
+        self.method = method
+        self.user = user
+
+    @property
+    def label(self):
+        return f'{self.name} ({"anonymous" if self.user is None else "signed in"})'
+
+
+def _walk(patterns, namespace=None):
+    for entry in patterns:
+        if isinstance(entry, URLResolver):
+            if entry.namespace == 'admin':
+                continue
+            inner = ':'.join(filter(None, [namespace, entry.namespace]))
+            yield from _walk(entry.url_patterns, inner or None)
+        elif isinstance(entry, URLPattern) and entry.name:
+            yield (f'{namespace}:{entry.name}' if namespace else entry.name), entry.pattern.converters
+
+
+def discover_scenarios():
+    post = Post.objects.select_related('user').order_by('-like_count', '-pk').first()
+    job = Job.objects.select_related('user').annotate(
+        applicants=Count('jobapplicant'),
+    ).order_by('-applicants', '-pk').first()
+    if post is None or job is None:
+        raise ValueError('No posts or jobs to benchmark; run seed_perf_data first.')
+
+    values = {'slug': post.slug, 'pk': job.pk}
+    scenarios = []
+    for name, converters in _walk(get_resolver().url_patterns):
+        if name in SKIP or not set(converters) <= set(values):
+            continue
+        url = reverse(name, kwargs={key: values[key] for key in converters})
+        owner = job.user if name.startswith('jobs:') else post.user
+        method = 'post' if name in POST else 'get'
+        scenarios.append(Scenario(name, url, method, owner))
+        if name in ANONYMOUS:
+            scenarios.append(Scenario(name, url, method))
+    return scenarios
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, math.ceil(pct / 100 * len(samples)) - 1)
+    return samples[index]
+
+
+def summarize(scenario, timings, query_counts, template_ms, status, elapsed):
+    timings = sorted(timings)
+    return {
+        'name': scenario.name,
+        'label': scenario.label,
+        'method': scenario.method.upper(),
+        'url': scenario.url,
+        'status': status,
+        'requests': len(timings),
+        'p50_ms': round(percentile(timings, 50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 95) * 1000, 2),
+        'p99_ms': round(percentile(timings, 99) * 1000, 2),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 2),
+        'queries': round(statistics.fmean(query_counts), 2) if query_counts else None,
+        'template_ms': round(statistics.median(template_ms), 2) if template_ms else None,
+        'rps': round(len(timings) / elapsed, 1) if elapsed else None,
+    }
+
+
+def _consume(response):
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+
+
+def _queries(response):
+    match = _QUERIES_RE.search(response.get('Server-Timing', ''))
+    return int(match.group(1)) if match else None
+
+
+def _template_ms(response):
+    match = _TEMPLATE_RE.search(response.get('Server-Timing', ''))
+    return float(match.group(1)) if match else None
+
+
+def run_wsgi(scenario, iterations, warmup):
+    # A view that errors is reported with status 500 instead of ending the run.
+    client = Client(raise_request_exception=False)
+    if scenario.user is not None:
+        client.force_login(scenario.user)
+    request = getattr(client, scenario.method)
+    for _ in range(warmup):
+        _consume(request(scenario.url))
+
+    timings, query_counts, template_ms, status = [], [], [], None
+    started = time.perf_counter()
+    for _ in range(iterations):
+        reset_queries()  # connection.queries grows without bound under DEBUG.
+        start = time.perf_counter()
+        response = request(scenario.url)
+        _consume(response)
+        timings.append(time.perf_counter() - start)
+        status = response.status_code
+        if (count := _queries(response)) is not None:
+            query_counts.append(count)
+        if (ms := _template_ms(response)) is not None:
+            template_ms.append(ms)
+    return summarize(scenario, timings, query_counts, template_ms, status, time.perf_counter() - started)
+
+
+async def _run_asgi(scenario, iterations, warmup, concurrency):
+    client = AsyncClient(raise_request_exception=False)
+    if scenario.user is not None:
+        await client.aforce_login(scenario.user)
+    request = getattr(client, scenario.method)
+    for _ in range(warmup):
+        await request(scenario.url)
+
+    timings, query_counts, template_ms, statuses = [], [], [], []
+    remaining = iter(range(iterations))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await request(scenario.url)
+            timings.append(time.perf_counter() - start)
+            statuses.append(response.status_code)
+            if (count := _queries(response)) is not None:
+                query_counts.append(count)
+            if (ms := _template_ms(response)) is not None:
+                template_ms.append(ms)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(scenario, timings, query_counts, template_ms, statuses[-1], time.perf_counter() - started)
+
+
+def run_asgi(scenario, iterations, warmup, concurrency=1):
+    return asyncio.run(_run_asgi(scenario, iterations, warmup, concurrency))
+
+
+def compare(baseline, results, keys=('p50_ms', 'p95_ms', 'queries', 'template_ms')):
+    """Rows of (label, key, before, after) for scenarios present in both runs."""
+    before = {row['label']: row for row in baseline['results']}
+    changes = []
+    for row in results['results']:
+        old = before.get(row['label'])
+        if old is None:
+            continue
+        for key in keys:
+            if old.get(key) != row.get(key):
+                changes.append((row['label'], key, old.get(key), row.get(key)))
+    return changes
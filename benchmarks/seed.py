@@ -0,0 +1,180 @@
+"""
+Synthetic data for benchmarks.
+
+Activity follows a power law the way it does on a real site: a few posts
+go viral and collect most likes and comments, a few jobs get most of the
+applications, and a minority of users write most of the posts. Everything
+is written with bulk_create(), so signals do not run; the denormalized
+counters and the page cache versions are brought up to date at the end.
+"""
+import io
+import itertools
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import CustomUser, Profile
+from jobs.models import Job, JobApplicant
+from jobs.page_cache import GLOBAL_VERSION_KEY, bump_version
+from posts.models import Comment, Like, Post
+
+# Everyone seeded can sign in with this password.
+SEED_PASSWORD = 'perf-password'
+RESUME_NAME = 'resumes/seed-resume.pdf'
+# Spread of created_at values, so the feed has a realistic time range.
+HISTORY = timedelta(days=90)
+
+TOPICS = ['Django', 'remote work', 'hiring', 'databases', 'design', 'careers', 'Python', 'startups']
+SENIORITY = ['Junior', 'Mid-level', 'Senior', 'Lead']
+ROLES = ['Backend Developer', 'Frontend Developer', 'Data Analyst', 'Designer', 'DevOps Engineer', 'Chef']
+LOCATIONS = ['Manila', 'Cebu', 'Davao', 'Remote', 'Singapore', 'Tokyo']
+
+
+def zipf_weights(n, exponent=1.1):
+    """Weights for picking item i (0-based) with probability ~ 1 / (i + 1) ** exponent."""
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+def skewed_sample(rng, items, cum_weights, k):
+    return rng.choices(items, cum_weights=cum_weights, k=k)
+
+
+def unique_pairs(rng, left, left_weights, right, count, max_tries=10):
+    """Up to ``count`` distinct (left, right) pairs, ``left`` drawn with skew."""
+    pairs = set()
+    for _ in range(max_tries):
+        needed = count - len(pairs)
+        if needed <= 0:
+            break
+        lefts = skewed_sample(rng, left, left_weights, needed)
+        pairs.update(zip(lefts, rng.choices(right, k=needed)))
+    return list(pairs)[:count]
+
+
+def _spread_created_at(rng, model, objs, batch_size):
+    now = timezone.now()
+    for obj in objs:
+        obj.created_at = now - HISTORY * rng.random() ** 2  # Recent activity is denser.
+    model.objects.bulk_update(objs, ['created_at'], batch_size=batch_size)
+
+
+class Seeder:
+    def __init__(self, users=1000, posts=5000, likes=50000, comments=10000, jobs=200, applicants=5000,
+                 staff_ratio=0.05, batch_size=1000, seed=0, prefix='perf', stdout=None):
+        self.counts = {
+            'users': users, 'posts': posts, 'likes': likes,
+            'comments': comments, 'jobs': jobs, 'applicants': applicants,
+        }
+        self.staff_ratio = staff_ratio
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.prefix = prefix
+        self.stdout = stdout
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def run(self):
+        with transaction.atomic():
+            users = self.seed_users()
+            posts = self.seed_posts(users)
+            self.seed_likes(users, posts)
+            self.seed_comments(users, posts)
+            jobs = self.seed_jobs(users)
+            self.seed_applicants(users, jobs)
+        call_command('reconcile_post_counters', batch_size=self.batch_size, stdout=self.stdout or io.StringIO())
+        bump_version(GLOBAL_VERSION_KEY)
+        return self.counts
+
+    def seed_users(self):
+        start = CustomUser.objects.filter(email__startswith=f'{self.prefix}-').count()
+        password = make_password(SEED_PASSWORD)
+        staff_every = max(1, round(1 / self.staff_ratio)) if self.staff_ratio else 0
+        users = CustomUser.objects.bulk_create(
+            (
+                CustomUser(
+                    email=f'{self.prefix}-{start + i}@example.com', password=password,
+                    is_staff=bool(staff_every) and i % staff_every == 0,
+                )
+                for i in range(self.counts['users'])
+            ),
+            batch_size=self.batch_size,
+        )
+        Profile.objects.bulk_create(
+            (Profile(user=user, first_name='Perf', last_name=str(user.pk)) for user in users),
+            batch_size=self.batch_size,
+        )
+        self.log(f'{len(users)} users with profiles')
+        return users
+
+    def seed_posts(self, users):
+        authors = skewed_sample(self.rng, users, zipf_weights(len(users)), self.counts['posts'])
+        posts = Post.objects.bulk_create(
+            [
+                Post(user=author, content=f'Perf post {i} about {self.rng.choice(TOPICS)}.')
+                for i, author in enumerate(authors)
+            ],
+            batch_size=self.batch_size,
+        )
+        _spread_created_at(self.rng, Post, posts, self.batch_size)
+        self.log(f'{len(posts)} posts')
+        return posts
+
+    def seed_likes(self, users, posts):
+        pairs = unique_pairs(self.rng, posts, zipf_weights(len(posts)), users, self.counts['likes'])
+        Like.objects.bulk_create(
+            (Like(post=post, user=user) for post, user in pairs),
+            batch_size=self.batch_size, ignore_conflicts=True,
+        )
+        self.log(f'{len(pairs)} likes')
+
+    def seed_comments(self, users, posts):
+        targets = skewed_sample(self.rng, posts, zipf_weights(len(posts)), self.counts['comments'])
+        comments = Comment.objects.bulk_create(
+            [
+                Comment(post=post, user=self.rng.choice(users), content=f'Perf comment {i}.')
+                for i, post in enumerate(targets)
+            ],
+            batch_size=self.batch_size,
+        )
+        _spread_created_at(self.rng, Comment, comments, self.batch_size)
+        self.log(f'{len(comments)} comments')
+
+    def seed_jobs(self, users):
+        posters = [user for user in users if user.is_staff] or users[:1]
+        jobs = Job.objects.bulk_create(
+            [
+                Job(
+                    user=self.rng.choice(posters),
+                    job_title=f'{self.rng.choice(SENIORITY)} {self.rng.choice(ROLES)}',
+                    job_description=f'Perf job {i} working on {self.rng.choice(TOPICS)}.',
+                    min_offer=1000 * (i % 50 + 1), max_offer=1000 * (i % 50 + 2),
+                    location=self.rng.choice(LOCATIONS),
+                )
+                for i in range(self.counts['jobs'])
+            ],
+            batch_size=self.batch_size,
+        )
+        self.log(f'{len(jobs)} jobs')
+        return jobs
+
+    def seed_applicants(self, users, jobs):
+        pairs = unique_pairs(self.rng, jobs, zipf_weights(len(jobs)), users, self.counts['applicants'])
+        statuses = [status for status, _ in JobApplicant.STATUS_CHOICES]
+        JobApplicant.objects.bulk_create(
+            (
+                JobApplicant(
+                    job=job, user=user, resume=RESUME_NAME,
+                    status=self.rng.choices(statuses, weights=[70, 15, 5, 10])[0],
+                )
+                for job, user in pairs
+            ),
+            batch_size=self.batch_size, ignore_conflicts=True,
+        )
+        self.log(f'{len(pairs)} applicants')
+
@@ -0,0 +1,77 @@
+"""
+Synchronous copies of the async views, to benchmark the async ones against.
+
+toggle_like and post_feed_page in posts/views.py are async so that under
+ASGI they run in the event loop instead of taking a worker thread per
+request. This module serves them as they would be written synchronously,
+from a URLconf that is the project's with only those two views swapped.
+``run_comparison()`` times both versions through the ASGI client at the
+same concurrency.
+"""
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.test import override_settings
+from django.urls import include, path
+
+from posts import urls as posts_urls
+from posts.likes import liked_post_ids
+from posts.models import Like, Post
+from posts.pagination import InvalidCursor, KeysetPaginator
+from posts.views import PostListView
+from Quiz4.db_router import replica_reads
+from . import runner
+
+SCENARIOS = ('posts:toggle-like', 'posts:post-feed-page')
+
+
+def toggle_like(request, slug):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    post = get_object_or_404(Post.objects.only('pk'), slug=slug)
+    like, created = Like.objects.get_or_create(user=request.user, post=post)
+    if not created:
+        like.delete()
+    like_count = Post.objects.filter(pk=post.pk).values_list('like_count', flat=True).get()
+    return JsonResponse({'liked': created, 'like_count': like_count})
+
+
+@replica_reads
+def post_feed_page(request):
+    if not request.user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    paginator = KeysetPaginator(Post.objects.select_related('user'), PostListView.paginate_by)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404('Invalid feed cursor.')
+    context = {
+        'object_list': page.object_list,
+        'page_obj': page,
+        'liked_post_ids': liked_post_ids(request.user, [post.pk for post in page]),
+    }
+    return render(request, 'posts/post_feed_page.html', context)
+
+
+# Listed first, so they win over the async views of the same path and name.
+urlpatterns = [
+    path('auth/', include('accounts.urls', namespace='auth')),
+    path('jobs/', include('jobs.urls', namespace='jobs')),
+    path('', include(([
+        path('feed/page/', post_feed_page, name='post-feed-page'),
+        path('like/<slug:slug>/', toggle_like, name='toggle-like'),
+        *posts_urls.urlpatterns,
+    ], posts_urls.app_name))),
+]
+
+
+def run_comparison(iterations, warmup, concurrency):
+    """Rows of runner results, the sync then the async view for each scenario."""
+    scenarios = [s for s in runner.discover_scenarios() if s.name in SCENARIOS]
+    rows = []
+    for scenario in scenarios:
+        for views, urlconf in (('sync', __name__), ('async', 'Quiz4.urls')):
+            with override_settings(ROOT_URLCONF=urlconf):
+                row = runner.run_asgi(scenario, iterations, warmup, concurrency)
+            rows.append({**row, 'views': views})
+    return rows
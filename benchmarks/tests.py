@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from accounts.models import CustomUser, Profile
+from jobs.models import Job, JobApplicant
+from posts.models import Comment, Like, Post
+from .flood import run_flood
+from .runner import compare, discover_scenarios, percentile, run_wsgi
+
+
+class SeedPerfDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_perf_data', users=40, posts=60, likes=300, comments=80, jobs=10, applicants=60,
+            batch_size=25, stdout=StringIO(),
+        )
+
+    def test_creates_every_kind_of_row(self):
+        self.assertEqual(CustomUser.objects.count(), 40)
+        self.assertEqual(Profile.objects.count(), 40)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 80)
+        self.assertEqual(Job.objects.count(), 10)
+        self.assertGreater(Like.objects.count(), 250)
+        self.assertGreater(JobApplicant.objects.count(), 50)
+
+    def test_counters_match_rows(self):
+        for post in Post.objects.annotate(likes=Count('like', distinct=True), comments=Count('comment', distinct=True)):
+            self.assertEqual((post.like_count, post.comment_count), (post.likes, post.comments))
+
+    def test_activity_is_skewed(self):
+        counts = list(Post.objects.order_by('-like_count').values_list('like_count', flat=True))
+        self.assertGreater(counts[0], 3 * counts[len(counts) // 2])
+
+    def test_seeding_again_adds_new_users(self):
+        call_command('seed_perf_data', users=5, posts=1, likes=1, comments=1, jobs=1, applicants=1, stdout=StringIO())
+        self.assertEqual(CustomUser.objects.count(), 45)
+
+
+class BenchmarkRunnerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_perf_data', users=10, posts=10, likes=20, comments=10, jobs=3, applicants=10, stdout=StringIO(),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_every_project_url_is_covered(self):
+        names = {scenario.name for scenario in discover_scenarios()}
+        self.assertTrue({'posts:post-detail', 'posts:toggle-like', 'jobs:detail', 'auth:profile'} <= names)
+        self.assertNotIn('auth:signout', names)
+
+    def test_run_reports_latency_and_queries(self):
+        scenario = next(s for s in discover_scenarios() if s.name == 'jobs:detail' and s.user)
+        row = run_wsgi(scenario, iterations=4, warmup=1)
+        self.assertEqual(row['status'], 200)
+        self.assertEqual(row['requests'], 4)
+        self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+        self.assertGreater(row['queries'], 0)
+
+    def test_command_writes_json_and_compares(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'bench.json')
+            call_command('run_benchmarks', iterations=2, warmup=0, only=['jobs:list'], output=output, verbosity=0)
+            with open(output) as f:
+                results = json.load(f)
+        self.assertEqual({row['label'] for row in results['results']}, {'jobs:list (signed in)', 'jobs:list (anonymous)'})
+
+        slower = json.loads(json.dumps(results))
+        slower['results'][0]['queries'] += 1
+        self.assertEqual(len(compare(results, slower, keys=['queries'])), 1)
+
+    def test_percentile_is_nearest_rank(self):
+        samples = list(range(1, 101))
+        self.assertEqual((percentile(samples, 50), percentile(samples, 99)), (50, 99))
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    ACCOUNTS_RATE_LIMITS={'signin': {'ip': (5, 60), 'email': (100, 60)}},
+)
+class SigninFloodTests(TransactionTestCase):
+    # Not TestCase: the flood runs in threads, which need committed users.
+    def setUp(self):
+        cache.clear()
+        call_command('seed_perf_data', users=5, posts=1, likes=1, comments=1, jobs=1, applicants=1, stdout=StringIO())
+
+    def test_attackers_are_turned_away_and_users_still_sign_in(self):
+        emails = list(CustomUser.objects.values_list('email', flat=True))
+        row = run_flood(emails, duration=0.5, users=1, attackers=2)
+        self.assertGreater(row['signins'], 0)
+        self.assertGreater(row['attacks_rejected'], 0)
+
+
+class AsyncViewsBenchmarkTests(TransactionTestCase):
+    # Not TestCase: the async ORM runs in another thread, which needs committed rows.
+    def setUp(self):
+        cache.clear()
+        call_command('seed_perf_data', users=5, posts=5, likes=5, comments=1, jobs=1, applicants=1, stdout=StringIO())
+
+    def test_async_views_are_compared_with_sync_copies(self):
+        out = StringIO()
+        call_command('bench_async_views', iterations=2, warmup=0, concurrency=2, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[3] for line in lines], ['sync', 'async'] * 2)
+        self.assertTrue(all(' 200 ' in line for line in lines))
@@ -0,0 +1,95 @@
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from blobs.models import Blob
+from blobs.signals import GRACE_PERIOD, blob_fields, delete_unused_blob
+from blobs.storage import PREFIX, blob_storage, is_blob_name
+
+
+class Command(BaseCommand):
+    help = 'Recounts blob references from every file field and deletes unreferenced blobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=GRACE_PERIOD,
+                            help='Keep unreferenced blobs younger than this many seconds.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, grace, dry_run, **options):
+        fields = [(model, field) for model in apps.get_models() for field in blob_fields(model)]
+        counts = Counter()
+        for model, field in fields:
+            names = model._default_manager.exclude(**{field.attname: ''}).values_list(field.attname, flat=True)
+            counts.update(name for name in names.iterator(chunk_size=5000) if is_blob_name(name))
+
+        # The scan above is only a snapshot: references added or dropped
+        # since then are already in the refcount. Blobs that look wrong are
+        # recounted inside their UPDATE, so the stored count is never older
+        # than the statement that writes it.
+        fixed = 0
+        recount = self.reference_count(fields)
+        for name, refcount in Blob.objects.values_list('name', 'refcount').iterator(chunk_size=5000):
+            if counts.get(name, 0) != refcount:
+                fixed += 1
+                if not dry_run:
+                    Blob.objects.filter(name=name).update(refcount=recount)
+
+        cutoff = timezone.now() - timedelta(seconds=grace)
+        collected = 0
+        for name in Blob.objects.filter(refcount=0, updated_at__lte=cutoff).values_list('name', flat=True):
+            if dry_run:
+                collected += 1
+                continue
+            if delete_unused_blob(name, cutoff):
+                collected += 1
+
+        orphans = self.sweep_orphan_files(cutoff.timestamp(), dry_run)
+
+        if not options['verbosity']:
+            return
+        verb = 'Would fix' if dry_run else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {fixed} reference counts; {collected} unreferenced blobs and '
+            f'{orphans} orphaned files collected.'
+        ))
+
+    def reference_count(self, fields):
+        """An expression counting the file fields that refer to the blob row."""
+        total = Value(0)
+        for model, field in fields:
+            references = (
+                model._default_manager.filter(**{field.attname: OuterRef('name')})
+                .order_by().values(field.attname).annotate(total=Count('pk')).values('total')
+            )
+            total += Coalesce(Subquery(references, output_field=IntegerField()), 0)
+        return total
+
+    def sweep_orphan_files(self, cutoff, dry_run):
+        """
+        Deletes old files under cas/ that have no Blob row.
+
+        They are left by uploads whose transaction rolled back (for
+        example a duplicate job application) or by interrupted uploads.
+        """
+        root = blob_storage.path(PREFIX)
+        removed = 0
+        for dirpath, _, filenames in os.walk(root):
+            paths = {
+                os.path.relpath(os.path.join(dirpath, filename), blob_storage.location).replace(os.sep, '/'):
+                    os.path.join(dirpath, filename)
+                for filename in filenames
+            }
+            known = set(Blob.objects.filter(name__in=list(paths)).values_list('name', flat=True))
+            for name, path in paths.items():
+                if name in known or os.path.getmtime(path) > cutoff:
+                    continue
+                removed += 1
+                if not dry_run:
+                    os.remove(path)
+        return removed
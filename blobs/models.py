@@ -0,0 +1,14 @@
+from django.db import models
+
+
+class Blob(models.Model):
+    """One stored file, shared by every row that uploaded the same bytes."""
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.BigIntegerField()
+    # Number of model rows whose file field points at this blob.
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount} refs)'
@@ -0,0 +1,106 @@
+import shutil
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DEFERRED, F, FileField
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_init, post_save, post_delete
+from django.utils import timezone
+
+from tasks.queue import enqueue, task
+from .models import Blob
+from .storage import ContentAddressedStorage, derivatives_dir, is_blob_name
+
+# Unreferenced blobs are kept this long in case the same bytes are uploaded
+# again, which also closes the race with an upload that found them on disk.
+GRACE_PERIOD = getattr(settings, 'BLOBS_GRACE_PERIOD', 60 * 60)
+
+
+def blob_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+def add_reference(name):
+    if is_blob_name(name):
+        Blob.objects.filter(name=name).update(refcount=F('refcount') + 1, updated_at=timezone.now())
+
+
+def drop_reference(name):
+    if not is_blob_name(name):
+        return
+    Blob.objects.filter(name=name).update(refcount=Greatest(F('refcount') - 1, 0), updated_at=timezone.now())
+    if Blob.objects.filter(name=name, refcount=0).exists():
+        enqueue(collect_blob, name, delay=GRACE_PERIOD)
+
+
+def delete_unused_blob(name, cutoff):
+    """
+    Deletes the blob ``name`` with its file and derivatives if it has been
+    unreferenced since ``cutoff``. Returns whether it did.
+    """
+    from .storage import blob_storage
+    with transaction.atomic():
+        # The row stays locked (on SQLite, the database write lock taken by
+        # the IMMEDIATE transaction) until the files are gone. An upload of
+        # the same bytes touches the row first, so it either made the blob
+        # recent before this check or waits and then stores the file anew.
+        blob = Blob.objects.select_for_update().filter(name=name, refcount=0, updated_at__lte=cutoff).first()
+        if blob is None:
+            return False
+        blob.delete()
+        blob_storage.delete(name)
+        shutil.rmtree(blob_storage.path(derivatives_dir(name)), ignore_errors=True)
+    return True
+
+
+@task
+def collect_blob(name):
+    """Deletes a blob that is still unreferenced after the grace period."""
+    delete_unused_blob(name, timezone.now() - timedelta(seconds=GRACE_PERIOD))
+
+
+def _stored_name(value):
+    if value is DEFERRED or value is None or isinstance(value, str):
+        return value
+    # A FieldFile already in storage, or a new upload that is not yet saved.
+    return value.name if getattr(value, '_committed', False) else None
+
+
+def _remember_names(sender, instance, **kwargs):
+    instance._blob_names = {
+        field.attname: _stored_name(instance.__dict__.get(field.attname, DEFERRED))
+        for field in blob_fields(sender)
+    }
+
+
+def _count_changes(sender, instance, update_fields=None, **kwargs):
+    remembered = getattr(instance, '_blob_names', {})
+    for field in blob_fields(sender):
+        if update_fields is not None and field.name not in update_fields:
+            continue
+        old = remembered.get(field.attname)
+        if old is DEFERRED:
+            continue  # Never loaded, so we cannot tell what it replaced.
+        new = getattr(instance, field.attname).name
+        if old != new:
+            add_reference(new)
+            drop_reference(old)
+            remembered[field.attname] = new
+
+
+def _count_delete(sender, instance, **kwargs):
+    for field in blob_fields(sender):
+        drop_reference(getattr(instance, field.attname).name)
+
+
+def connect_blob_fields():
+    for model in apps.get_models():
+        if blob_fields(model):
+            post_init.connect(_remember_names, sender=model, weak=False)
+            post_save.connect(_count_changes, sender=model, weak=False)
+            post_delete.connect(_count_delete, sender=model, weak=False)
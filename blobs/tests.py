@@ -0,0 +1,131 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from jobs.models import Job, JobApplicant
+from .management.commands.gc_blobs import Command as GcBlobsCommand
+from .models import Blob
+from .signals import collect_blob
+from .storage import blob_storage, derivatives_dir
+
+User = get_user_model()
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.owner = User.objects.create_user(email='owner@example.com', password=None)
+        self.job = Job.objects.create(
+            user=self.owner, job_title='Dev', job_description='Work', min_offer=1, max_offer=2, location='Remote',
+        )
+
+    def apply(self, username, content=b'%PDF-1.4 same resume'):
+        user = User.objects.create_user(email=f'{username}@example.com', password=None)
+        return JobApplicant.objects.create(
+            job=self.job, user=user, resume=SimpleUploadedFile('cv.pdf', content),
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.apply('alice')
+        second = self.apply('bob')
+        self.assertEqual(first.resume.name, second.resume.name)
+        self.assertTrue(first.resume.name.startswith('cas/'))
+        self.assertTrue(first.resume.name.endswith('.pdf'))
+        self.assertEqual(Blob.objects.get().refcount, 2)
+        cas_files = [name for _, _, names in os.walk(blob_storage.path('cas')) for name in names]
+        self.assertEqual(len(cas_files), 1)
+
+    def test_delete_drops_reference_and_collects_after_grace(self):
+        first = self.apply('alice')
+        second = self.apply('bob')
+        name = first.resume.name
+        first.delete()
+        self.assertEqual(Blob.objects.get(name=name).refcount, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(Blob.objects.get(name=name).refcount, 0)
+        # Still inside the grace period: nothing is removed yet.
+        collect_blob(name)
+        self.assertTrue(blob_storage.exists(name))
+
+        derived = blob_storage.path(f'{derivatives_dir(name)}/640.webp')
+        os.makedirs(os.path.dirname(derived))
+        open(derived, 'wb').close()
+        Blob.objects.filter(name=name).update(updated_at=timezone.now() - timedelta(days=1))
+        collect_blob(name)
+        self.assertFalse(blob_storage.exists(name))
+        self.assertFalse(Blob.objects.filter(name=name).exists())
+        self.assertFalse(os.path.exists(blob_storage.path(derivatives_dir(name))))
+
+    def test_collection_rechecks_references(self):
+        applicant = self.apply('alice')
+        name = applicant.resume.name
+        # A collect_blob queued by an earlier drop, after the bytes were reused.
+        Blob.objects.filter(name=name).update(updated_at=timezone.now() - timedelta(days=1))
+        collect_blob(name)
+        self.assertTrue(blob_storage.exists(name))
+        self.assertEqual(Blob.objects.get(name=name).refcount, 1)
+
+    def test_gc_command_recounts_references(self):
+        applicant = self.apply('alice')
+        orphan = self.apply('bob', content=b'orphan')
+        Blob.objects.update(refcount=7)
+        orphan_name = orphan.resume.name
+        # Bypasses the signals, so only the recount notices the orphan.
+        JobApplicant.objects.filter(pk=orphan.pk).update(resume='')
+        Blob.objects.update(updated_at=timezone.now() - timedelta(days=1))
+
+        call_command('gc_blobs', verbosity=0)
+        self.assertEqual(Blob.objects.get().name, applicant.resume.name)
+        self.assertEqual(Blob.objects.get().refcount, 1)
+        self.assertFalse(blob_storage.exists(orphan_name))
+
+    def test_gc_command_keeps_references_added_during_the_scan(self):
+        self.apply('alice')
+        Blob.objects.update(refcount=7)
+        reference_count = GcBlobsCommand.reference_count
+
+        def apply_during_scan(command, fields):
+            self.apply('bob')
+            return reference_count(command, fields)
+
+        with mock.patch.object(GcBlobsCommand, 'reference_count', apply_during_scan):
+            call_command('gc_blobs', verbosity=0)
+        self.assertEqual(Blob.objects.get().refcount, 2)
+
+    def test_gc_command_sweeps_files_without_a_blob_row(self):
+        name = self.apply('alice', content=b'rolled back').resume.name
+        JobApplicant.objects.filter(resume=name).update(resume='')
+        Blob.objects.filter(name=name).delete()
+        past = (timezone.now() - timedelta(days=1)).timestamp()
+        os.utime(blob_storage.path(name), (past, past))
+
+        call_command('gc_blobs', verbosity=0)
+        self.assertFalse(blob_storage.exists(name))
+
+    def test_apply_rejects_unsupported_resume(self):
+        user = User.objects.create_user(email='carol@example.com', password=None)
+        self.client.force_login(user)
+        self.client.post(reverse('jobs:apply', args=[self.job.pk]), {
+            'resume': SimpleUploadedFile('cv.exe', b'MZ'),
+        })
+        self.assertFalse(JobApplicant.objects.exists())
+
+        self.client.post(reverse('jobs:apply', args=[self.job.pk]), {
+            'resume': SimpleUploadedFile('cv.pdf', b'%PDF-1.4'),
+        })
+        self.assertEqual(JobApplicant.objects.get().user, user)
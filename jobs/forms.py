@@ -1,6 +1,12 @@
+from decimal import Decimal, InvalidOperation
+
 from django import forms
 
-from jobs.models import Job
+from django.core.validators import FileExtensionValidator
+
+from jobs.models import Job, JobApplicant
+
+MAX_RESUME_BYTES = 5 * 1024 * 1024
 
 
 class JobForm(forms.ModelForm):
@@ -45,41 +51,116 @@ class JobForm(forms.ModelForm):
         fields = ['job_title', 'job_description', 'location', 'min_offer', 'max_offer']
 
     def clean_job_title(self):
-        job_title = self.cleaned_data.get('job_title')
-        if not job_title:
-            raise forms.ValidationError("Job title cannot be empty.")
-        return job_title
+        return require_text(self.cleaned_data.get('job_title'), 'job_title')
 
     def clean_job_description(self):
-        job_description = self.cleaned_data.get('job_description')
-        if not job_description:
-            raise forms.ValidationError("Job description cannot be empty.")
-        return job_description
+        return require_text(self.cleaned_data.get('job_description'), 'job_description')
 
     def clean_location(self):
-        location = self.cleaned_data.get('location')
-        if not location:
-            raise forms.ValidationError("Job location cannot be empty.")
-        return location
+        return require_text(self.cleaned_data.get('location'), 'location')
 
     def clean_min_offer(self):
-        min_offer = self.cleaned_data.get('min_offer')
-        if min_offer is None or min_offer < 0:
-            raise forms.ValidationError("Minimum offer must be a positive number.")
-        return min_offer
+        return require_offer(self.cleaned_data.get('min_offer'), 'min_offer')
 
     def clean_max_offer(self):
-        max_offer = self.cleaned_data.get('max_offer')
-        if max_offer is None or max_offer < 0:
-            raise forms.ValidationError("Maximum offer must be a positive number.")
-        return max_offer
+        return require_offer(self.cleaned_data.get('max_offer'), 'max_offer')
 
     def clean(self):
         cleaned_data = super().clean()
-        min_offer = cleaned_data.get('min_offer')
-        max_offer = cleaned_data.get('max_offer')
+        check_offer_range(cleaned_data.get('min_offer'), cleaned_data.get('max_offer'))
+        return cleaned_data
 
-        if min_offer is not None and max_offer is not None and min_offer > max_offer:
-            raise forms.ValidationError("Minimum offer cannot be greater than maximum offer.")
 
-        return cleaned_data
\ No newline at end of file
+class JobApplicationForm(forms.ModelForm):
+    resume = forms.FileField(
+        validators=[FileExtensionValidator(['pdf', 'doc', 'docx', 'odt', 'txt'])],
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.pdf,.doc,.docx,.odt,.txt'}),
+    )
+
+    class Meta:
+        model = JobApplicant
+        fields = ['resume']
+
+    def clean_resume(self):
+        resume = self.cleaned_data.get('resume')
+        if resume and resume.size > MAX_RESUME_BYTES:
+            raise forms.ValidationError("Resumes must be smaller than 5 MB.")
+        return resume
+
+
+# The validation rules of JobForm, shared with the bulk importer so that it
+# can check millions of rows without building a form for each one.
+JOB_ERROR_MESSAGES = {
+    'job_title': "Job title cannot be empty.",
+    'job_description': "Job description cannot be empty.",
+    'location': "Job location cannot be empty.",
+    'min_offer': "Minimum offer must be a positive number.",
+    'max_offer': "Maximum offer must be a positive number.",
+}
+
+
+def require_text(value, field):
+    if not value:
+        raise forms.ValidationError(JOB_ERROR_MESSAGES[field])
+    return value
+
+
+def require_offer(value, field):
+    if value is None or value < 0:
+        raise forms.ValidationError(JOB_ERROR_MESSAGES[field])
+    return value
+
+
+def check_offer_range(min_offer, max_offer):
+    if min_offer is not None and max_offer is not None and min_offer > max_offer:
+        raise forms.ValidationError("Minimum offer cannot be greater than maximum offer.")
+
+
+def clean_job_row(row):
+    """
+    Validates one raw import row with the same rules as JobForm.
+
+    Returns a dict of cleaned field values, or raises ValidationError.
+    """
+    cleaned = {}
+    errors = []
+    for name in ('job_title', 'job_description', 'location'):
+        value = row.get(name)
+        if value is not None and not isinstance(value, str):
+            errors.append(f"{name} must be text.")
+            continue
+        value = (value or '').strip()
+        max_length = Job._meta.get_field(name).max_length
+        try:
+            require_text(value, name)
+            if max_length and len(value) > max_length:
+                raise forms.ValidationError(f"{name} is longer than {max_length} characters.")
+            cleaned[name] = value
+        except forms.ValidationError as e:
+            errors.extend(e.messages)
+
+    for name in ('min_offer', 'max_offer'):
+        field = Job._meta.get_field(name)
+        try:
+            value = Decimal(str(row.get(name) or '').strip())
+            if not value.is_finite():
+                raise InvalidOperation
+            value = value.quantize(Decimal(10) ** -field.decimal_places)
+            if len(value.as_tuple().digits) > field.max_digits:
+                raise InvalidOperation
+        except InvalidOperation:
+            value = None
+        try:
+            cleaned[name] = require_offer(value, name)
+        except forms.ValidationError as e:
+            errors.extend(e.messages)
+
+    if not errors:
+        try:
+            check_offer_range(cleaned['min_offer'], cleaned['max_offer'])
+        except forms.ValidationError as e:
+            errors.extend(e.messages)
+
+    if errors:
+        raise forms.ValidationError(errors)
+    return cleaned
@@ -0,0 +1,12 @@
+from jobs.models import Job
+from Quiz4.bulkio import BulkExportCommand
+
+
+class Command(BulkExportCommand):
+    help = 'Streams every job out as CSV or JSON Lines with constant memory.'
+    fields = ('id', 'user_email', 'job_title', 'job_description', 'location', 'min_offer', 'max_offer')
+
+    def get_queryset(self):
+        return Job.objects.order_by('pk').values_list(
+            'pk', 'user__email', 'job_title', 'job_description', 'location', 'min_offer', 'max_offer',
+        )
@@ -0,0 +1,41 @@
+from django.core.exceptions import ValidationError
+
+from jobs.forms import clean_job_row
+from jobs.models import Job
+from jobs.page_cache import GLOBAL_VERSION_KEY, bump_version
+from Quiz4.bulkio import BulkImportCommand
+
+
+class Command(BulkImportCommand):
+    help = (
+        'Streams jobs from a CSV or JSON Lines file into the database in chunks. '
+        'Columns: job_title, job_description, location, min_offer, max_offer and '
+        'optionally user_email.'
+    )
+    model = Job
+    text_fields = ('user_email', 'job_title', 'job_description', 'location')
+
+    def run(self, *args, **kwargs):
+        try:
+            super().run(*args, **kwargs)
+        finally:
+            # bulk_create() sends no post_save, so the cached job pages are
+            # invalidated here, once, also for the chunks committed before
+            # a failure.
+            bump_version(GLOBAL_VERSION_KEY)
+
+    def build_objects(self, chunk):
+        users = self.resolve_users(chunk)
+        jobs = []
+        for number, row in chunk:
+            user_id = self.user_id_for(row, users)
+            if user_id is None:
+                self.report_error(number, 'unknown or missing user_email.')
+                continue
+            try:
+                fields = clean_job_row(row)
+            except ValidationError as e:
+                self.report_error(number, ' '.join(e.messages))
+                continue
+            jobs.append(Job(user_id=user_id, **fields))
+        return jobs
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index for jobs from the jobs table.'
+
+    def handle(self, *args, **options):
+        if not search.install():
+            raise CommandError('Full-text job search needs the SQLite database backend.')
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Rebuilt the job search index.'))
@@ -1,5 +1,7 @@
 from django.db import models
 
+from blobs.storage import blob_storage
+
 # Create your models here.
 class Job(models.Model):
     user = models.ForeignKey('accounts.CustomUser', on_delete=models.CASCADE)
@@ -9,15 +11,32 @@ class Job(models.Model):
     max_offer = models.DecimalField(max_digits=10, decimal_places=2)
     location = models.CharField(max_length=100)
 
+    class Meta:
+        indexes = [models.Index(fields=['location'], name='job_location_idx')]
+
     def __str__(self):
         return self.job_title
 
 class JobApplicant(models.Model):
+    STATUS_CHOICES = [
+        ('applied', 'Applied'),
+        ('interviewing', 'Interviewing'),
+        ('offered', 'Offered'),
+        ('rejected', 'Rejected'),
+    ]
+
     job = models.ForeignKey(Job, on_delete=models.CASCADE)
     user = models.ForeignKey('accounts.CustomUser', on_delete=models.CASCADE)
-    resume = models.FileField(upload_to='resumes/')
+    resume = models.FileField(upload_to='resumes/', storage=blob_storage)
     applied_date = models.DateTimeField(auto_now_add=True)
-    status = models.CharField(max_length=20, choices=[('applied', 'Applied'), ('interviewing', 'Interviewing'), ('offered', 'Offered'), ('rejected', 'Rejected')], default='applied')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='applied')
+
+    class Meta:
+        constraints = [
+            # Also serves every (job, user) lookup such as has_applied.
+            models.UniqueConstraint(fields=['job', 'user'], name='unique_job_application'),
+        ]
+        indexes = [models.Index(fields=['job', 'status'], name='applicant_job_status_idx')]
 
     def __str__(self):
         return f"{self.user.username} - {self.job.job_title}"
\ No newline at end of file
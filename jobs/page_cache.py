@@ -0,0 +1,114 @@
+"""
+Page cache for the anonymous job list and job detail views.
+
+Cached pages are keyed on version counters instead of being deleted when
+jobs change: a job write bumps the global counter and the job's own one,
+an application only the job's own. That makes every key built from the
+old value unreachable. Invalidation is therefore a cache write or two,
+and stale entries simply expire.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+CACHE_ALIAS = getattr(settings, 'JOBS_PAGE_CACHE_ALIAS', 'default')
+PAGE_TIMEOUT = getattr(settings, 'JOBS_PAGE_CACHE_TIMEOUT', 60 * 15)
+
+GLOBAL_VERSION_KEY = 'jobs:version'
+HITS_KEY = 'jobs:page-cache:hits'
+MISSES_KEY = 'jobs:page-cache:misses'
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def job_version_key(pk):
+    return f'{GLOBAL_VERSION_KEY}:{pk}'
+
+
+def get_versions(keys):
+    cache = _cache()
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    for key in missing:
+        # Start from the clock rather than 1 so that a counter which was
+        # evicted can never come back to a value already used for pages.
+        cache.add(key, time.time_ns(), None)
+    if missing:
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def bump_version(key):
+    cache = _cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), None)
+
+
+def bump_job_versions(pk):
+    bump_version(GLOBAL_VERSION_KEY)
+    bump_version(job_version_key(pk))
+
+
+def _count(key):
+    cache = _cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def page_cache_stats():
+    stats = _cache().get_many([HITS_KEY, MISSES_KEY])
+    return {'hits': stats.get(HITS_KEY, 0), 'misses': stats.get(MISSES_KEY, 0)}
+
+
+def cache_anonymous_page(version_keys):
+    """
+    Caches a view's 200 responses for anonymous GET requests.
+
+    ``version_keys(**view_kwargs)`` returns the counters the page depends
+    on. The cache key combines the view, its full path including the
+    query string, and the current value of those counters.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+
+            versions = get_versions(version_keys(**kwargs))
+            path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = f'jobs:page:{view.__name__}:{"-".join(map(str, versions))}:{path_hash}'
+
+            cache = _cache()
+            cached = cache.get(key)
+            if cached is not None:
+                _count(HITS_KEY)
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Page-Cache'] = 'hit'
+                return response
+
+            _count(MISSES_KEY)
+            response = view(request, *args, **kwargs)
+            cacheable = (
+                response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+                # Pages carrying a CSRF token are specific to one visitor.
+                and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+            )
+            if cacheable:
+                cache.set(key, (response.content, response['Content-Type']), PAGE_TIMEOUT)
+                response['X-Page-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,161 @@
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Job
+
+FTS_TABLE = 'jobs_job_fts'
+
+# Private-use characters mark the snippet highlights so the surrounding
+# user text can be escaped before the <mark> tags are put in.
+_HIGHLIGHT_START = '\ue000'
+_HIGHLIGHT_END = '\ue001'
+
+# bm25 column weights: job_title, job_description, location.
+_RANK_WEIGHTS = (10.0, 1.0, 5.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        job_title, job_description, location,
+        content='jobs_job', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    # The triggers keep the index in step with every write, including
+    # bulk_create() and queryset.update() which bypass model signals.
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON jobs_job BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, job_title, job_description, location)
+        VALUES (new.id, new.job_title, new.job_description, new.location);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON jobs_job BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, job_title, job_description, location)
+        VALUES ('delete', old.id, old.job_title, old.job_description, old.location);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON jobs_job BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, job_title, job_description, location)
+        VALUES ('delete', old.id, old.job_title, old.job_description, old.location);
+        INSERT INTO {FTS_TABLE}(rowid, job_title, job_description, location)
+        VALUES (new.id, new.job_title, new.job_description, new.location);
+    END
+    """,
+]
+
+
+def is_supported(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection):
+    """Creates the FTS5 index and its triggers if they are missing."""
+    if not is_supported(using):
+        return False
+    with using.cursor() as cursor:
+        existing = FTS_TABLE in using.introspection.table_names(cursor)
+        for statement in _SCHEMA:
+            cursor.execute(statement)
+    if not existing:
+        rebuild(using)
+    return True
+
+
+def rebuild(using=connection):
+    with using.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def build_match_query(query):
+    """
+    Turns free text into an FTS5 MATCH expression.
+
+    Every word is quoted, so FTS5 operators typed by users are taken
+    literally, and given a trailing * for prefix matching.
+    """
+    tokens = _TOKEN_RE.findall(query)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _highlight(snippet):
+    snippet = escape(snippet)
+    snippet = snippet.replace(_HIGHLIGHT_START, '<mark>').replace(_HIGHLIGHT_END, '</mark>')
+    return mark_safe(snippet)
+
+
+_MATCH_SQL = f"""
+    SELECT rowid,
+           snippet({FTS_TABLE}, -1, %s, %s, '…', 16)
+    FROM {FTS_TABLE}
+    WHERE {FTS_TABLE} MATCH %s
+    ORDER BY bm25({FTS_TABLE}, {', '.join(str(w) for w in _RANK_WEIGHTS)})
+    LIMIT %s
+"""
+
+
+def _match(match, limit):
+    with connection.cursor() as cursor:
+        cursor.execute(_MATCH_SQL, [_HIGHLIGHT_START, _HIGHLIGHT_END, match, limit])
+        return cursor.fetchall()
+
+
+def _with_snippets(hits, jobs):
+    results = []
+    for pk, snippet in hits:
+        job = jobs.get(pk)
+        if job is not None:
+            job.search_snippet = _highlight(snippet)
+            results.append(job)
+    return results
+
+
+def search_jobs(query, limit=50):
+    """
+    Returns up to ``limit`` jobs matching ``query``, best match first.
+
+    Each job carries a ``search_snippet`` with the matched words
+    highlighted. Falls back to substring matching on databases without
+    FTS5.
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+    if not is_supported():
+        return list(_fallback_search(query)[:limit])
+
+    hits = _match(match, limit)
+    jobs = Job.objects.select_related('user').in_bulk([pk for pk, _ in hits])
+    return _with_snippets(hits, jobs)
+
+
+async def asearch_jobs(query, limit=50):
+    """Async version of search_jobs() for async views."""
+    match = build_match_query(query)
+    if not match:
+        return []
+    if not is_supported():
+        return [job async for job in _fallback_search(query)[:limit]]
+
+    # Django has no async raw cursor, so only the MATCH itself runs in the
+    # sync thread; the jobs are then loaded with the async ORM.
+    hits = await sync_to_async(_match)(match, limit)
+    jobs = await Job.objects.select_related('user').ain_bulk([pk for pk, _ in hits])
+    return _with_snippets(hits, jobs)
+
+
+def _fallback_search(query):
+    return Job.objects.select_related('user').filter(
+        Q(job_title__icontains=query) |
+        Q(job_description__icontains=query) |
+        Q(location__icontains=query)
+    )
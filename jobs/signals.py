@@ -0,0 +1,28 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_migrate, post_save, post_delete
+from django.dispatch import receiver
+from . import search
+from .models import Job, JobApplicant
+from .page_cache import bump_job_versions, bump_version, job_version_key
+
+
+@receiver(post_migrate)
+def install_search_index(sender, app_config, using, **kwargs):
+    if app_config.name == 'jobs':
+        search.install(connections[using])
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def job_changed(sender, instance, **kwargs):
+    pk = instance.pk  # Cleared on the instance once a delete completes.
+    transaction.on_commit(lambda: bump_job_versions(pk))
+
+
+@receiver(post_save, sender=JobApplicant)
+@receiver(post_delete, sender=JobApplicant)
+def applicant_changed(sender, instance, **kwargs):
+    # Anonymous pages show no applicants, so the job list stays cached;
+    # only the job's own page is refreshed.
+    job_id = instance.job_id
+    transaction.on_commit(lambda: bump_version(job_version_key(job_id)))
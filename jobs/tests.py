@@ -1,3 +1,386 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import CustomUser
+from .forms import clean_job_row
+from .models import Job, JobApplicant
+from .page_cache import page_cache_stats
+from .search import FTS_TABLE, build_match_query, search_jobs
+
+
+def make_job(user, **fields):
+    defaults = {
+        'job_title': 'Engineer',
+        'job_description': 'Build things.',
+        'location': 'Manila',
+        'min_offer': 1000,
+        'max_offer': 2000,
+    }
+    defaults.update(fields)
+    return Job.objects.create(user=user, **defaults)
+
+
+class JobSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='poster@example.com', password='pass12345', is_staff=True)
+        cls.backend = make_job(cls.user, job_title='Backend Developer', job_description='Python and Django services.')
+        cls.frontend = make_job(cls.user, job_title='Frontend Developer', job_description='Works with the backend team.')
+        cls.chef = make_job(cls.user, job_title='Chef', job_description='Cook <b>great</b> food.', location='Cebu')
+
+    def test_prefix_match_ranks_title_hits_first(self):
+        results = search_jobs('back')
+        self.assertEqual(results, [self.backend, self.frontend])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.chef.job_title = 'Pastry Chef'
+        self.chef.save()
+        self.assertEqual(search_jobs('pastry'), [self.chef])
+        self.chef.delete()
+        self.assertEqual(search_jobs('pastry'), [])
+
+    def test_snippet_escapes_content_and_highlights_match(self):
+        [job] = search_jobs('food')
+        self.assertIn('<mark>food</mark>', job.search_snippet)
+        self.assertIn('&lt;b&gt;', job.search_snippet)
+
+    def test_operators_in_user_input_are_literal(self):
+        self.assertEqual(build_match_query('chef OR "x'), '"chef"* "OR"* "x"*')
+        self.assertEqual(search_jobs('NEAR('), [])
+
+    def test_list_view_uses_search(self):
+        cache.clear()
+        response = self.client.get(reverse('jobs:list'), {'q': 'cebu'})
+        self.assertEqual(list(response.context['object_list']), [self.chef])
+
+    async def test_async_suggestions(self):
+        response = await self.async_client.get(reverse('jobs:search-suggestions'), {'q': 'back'})
+        titles = [result['title'] for result in response.json()['results']]
+        self.assertEqual(titles, ['Backend Developer', 'Frontend Developer'])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')")
+        self.assertEqual(search_jobs('chef'), [])
+        call_command('rebuild_job_search_index', stdout=StringIO())
+        self.assertEqual(search_jobs('chef'), [self.chef])
+
+
+class JobBulkCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='feed@example.com', password='pass12345')
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def write_csv(self, rows):
+        path = os.path.join(self.dir, 'jobs.csv')
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['job_title', 'job_description', 'location', 'min_offer', 'max_offer'])
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def row(self, i, **overrides):
+        row = {'job_title': f'Job {i}', 'job_description': 'Desc', 'location': 'Manila', 'min_offer': '10', 'max_offer': '20'}
+        row.update(overrides)
+        return row
+
+    def test_clean_job_row_applies_form_rules(self):
+        self.assertEqual(clean_job_row(self.row(1))['min_offer'], 10)
+        with self.assertRaisesMessage(Exception, 'Minimum offer cannot be greater than maximum offer.'):
+            clean_job_row(self.row(1, min_offer='30'))
+        with self.assertRaisesMessage(Exception, 'Maximum offer must be a positive number.'):
+            clean_job_row(self.row(1, max_offer='NaN'))
+
+    def test_import_skips_invalid_rows(self):
+        path = self.write_csv([self.row(1), self.row(2, job_title=''), self.row(3)])
+        err = StringIO()
+        call_command('import_jobs', path, user='feed@example.com', chunk_size=2, stdout=StringIO(), stderr=err)
+        self.assertEqual(list(Job.objects.order_by('pk').values_list('job_title', flat=True)), ['Job 1', 'Job 3'])
+        self.assertIn('Record 2: Job title cannot be empty.', err.getvalue())
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+    def test_unreadable_records_are_reported_not_fatal(self):
+        path = os.path.join(self.dir, 'jobs.jsonl')
+        with open(path, 'w') as f:
+            f.write(json.dumps(self.row(1)) + '\n')
+            f.write('{"job_title": \n')
+            f.write('["not", "an", "object"]\n')
+            f.write(json.dumps(self.row(4, job_title=42)) + '\n')
+            f.write(json.dumps(self.row(5, user_email=7)) + '\n')
+            f.write(json.dumps(self.row(6, min_offer=10)) + '\n')
+        err = StringIO()
+        call_command('import_jobs', path, user='feed@example.com', chunk_size=2, stdout=StringIO(), stderr=err)
+        self.assertEqual(list(Job.objects.order_by('pk').values_list('job_title', flat=True)), ['Job 1', 'Job 6'])
+        self.assertIn('Record 2: invalid JSON', err.getvalue())
+        self.assertIn('Record 3: not a JSON object.', err.getvalue())
+        self.assertIn('Record 4: job_title must be text.', err.getvalue())
+        self.assertIn('Record 5: user_email must be text.', err.getvalue())
+        with self.assertRaisesMessage(Exception, 'location must be text.'):
+            clean_job_row(self.row(1, location=['x']))
+
+    def test_import_from_stdin_keeps_no_checkpoint(self):
+        source = StringIO(json.dumps(self.row(1)) + '\n')
+        with mock.patch('sys.stdin', source), mock.patch('Quiz4.bulkio.Checkpoint') as checkpoint:
+            call_command('import_jobs', '-', format='jsonl', user='feed@example.com', stdout=StringIO())
+        checkpoint.assert_not_called()
+        self.assertEqual(Job.objects.get().job_title, 'Job 1')
+
+    def test_resume_skips_committed_records(self):
+        path = self.write_csv([self.row(i) for i in range(1, 6)])
+        with open(path + '.checkpoint', 'w') as f:
+            f.write('3')
+        call_command('import_jobs', path, user='feed@example.com', resume=True, stdout=StringIO())
+        self.assertEqual(list(Job.objects.values_list('job_title', flat=True)), ['Job 4', 'Job 5'])
+
+    def test_export_round_trip(self):
+        for i in range(3):
+            make_job(self.user, job_title=f'Job {i}')
+        path = os.path.join(self.dir, 'out.jsonl')
+        call_command('export_jobs', path, chunk_size=2, stderr=StringIO())
+        with open(path) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([row['job_title'] for row in rows], ['Job 0', 'Job 1', 'Job 2'])
+        self.assertEqual(rows[0]['user_email'], 'feed@example.com')
+
+        Job.objects.all().delete()
+        call_command('import_jobs', path, stdout=StringIO())
+        self.assertEqual(Job.objects.filter(user=self.user).count(), 3)
+
+    def test_import_invalidates_the_anonymous_job_pages(self):
+        cache.clear()
+        self.client.get(reverse('jobs:list'))
+        call_command('import_jobs', self.write_csv([self.row(1)]), user='feed@example.com', stdout=StringIO())
+        self.assertContains(self.client.get(reverse('jobs:list')), 'Job 1')
+
+    def test_import_for_a_provisioned_mixed_case_user(self):
+        users = os.path.join(self.dir, 'users.jsonl')
+        with open(users, 'w') as f:
+            f.write('{"email": "Alice.Smith@Corp.com"}\n')
+        call_command('provision_users', users, workers=1, stdout=StringIO())
+        alice = CustomUser.objects.get(email='Alice.Smith@corp.com')
+
+        path = os.path.join(self.dir, 'jobs.jsonl')
+        with open(path, 'w') as f:
+            for email in ['Alice.Smith@corp.com', 'alice.smith@corp.com']:
+                f.write(json.dumps({**self.row(email), 'user_email': email}) + '\n')
+        err = StringIO()
+        call_command('import_jobs', path, stdout=StringIO(), stderr=err)
+        self.assertEqual(err.getvalue(), '')
+        self.assertEqual(Job.objects.filter(user=alice).count(), 2)
+
+        call_command('import_jobs', self.write_csv([self.row(3)]), user='Alice.Smith@corp.com', stdout=StringIO())
+        self.assertEqual(Job.objects.filter(user=alice).count(), 3)
+
+
+class ApplicantCsvExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.poster = CustomUser.objects.create_user(email='poster@example.com', password='pass12345', is_staff=True)
+        cls.other = CustomUser.objects.create_user(email='other@example.com', password='pass12345')
+        cls.job = make_job(cls.poster, job_title='Writer')
+        cls.second_job = make_job(cls.poster, job_title='Editor')
+        for i in range(3):
+            applicant = CustomUser.objects.create_user(email=f'a{i}@example.com', password='pass12345')
+            JobApplicant.objects.create(job=cls.job, user=applicant, status='rejected' if i == 2 else 'applied')
+        JobApplicant.objects.create(job=cls.second_job, user=cls.other)
+
+    def read_csv(self, response):
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        body = b''.join(response.streaming_content).decode()
+        return list(csv.reader(body.splitlines()))
+
+    def test_job_export_streams_rows(self):
+        self.client.force_login(self.poster)
+        rows = self.read_csv(self.client.get(reverse('jobs:applicants-csv', args=[self.job.pk])))
+        self.assertEqual(rows[0], ['job_id', 'job_title', 'applicant_email', 'status', 'applied_date'])
+        self.assertEqual([row[2] for row in rows[1:]], ['a0@example.com', 'a1@example.com', 'a2@example.com'])
+
+    def test_filters(self):
+        self.client.force_login(self.poster)
+        url = reverse('jobs:applicants-csv', args=[self.job.pk])
+        rows = self.read_csv(self.client.get(url, {'status': 'rejected'}))
+        self.assertEqual([row[2] for row in rows[1:]], ['a2@example.com'])
+        rows = self.read_csv(self.client.get(url, {'applied_to': '2000-01-01'}))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(self.client.get(url, {'status': 'bogus'}).status_code, 400)
+
+    def test_non_owner_is_forbidden(self):
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(reverse('jobs:applicants-csv', args=[self.job.pk])).status_code, 403)
+        self.assertEqual(self.client.get(reverse('jobs:poster-applicants-csv')).status_code, 403)
+
+    def test_poster_export_covers_all_their_jobs(self):
+        self.client.force_login(self.poster)
+        rows = self.read_csv(self.client.get(reverse('jobs:poster-applicants-csv')))
+        self.assertEqual({row[1] for row in rows[1:]}, {'Writer', 'Editor'})
+        self.assertEqual(len(rows), 5)
+
+
+class JobDetailApplicantPanelTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.poster = CustomUser.objects.create_user(email='poster@example.com', password='pass12345')
+        cls.job = make_job(cls.poster)
+        statuses = ['applied'] * 20 + ['interviewing'] * 5 + ['offered'] * 2 + ['rejected'] * 3
+        for i, status in enumerate(statuses):
+            applicant = CustomUser.objects.create_user(email=f'a{i}@example.com')
+            JobApplicant.objects.create(job=cls.job, user=applicant, status=status)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_view_does_not_load_applicants(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('jobs:detail', args=[self.job.pk]))
+        self.assertNotIn('applicants_page', response.context)
+
+    def test_owner_sees_paginated_applicants_and_status_counts(self):
+        self.client.force_login(self.poster)
+        response = self.client.get(reverse('jobs:detail', args=[self.job.pk]), {'page': 2})
+        self.assertEqual(response.context['applicant_total'], 30)
+        self.assertEqual(len(response.context['applicants_page'].object_list), 5)
+        self.assertEqual(
+            response.context['status_counts'],
+            [('Applied', 20), ('Interviewing', 5), ('Offered', 2), ('Rejected', 3)],
+        )
+
+    def test_owner_query_count_is_fixed(self):
+        self.client.force_login(self.poster)
+        # User with profile (the session and, once warm, the user come from
+        # the cache), job, status GROUP BY, applicant page.
+        with self.assertNumQueries(4):
+            self.client.get(reverse('jobs:detail', args=[self.job.pk]))
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.poster = CustomUser.objects.create_user(email='poster@example.com')
+        cls.job = make_job(cls.poster, job_title='Baker')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeat_visits_are_served_from_cache(self):
+        url = reverse('jobs:detail', args=[self.job.pk])
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, 'Baker')
+        self.assertEqual(page_cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_query_string_is_part_of_the_key(self):
+        url = reverse('jobs:list')
+        self.client.get(url, {'q': 'baker'})
+        self.assertEqual(self.client.get(url, {'q': 'chef'})['X-Page-Cache'], 'miss')
+
+    def test_job_save_invalidates_pages(self):
+        list_url = reverse('jobs:list')
+        detail_url = reverse('jobs:detail', args=[self.job.pk])
+        self.client.get(list_url)
+        self.client.get(detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.job.job_title = 'Head Baker'
+            self.job.save()
+        self.assertContains(self.client.get(list_url), 'Head Baker')
+        self.assertEqual(self.client.get(detail_url)['X-Page-Cache'], 'miss')
+
+    def test_applicant_change_invalidates_only_its_job(self):
+        other = make_job(self.poster, job_title='Cook')
+        urls = [reverse('jobs:list'), reverse('jobs:detail', args=[other.pk]), reverse('jobs:detail', args=[self.job.pk])]
+        for url in urls:
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            JobApplicant.objects.create(job=self.job, user=self.poster)
+        self.assertEqual([self.client.get(url)['X-Page-Cache'] for url in urls], ['hit', 'hit', 'miss'])
+
+    def test_signed_in_users_bypass_cache(self):
+        self.client.force_login(self.poster)
+        response = self.client.get(reverse('jobs:list'))
+        self.assertNotIn('X-Page-Cache', response)
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            caches_setting = {'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': tmp,
+            }}
+            with override_settings(CACHES=caches_setting):
+                url = reverse('jobs:detail', args=[self.job.pk])
+                self.client.get(url)
+                self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.job.save()
+                self.assertEqual(self.client.get(url)['X-Page-Cache'], 'miss')
+
+
+class QueryPlanTests(TestCase):
+    """The hot lookups are answered from an index rather than a table scan."""
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(f'INDEX {index}', plan)
+        self.assertNotRegex(plan, r'SCAN jobs_\w+\s*$')
+
+    def test_application_lookup_uses_unique_constraint(self):
+        queryset = JobApplicant.objects.filter(job_id=1, user_id=1)
+        self.assertUsesIndex(queryset, 'sqlite_autoindex_jobs_jobapplicant_1')
+        self.assertIn('job_id=? AND user_id=?', queryset.explain())
+
+    def test_status_filter_and_counts_use_job_status_index(self):
+        self.assertUsesIndex(JobApplicant.objects.filter(job_id=1, status='offered'), 'applicant_job_status_idx')
+        counts = JobApplicant.objects.filter(job_id=1).order_by().values_list('status').annotate(total=Count('pk'))
+        self.assertUsesIndex(counts, 'applicant_job_status_idx')
+
+    def test_location_filter_uses_index(self):
+        self.assertUsesIndex(Job.objects.filter(location='Cebu'), 'job_location_idx')
+
+
+class JobApplyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.poster = CustomUser.objects.create_user(email='poster@example.com')
+        cls.applicant = CustomUser.objects.create_user(email='applicant@example.com')
+        cls.job = make_job(cls.poster)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client.force_login(self.applicant)
+
+    def apply(self):
+        return self.client.post(
+            reverse('jobs:apply', args=[self.job.pk]),
+            {'resume': SimpleUploadedFile('cv.pdf', b'%PDF-1.4')},
+        )
+
+    def messages(self, response):
+        return [str(message) for message in get_messages(response.wsgi_request)]
+
+    def test_second_application_is_rejected_by_the_constraint(self):
+        self.assertEqual(self.messages(self.apply()), ['Application submitted successfully!'])
+        self.assertEqual(self.messages(self.apply())[-1], 'You have already applied for this job.')
+        self.assertEqual(JobApplicant.objects.filter(job=self.job, user=self.applicant).count(), 1)
@@ -1,5 +1,15 @@
 from django.urls import path
-from .views import job_list_view, job_detail_view, JobUpdateView, JobDeleteView, job_apply, JobCreateView
+from .views import (
+    job_list_view,
+    job_detail_view,
+    job_search_suggestions,
+    JobUpdateView,
+    JobDeleteView,
+    job_apply,
+    JobCreateView,
+    job_applicants_csv,
+    poster_applicants_csv,
+)
 
 app_name = 'jobs'
 
@@ -7,8 +17,11 @@ urlpatterns = [
 
     path('', job_list_view, name='list'),
     path('create/', JobCreateView.as_view(), name='create'),
+    path('search/', job_search_suggestions, name='search-suggestions'),
     path('<int:pk>/', job_detail_view, name='detail'),
     path('<int:pk>/update/', JobUpdateView.as_view(), name='update'),
     path('<int:pk>/delete/', JobDeleteView.as_view(), name='delete'),
     path('<int:pk>/apply/', job_apply, name='apply'),
+    path('<int:pk>/applicants.csv', job_applicants_csv, name='applicants-csv'),
+    path('applicants.csv', poster_applicants_csv, name='poster-applicants-csv'),
 ]
\ No newline at end of file
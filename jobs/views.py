@@ -1,41 +1,90 @@
-from django.db.models import Q
+import csv
+
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from django.urls import reverse_lazy
+from django.utils.dateparse import parse_date
+from django.urls import reverse, reverse_lazy
 from django.views.generic import UpdateView, DeleteView, CreateView
 from django.contrib import messages
+from django.contrib.auth import get_user_model
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from .forms import JobForm
+from Quiz4.db_router import replica_reads
+from .forms import JobForm, JobApplicationForm
 from .models import Job, JobApplicant
+from .page_cache import GLOBAL_VERSION_KEY, cache_anonymous_page, job_version_key
+from .search import asearch_jobs, search_jobs
+
+APPLICANTS_PER_PAGE = 25
+SUGGESTIONS_LIMIT = 8
 
 
+@replica_reads
+@cache_anonymous_page(lambda: [GLOBAL_VERSION_KEY])
 def job_list_view(request):
-    jobs = Job.objects.all()
     query = request.GET.get('q', None)
     if query:
-        # ✅ FIXED: Changed field names to match your Job model (e.g., 'title' -> 'job_title')
-        jobs = jobs.filter(
-            Q(job_title__icontains=query) |
-            Q(job_description__icontains=query) |
-            Q(location__icontains=query)
-        )
+        # Ranked full-text search, see jobs/search.py
+        jobs = search_jobs(query)
+    else:
+        jobs = Job.objects.select_related('user')
     context = {
         'object_list': jobs,
     }
     return render(request, 'jobs/job_list.html', context)
 
 
-def job_detail_view(request, pk):
-    job = get_object_or_404(Job, pk=pk)
-    applicants = JobApplicant.objects.filter(job=job)
-    has_applied = False
-    if request.user.is_authenticated:
-        has_applied = JobApplicant.objects.filter(job=job, user=request.user).exists()
+async def job_search_suggestions(request):
+    """Top matches as JSON for the search box, fetched as the user types."""
+    query = request.GET.get('q', '').strip()
+    jobs = await asearch_jobs(query, limit=SUGGESTIONS_LIMIT) if query else []
+    return JsonResponse({'results': [
+        {
+            'id': job.pk,
+            'title': job.job_title,
+            'location': job.location,
+            'url': reverse('jobs:detail', args=[job.pk]),
+        }
+        for job in jobs
+    ]})
+
 
+@replica_reads
+@cache_anonymous_page(lambda pk: [GLOBAL_VERSION_KEY, job_version_key(pk)])
+def job_detail_view(request, pk):
+    job = get_object_or_404(Job.objects.select_related('user'), pk=pk)
+    can_manage = request.user.is_authenticated and (request.user == job.user or request.user.is_staff)
     context = {
         'job': job,
-        'applicants': applicants,
-        'has_applied': has_applied,
+        'can_manage': can_manage,
+        'has_applied': False,
     }
+
+    if can_manage:
+        # Only the people who can see the applicant panel pay for loading it.
+        applicants = JobApplicant.objects.filter(job=job)
+        status_counts = {status: 0 for status, _ in JobApplicant.STATUS_CHOICES}
+        status_counts.update(
+            applicants.order_by().values_list('status').annotate(total=Count('pk'))
+        )
+        paginator = Paginator(
+            applicants.select_related('user').order_by('-applied_date', '-pk'),
+            APPLICANTS_PER_PAGE,
+        )
+        # The GROUP BY above already gives the total, so skip the COUNT(*).
+        paginator.count = sum(status_counts.values())
+        context['applicants_page'] = paginator.get_page(request.GET.get('page'))
+        context['applicant_total'] = paginator.count
+        context['status_counts'] = [
+            (label, status_counts[status]) for status, label in JobApplicant.STATUS_CHOICES
+        ]
+    elif request.user.is_authenticated:
+        context['has_applied'] = JobApplicant.objects.filter(job=job, user=request.user).exists()
+
     return render(request, 'jobs/job_detail.html', context)
 
 
@@ -82,12 +131,95 @@ def job_apply(request, pk):
         if not request.user.is_authenticated:
             return redirect('auth:signin')
 
-        if JobApplicant.objects.filter(job=job, user=request.user).exists():
-            messages.error(request, 'You have already applied for this job.')
+        form = JobApplicationForm(request.POST, request.FILES)
+        if not form.is_valid():
+            for error in form.errors.get('resume', []):
+                messages.error(request, error)
             return redirect('jobs:detail', pk=job.pk)
 
-        JobApplicant.objects.create(job=job, user=request.user)
+        # The resume is streamed into content-addressed storage, so the same
+        # file sent to many jobs is stored once. That has to happen here, as
+        # the upload only exists for this request; the rest is one INSERT and
+        # a page cache bump on commit, so nothing is left for tasks.enqueue().
+        application = form.save(commit=False)
+        application.job = job
+        application.user = request.user
+        try:
+            # The unique (job, user) constraint decides, so two concurrent
+            # submissions cannot both get in the way an exists() check could.
+            with transaction.atomic():
+                application.save()
+        except IntegrityError:
+            messages.error(request, 'You have already applied for this job.')
+            return redirect('jobs:detail', pk=job.pk)
         messages.success(request, 'Application submitted successfully!')
         return redirect('jobs:detail', pk=job.pk)
 
-    return redirect('jobs:detail', pk=job.pk)
\ No newline at end of file
+    return redirect('jobs:detail', pk=job.pk)
+
+class Echo:
+    """A file-like object that hands back what is written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+APPLICANT_CSV_HEADER = ['job_id', 'job_title', 'applicant_email', 'status', 'applied_date']
+
+
+def _applicant_csv_response(applicants, filename):
+    rows = applicants.order_by('job_id', 'pk').values_list(
+        'job_id', 'job__job_title', 'user__email', 'status', 'applied_date',
+    )
+    writer = csv.writer(Echo())
+
+    def stream():
+        yield writer.writerow(APPLICANT_CSV_HEADER)
+        for job_id, job_title, email, status, applied_date in rows.iterator(chunk_size=2000):
+            yield writer.writerow([job_id, job_title, email, status, applied_date.isoformat()])
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _filter_applicants(request, applicants):
+    status = request.GET.get('status')
+    if status:
+        if status not in dict(JobApplicant.STATUS_CHOICES):
+            raise ValueError(f'Unknown status {status!r}.')
+        applicants = applicants.filter(status=status)
+    for param, lookup in (('applied_from', 'applied_date__date__gte'), ('applied_to', 'applied_date__date__lte')):
+        value = request.GET.get(param)
+        if value:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(f'{param} must be a YYYY-MM-DD date.')
+            applicants = applicants.filter(**{lookup: day})
+    return applicants
+
+
+@login_required
+def job_applicants_csv(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    if not (request.user == job.user or request.user.is_staff):
+        raise PermissionDenied
+    try:
+        applicants = _filter_applicants(request, JobApplicant.objects.filter(job=job))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    return _applicant_csv_response(applicants, f'job-{job.pk}-applicants.csv')
+
+
+@login_required
+def poster_applicants_csv(request):
+    # Staff only: every applicant across the jobs a poster owns, by default
+    # the jobs of the requesting user.
+    if not request.user.is_staff:
+        raise PermissionDenied
+    poster = get_user_model().objects.with_email((request.GET.get('poster') or request.user.email).strip())
+    try:
+        applicants = _filter_applicants(request, JobApplicant.objects.filter(job__user__in=poster))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    return _applicant_csv_response(applicants, 'applicants.csv')
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PostConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'posts'
+
+    def ready(self):
+        import posts.signals
\ No newline at end of file
@@ -0,0 +1,72 @@
+"""
+Comment threads on the post detail page.
+
+Top-level comments are paginated newest first with the keyset paginator,
+so a post with thousands of comments renders one page of them. Each page
+then gets the first few replies of every comment on it from a single
+query; the rest of a thread is paginated oldest first from the comments
+endpoint.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Comment
+from .pagination import KeysetPaginator, encode_cursor
+
+COMMENTS_PER_PAGE = 20
+REPLIES_PER_PAGE = 20
+# Replies shown under each comment before "more replies".
+REPLY_PREVIEW = 3
+
+
+def comment_page(post, cursor=None):
+    paginator = KeysetPaginator(
+        Comment.objects.filter(post=post, parent=None).select_related('user'), COMMENTS_PER_PAGE,
+    )
+    page = paginator.page(cursor)
+    attach_replies(page.object_list)
+    return page
+
+
+def reply_page(post, parent_id, cursor=None):
+    paginator = KeysetPaginator(
+        Comment.objects.filter(post=post, parent_id=parent_id).select_related('user'), REPLIES_PER_PAGE,
+        descending=False,
+    )
+    return paginator.page(cursor)
+
+
+def attach_replies(comments):
+    """
+    Sets ``preview_replies``, ``reply_count`` and ``replies_cursor`` (where
+    the rest of the thread starts, or None) on each comment.
+    """
+    by_parent = defaultdict(list)
+    counts = {}
+    if comments:
+        replies = Comment.objects.filter(parent__in=[comment.pk for comment in comments]).select_related('user').annotate(
+            position=Window(RowNumber(), partition_by=F('parent'), order_by=[F('created_at').asc(), F('id').asc()]),
+            thread_size=Window(Count('id'), partition_by=F('parent')),
+        ).filter(position__lte=REPLY_PREVIEW).order_by('parent', 'created_at', 'id')
+        for reply in replies:
+            by_parent[reply.parent_id].append(reply)
+            counts[reply.parent_id] = reply.thread_size
+    for comment in comments:
+        comment.preview_replies = by_parent[comment.pk]
+        comment.reply_count = counts.get(comment.pk, 0)
+        last = comment.preview_replies[-1] if comment.preview_replies else None
+        more = comment.reply_count > len(comment.preview_replies)
+        comment.replies_cursor = encode_cursor(last.created_at, last.pk) if more else None
+    return comments
+
+
+def comment_data(comment):
+    return {
+        'id': comment.pk,
+        'user': comment.user.email,
+        'content': comment.content,
+        'created_at': comment.created_at.isoformat(),
+        'parent': comment.parent_id,
+    }
@@ -1,4 +1,5 @@
 from django import forms
+from .images import validate_image_upload
 from .models import Post, Comment # ✅ 1. IMPORT THE COMMENT MODEL
 
 class PostForm(forms.ModelForm):
@@ -10,11 +11,27 @@ class PostForm(forms.ModelForm):
             'image': forms.FileInput(attrs={'class': 'form-control'})
         }
 
+    def clean_image(self):
+        return validate_image_upload(self.cleaned_data.get('image'))
+
 # ✅ 2. ADD THIS NEW FORM FOR COMMENTS
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
-        fields = ['content']
+        fields = ['content', 'parent']
         widgets = {
             'content': forms.Textarea(attrs={'class': 'form-control', 'rows': 2, 'placeholder': 'Add a comment...'}),
-        }
\ No newline at end of file
+            'parent': forms.HiddenInput(),
+        }
+
+    def __init__(self, *args, post=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only comments on the same post can be replied to.
+        self.fields['parent'].queryset = Comment.objects.filter(post=post) if post else Comment.objects.none()
+
+    def clean_parent(self):
+        parent = self.cleaned_data.get('parent')
+        # Threads are one level deep, so a reply to a reply joins the thread.
+        if parent is not None and parent.parent_id is not None:
+            parent = parent.parent
+        return parent
\ No newline at end of file
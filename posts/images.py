@@ -0,0 +1,139 @@
+"""
+Responsive derivatives for uploaded images (Post.image, Profile.profile_picture).
+
+Each upload gets resized copies at a few widths, in WebP and JPEG, stored
+under ``derivatives/`` next to the original. The work is queued as a
+background task (run it with ``manage.py run_workers --processes``), so
+the request that uploaded the image does not wait for it, and the result
+is written back to the model's ``*_variants`` JSON field for the
+``responsive_image`` template tag.
+"""
+import logging
+import os
+import warnings
+
+from django import forms
+from django.apps import apps
+from django.conf import settings
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from blobs.storage import derivatives_dir
+from tasks.queue import enqueue, task
+
+logger = logging.getLogger(__name__)
+
+POST_IMAGE_WIDTHS = (320, 640, 1024)
+AVATAR_WIDTHS = (64, 160)
+
+# Sent with the model as sender and the instance once its variants are saved.
+variants_stored = Signal()
+
+MAX_UPLOAD_BYTES = getattr(settings, 'IMAGE_MAX_UPLOAD_BYTES', 10 * 1024 * 1024)
+MAX_PIXELS = getattr(settings, 'IMAGE_MAX_PIXELS', 40_000_000)
+
+# Pillow refuses to open anything beyond twice this and warns beyond it;
+# render_derivatives() turns the warning into an error as well.
+Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+
+FORMATS = (('webp', 'WEBP', {'quality': 80, 'method': 4}),
+           ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}))
+
+
+def validate_image_upload(upload):
+    """
+    Rejects oversized uploads before they are saved.
+
+    Only the image header is read, so a decompression bomb is caught
+    without decoding a single pixel.
+    """
+    if upload is None or not hasattr(upload, 'size'):
+        return upload
+    if upload.size > MAX_UPLOAD_BYTES:
+        raise forms.ValidationError(f'Images must be smaller than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB.')
+    position = upload.tell()
+    try:
+        with Image.open(upload) as img:
+            width, height = img.size
+    except (Image.DecompressionBombError, OSError):
+        raise forms.ValidationError('Upload a valid image.')
+    finally:
+        upload.seek(position)
+    if width * height > MAX_PIXELS:
+        raise forms.ValidationError('This image has too many pixels.')
+    return upload
+
+
+def render_derivatives(source_path, output_dir, widths):
+    """
+    Writes the resized copies of one image and returns their relative names.
+
+    Only touches the filesystem, so it can run in any worker. Returns
+    ``{width: {'webp': name, 'jpg': name}}`` keyed by the real width of
+    each copy, with names relative to ``output_dir``. The original is never
+    upscaled, so widths beyond it collapse into one full-width copy.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', Image.DecompressionBombWarning)
+        with Image.open(source_path) as img:
+            if img.width * img.height > MAX_PIXELS:
+                raise ValueError(f'{source_path} is larger than {MAX_PIXELS} pixels.')
+            largest = max(widths)
+            # Lets the JPEG decoder scale down by 1/2, 1/4 or 1/8 while
+            # decoding instead of materialising the full-size bitmap.
+            img.draft('RGB', (largest, largest))
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+
+            os.makedirs(output_dir, exist_ok=True)
+            variants = {}
+            for width in sorted({min(width, img.width) for width in widths}):
+                height = max(1, round(img.height * width / img.width))
+                resized = img.resize((width, height), Image.Resampling.LANCZOS)
+                names = {}
+                for ext, fmt, options in FORMATS:
+                    frame = resized.convert('RGB') if fmt == 'JPEG' else resized
+                    name = f'w{width}.{ext}'
+                    frame.save(os.path.join(output_dir, name), fmt, **options)
+                    names[ext] = name
+                variants[str(width)] = names
+    return variants
+
+
+def _store_variants(model, pk, field_name, base_name, variants):
+    stored = {
+        width: {ext: f'{base_name}/{name}' for ext, name in names.items()}
+        for width, names in variants.items()
+    }
+    update = {f'{field_name}_variants': stored}
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        # Invalidates the cached feed cards, keyed on updated_at.
+        update['updated_at'] = timezone.now()
+    model.objects.filter(pk=pk).update(**update)
+
+
+@task
+def build_derivatives(model_label, pk, field_name, widths):
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    field_file = getattr(instance, field_name, None)
+    if not field_file:
+        return
+    base_name = derivatives_dir(field_file.name)
+    try:
+        source_path = field_file.path
+        output_dir = field_file.storage.path(base_name)
+    except NotImplementedError:
+        logger.warning('Storage for %s.%s has no local paths; skipping derivatives.', model_label, field_name)
+        return
+    variants = render_derivatives(source_path, output_dir, widths)
+    _store_variants(model, pk, field_name, base_name, variants)
+    variants_stored.send(sender=model, instance=instance)
+
+
+def schedule_derivatives(instance, field_name, widths):
+    """Queues derivative generation for ``instance.<field_name>``."""
+    if getattr(instance, field_name):
+        enqueue(build_derivatives, instance._meta.label, instance.pk, field_name, list(widths))
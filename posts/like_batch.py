@@ -0,0 +1,155 @@
+"""
+Like and unlike many posts in one request.
+
+A batch sets the wanted state of each post rather than toggling it, so a
+retried or double-sent batch changes nothing the second time. It is
+applied in one transaction: one read of the user's existing likes, one
+bulk INSERT, one DELETE (with the read Django makes for post_delete) and
+one UPDATE of the counters, however many operations it holds.
+
+With ``POSTS_LIKE_WRITE_BEHIND`` the counter deltas are instead added to
+a buffer in this process and written every ``POSTS_LIKE_FLUSH_INTERVAL``
+seconds, so a burst of likes on a viral post becomes one UPDATE of its
+row. Deltas still buffered when a process dies are lost; run
+``manage.py reconcile_post_counters`` to repair the counts. Only run it
+while no process has deltas buffered, e.g. with the web processes
+stopped: it writes the counts of the Like rows, which already include
+the buffered likes, so a delta flushed afterwards is counted twice.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+
+from . import live
+from .likes import invalidate_liked_posts
+from .models import Like, Post
+from .signals import likes_counted_by_caller
+
+logger = logging.getLogger(__name__)
+
+MAX_OPS = 100
+# Post ids are 64-bit; a larger int would overflow in the database driver.
+MAX_POST_ID = 2 ** 63 - 1
+
+
+class InvalidBatch(ValueError):
+    pass
+
+
+def parse_ops(payload):
+    """
+    Reads ``{"ops": [{"post": <id>, "liked": <bool>}, ...]}`` into
+    ``{post_id: liked}``; the last operation on a post wins.
+    """
+    ops = payload.get('ops') if isinstance(payload, dict) else None
+    if not isinstance(ops, list) or not ops:
+        raise InvalidBatch('Expected a non-empty "ops" list.')
+    if len(ops) > MAX_OPS:
+        raise InvalidBatch(f'At most {MAX_OPS} operations per batch.')
+    wanted = {}
+    for op in ops:
+        post_id = op.get('post') if isinstance(op, dict) else None
+        liked = op.get('liked') if isinstance(op, dict) else None
+        if type(post_id) is not int or type(liked) is not bool:
+            raise InvalidBatch('Each operation needs an integer "post" and a boolean "liked".')
+        if not 1 <= post_id <= MAX_POST_ID:
+            raise InvalidBatch(f'"post" must be between 1 and {MAX_POST_ID}.')
+        wanted[post_id] = liked
+    return wanted
+
+
+def apply_like_ops(user, wanted):
+    """Applies ``{post_id: liked}`` for ``user``; returns it for the posts that exist."""
+    with transaction.atomic():
+        # The transaction is IMMEDIATE, so SQLite's write lock is held from
+        # here on and the likes read below cannot change before the writes.
+        # Elsewhere a concurrent like is skipped by ignore_conflicts and the
+        # counter drift is repaired by reconcile_post_counters.
+        existing = set(Like.objects.filter(user=user, post_id__in=wanted).values_list('post_id', flat=True))
+        posts = set(Post.objects.filter(pk__in=wanted).values_list('pk', flat=True))
+        to_add = [pk for pk, liked in wanted.items() if liked and pk in posts and pk not in existing]
+        to_remove = [pk for pk, liked in wanted.items() if not liked and pk in existing]
+
+        if to_add:
+            Like.objects.bulk_create([Like(user=user, post_id=pk) for pk in to_add], ignore_conflicts=True)
+        if to_remove:
+            # The counters of the whole batch are adjusted below instead
+            # of by the per-row post_delete receiver.
+            with likes_counted_by_caller():
+                Like.objects.filter(user=user, post_id__in=to_remove).delete()
+
+        deltas = {**{pk: 1 for pk in to_add}, **{pk: -1 for pk in to_remove}}
+        if deltas:
+            invalidate_liked_posts(user.pk, deltas)
+            if getattr(settings, 'POSTS_LIKE_WRITE_BEHIND', False):
+                transaction.on_commit(lambda: like_count_buffer.add(deltas))
+            else:
+                apply_count_deltas(deltas)
+    return {pk: liked for pk, liked in wanted.items() if pk in posts}
+
+
+def apply_count_deltas(deltas):
+    """Adds ``{post_id: delta}`` to the like counters in one UPDATE."""
+    change = Case(
+        *(When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()),
+        default=Value(0), output_field=IntegerField(),
+    )
+    Post.objects.filter(pk__in=deltas).update(like_count=Greatest(F('like_count') + change, 0))
+    for pk in deltas:
+        transaction.on_commit(lambda pk=pk: live.publish(pk))
+
+
+class CountBuffer:
+    """Like counter deltas waiting to be written, for this process."""
+
+    def __init__(self):
+        self.deltas = Counter()
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def add(self, deltas):
+        with self.lock:
+            self.deltas.update(deltas)
+            self._schedule()
+
+    def pending(self, post_id):
+        """The delta buffered for ``post_id`` in this process only."""
+        with self.lock:
+            return self.deltas.get(post_id, 0)
+
+    def _schedule(self):
+        if self.timer is None:
+            self.timer = threading.Timer(getattr(settings, 'POSTS_LIKE_FLUSH_INTERVAL', 2), self._flush_in_thread)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            deltas, self.deltas = self.deltas, Counter()
+            timer, self.timer = self.timer, None
+        if timer is not None:
+            timer.cancel()
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        try:
+            apply_count_deltas(deltas)
+        except Exception:
+            logger.exception('Could not write %s like count deltas; retrying.', len(deltas))
+            self.add(deltas)
+
+    def _flush_in_thread(self):
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+
+
+like_count_buffer = CountBuffer()
+atexit.register(like_count_buffer.flush)
@@ -0,0 +1,90 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Like
+
+# Each cache entry is a bitmap of the posts a user liked within one range
+# of CHUNK_SIZE post ids, so a heavy liker costs at most CHUNK_SIZE / 8
+# bytes per range and a feed page usually touches one or two entries.
+CHUNK_SIZE = 4096
+CACHE_TIMEOUT = 60 * 60
+
+
+def _cache_key(user_id, chunk):
+    return f'posts:liked:{user_id}:{chunk}'
+
+
+def _chunk_query(user_id, chunk):
+    start = chunk * CHUNK_SIZE
+    return Like.objects.filter(
+        user_id=user_id, post_id__gte=start, post_id__lt=start + CHUNK_SIZE,
+    ).values_list('post_id', flat=True)
+
+
+def _to_bitmap(chunk, post_ids):
+    start = chunk * CHUNK_SIZE
+    bitmap = 0
+    for post_id in post_ids:
+        bitmap |= 1 << (post_id - start)
+    return bitmap
+
+
+def _cache_keys(user, post_ids):
+    chunks = {post_id // CHUNK_SIZE for post_id in post_ids}
+    return {_cache_key(user.pk, chunk): chunk for chunk in chunks}
+
+
+def _select(post_ids, bitmaps):
+    return {
+        post_id for post_id in post_ids
+        if bitmaps[post_id // CHUNK_SIZE] >> (post_id % CHUNK_SIZE) & 1
+    }
+
+
+def liked_post_ids(user, post_ids):
+    """Returns the subset of ``post_ids`` that ``user`` has liked."""
+    if not user.is_authenticated or not post_ids:
+        return set()
+
+    keys = _cache_keys(user, post_ids)
+    bitmaps = {keys[key]: bitmap for key, bitmap in cache.get_many(keys).items()}
+
+    missing = {}
+    for key, chunk in keys.items():
+        if chunk not in bitmaps:
+            bitmaps[chunk] = missing[key] = _to_bitmap(chunk, _chunk_query(user.pk, chunk))
+    if missing:
+        cache.set_many(missing, CACHE_TIMEOUT)
+
+    return _select(post_ids, bitmaps)
+
+
+async def aliked_post_ids(user, post_ids):
+    """Async version of liked_post_ids()."""
+    if not user.is_authenticated or not post_ids:
+        return set()
+
+    keys = _cache_keys(user, post_ids)
+    bitmaps = {keys[key]: bitmap for key, bitmap in (await cache.aget_many(keys)).items()}
+
+    missing = {}
+    for key, chunk in keys.items():
+        if chunk not in bitmaps:
+            post_ids_in_chunk = [post_id async for post_id in _chunk_query(user.pk, chunk)]
+            bitmaps[chunk] = missing[key] = _to_bitmap(chunk, post_ids_in_chunk)
+    if missing:
+        await cache.aset_many(missing, CACHE_TIMEOUT)
+
+    return _select(post_ids, bitmaps)
+
+
+def invalidate_liked_post(user_id, post_id):
+    """Drops the cached bitmap covering ``post_id`` once the write commits."""
+    key = _cache_key(user_id, post_id // CHUNK_SIZE)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def invalidate_liked_posts(user_id, post_ids):
+    """invalidate_liked_post() for many posts, in one cache call."""
+    keys = [_cache_key(user_id, chunk) for chunk in {post_id // CHUNK_SIZE for post_id in post_ids}]
+    transaction.on_commit(lambda: cache.delete_many(keys))
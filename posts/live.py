@@ -0,0 +1,166 @@
+"""
+Live like and comment counts, pushed to browsers with Server-Sent Events.
+
+The counter receivers in posts/signals.py publish the id of every post
+whose counts changed to a backend (``POSTS_LIVE_BACKEND``). The default
+one delivers within this process only; a cross-process one, such as a
+Redis pub/sub channel, needs just the same three methods and only has to
+carry post ids.
+
+Each event loop has one hub listening to the backend. The hub collects
+changed ids and, at most ``POSTS_LIVE_MAX_EVENTS_PER_SECOND`` times a
+second, reads their counts in one query and hands them to the
+connections watching those posts. A viral post therefore costs one query
+per tick however many likes it gets or clients it has, and a connection
+gets at most one event per tick. An idle connection is a small watcher
+object and a suspended coroutine.
+"""
+import asyncio
+import functools
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+
+class InProcessBackend:
+    """Delivers changes to listeners in this process."""
+
+    def __init__(self):
+        self.listeners = set()
+
+    def publish(self, post_id):
+        for listener in list(self.listeners):
+            listener(post_id)
+
+    def subscribe(self, listener):
+        self.listeners.add(listener)
+
+    def unsubscribe(self, listener):
+        self.listeners.discard(listener)
+
+
+@functools.cache
+def _load_backend(path):
+    return import_string(path)()
+
+
+def get_backend():
+    return _load_backend(getattr(settings, 'POSTS_LIVE_BACKEND', 'posts.live.InProcessBackend'))
+
+
+def publish(post_id):
+    """Tells watchers that the counts of ``post_id`` changed; call after commit."""
+    get_backend().publish(post_id)
+
+
+def tick_interval():
+    return 1 / getattr(settings, 'POSTS_LIVE_MAX_EVENTS_PER_SECOND', 2)
+
+
+async def fetch_counts(post_ids):
+    return {
+        pk: {'likes': likes, 'comments': comments}
+        async for pk, likes, comments in Post.objects.filter(pk__in=post_ids).values_list(
+            'pk', 'like_count', 'comment_count',
+        )
+    }
+
+
+class Watcher:
+    __slots__ = ('post_ids', 'pending', 'ready')
+
+    def __init__(self, post_ids):
+        self.post_ids = post_ids
+        self.pending = {}
+        self.ready = asyncio.Event()
+
+    def push(self, post_id, counts):
+        self.pending[post_id] = counts
+        self.ready.set()
+
+    async def next_update(self, timeout):
+        """The counts changed since the last call, or {} after ``timeout`` seconds."""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        self.ready.clear()
+        pending, self.pending = self.pending, {}
+        return pending
+
+
+class Hub:
+    def __init__(self, loop, backend):
+        self.loop = loop
+        self.backend = backend
+        self.watchers = defaultdict(set)
+        self.dirty = set()
+        self.ticker = None
+
+    def add(self, watcher):
+        if not self.watchers:
+            self.backend.subscribe(self.changed)
+        for post_id in watcher.post_ids:
+            self.watchers[post_id].add(watcher)
+
+    def remove(self, watcher):
+        for post_id in watcher.post_ids:
+            watchers = self.watchers.get(post_id)
+            if watchers is not None:
+                watchers.discard(watcher)
+                if not watchers:
+                    del self.watchers[post_id]
+        if not self.watchers:
+            self.backend.unsubscribe(self.changed)
+            if self.ticker is not None:
+                self.ticker.cancel()
+                self.ticker = None
+
+    def changed(self, post_id):
+        # Called by the backend, possibly from another thread.
+        try:
+            self.loop.call_soon_threadsafe(self._mark, post_id)
+        except RuntimeError:  # The loop has closed.
+            self.backend.unsubscribe(self.changed)
+
+    def _mark(self, post_id):
+        if post_id in self.watchers:
+            self.dirty.add(post_id)
+            if self.ticker is None:
+                self.ticker = self.loop.create_task(self._tick())
+
+    async def _tick(self):
+        try:
+            while self.dirty:
+                # Changes arriving during the wait go out together.
+                await asyncio.sleep(tick_interval())
+                post_ids, self.dirty = self.dirty, set()
+                for post_id, counts in (await fetch_counts(post_ids)).items():
+                    for watcher in self.watchers.get(post_id, ()):
+                        watcher.push(post_id, counts)
+        finally:
+            self.ticker = None
+
+
+_hubs = {}
+
+
+@asynccontextmanager
+async def watch(post_ids):
+    """Yields a Watcher that receives count changes for ``post_ids``."""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = Hub(loop, get_backend())
+    watcher = Watcher(tuple(post_ids))
+    hub.add(watcher)
+    try:
+        yield watcher
+    finally:
+        hub.remove(watcher)
+        if not hub.watchers:
+            _hubs.pop(loop, None)
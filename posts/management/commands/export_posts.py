@@ -0,0 +1,17 @@
+from posts.models import Post
+from Quiz4.bulkio import BulkExportCommand
+
+
+class Command(BulkExportCommand):
+    help = 'Streams every post out as CSV or JSON Lines with constant memory.'
+    fields = ('id', 'user_email', 'slug', 'content', 'created_at', 'like_count', 'comment_count')
+
+    def get_queryset(self):
+        return Post.objects.order_by('pk').values_list(
+            'pk', 'user__email', 'slug', 'content', 'created_at', 'like_count', 'comment_count',
+        )
+
+    def format_row(self, values):
+        values = list(values)
+        values[4] = values[4].isoformat()
+        return values
@@ -0,0 +1,25 @@
+from posts.models import Post
+from Quiz4.bulkio import BulkImportCommand
+
+
+class Command(BulkImportCommand):
+    help = (
+        'Streams posts from a CSV or JSON Lines file into the database in chunks. '
+        'Columns: content and optionally user_email.'
+    )
+    model = Post
+    text_fields = ('user_email', 'content')
+
+    def build_objects(self, chunk):
+        users = self.resolve_users(chunk)
+        posts = []
+        for number, row in chunk:
+            user_id = self.user_id_for(row, users)
+            content = (row.get('content') or '').strip()
+            if user_id is None:
+                self.report_error(number, 'unknown or missing user_email.')
+            elif not content:
+                self.report_error(number, 'content cannot be empty.')
+            else:
+                posts.append(Post(user_id=user_id, content=content))
+        return posts
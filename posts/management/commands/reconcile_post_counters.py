@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from posts.models import Post, Like, Comment
+
+
+def _count_subquery(model):
+    counts = (
+        model.objects.filter(post=OuterRef('pk'))
+        .order_by()
+        .values('post')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def _actual_counts(model, post_ids):
+    rows = (
+        model.objects.filter(post_id__in=post_ids)
+        .order_by()
+        .values('post_id')
+        .annotate(total=Count('pk'))
+        .values_list('post_id', 'total')
+    )
+    return dict(rows)
+
+
+class Command(BaseCommand):
+    help = (
+        'Repairs drift in the denormalized Post.like_count and Post.comment_count columns. '
+        'With POSTS_LIKE_WRITE_BEHIND, run it only while no process has like count deltas '
+        'buffered, or they are counted twice when flushed; see posts/like_batch.py.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it.')
+
+    def handle(self, *args, batch_size, dry_run, **options):
+        last_pk = 0
+        checked = repaired = 0
+        while True:
+            batch = list(
+                Post.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', 'like_count', 'comment_count')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            post_ids = [pk for pk, _, _ in batch]
+            likes = _actual_counts(Like, post_ids)
+            comments = _actual_counts(Comment, post_ids)
+            drifted = [
+                pk for pk, like_count, comment_count in batch
+                if likes.get(pk, 0) != like_count or comments.get(pk, 0) != comment_count
+            ]
+            checked += len(batch)
+            repaired += len(drifted)
+            if drifted and not dry_run:
+                # Recount inside the UPDATE itself so concurrent likes are not lost.
+                with transaction.atomic():
+                    Post.objects.filter(pk__in=drifted).update(
+                        like_count=_count_subquery(Like),
+                        comment_count=_count_subquery(Comment),
+                    )
+
+        verb = 'Found' if dry_run else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} posts. {verb} {repaired} with drifted counters.'))
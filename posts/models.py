@@ -1,17 +1,79 @@
 import uuid
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.conf import settings
 from django.utils.text import slugify
 from django.urls import reverse
 
+from blobs.storage import blob_storage
+
+
+def base_slug_for(content):
+    return slugify(content[:50]) or 'post'
+
+
+def pk_slug(base_slug, pk):
+    # slugify() never emits "--", so "<base>--<pk>" cannot collide with
+    # any bare slug nor with another post's suffixed one.
+    return f'{base_slug}--{pk}'
+
+
+def placeholder_slug(base_slug):
+    return f'{base_slug}--{uuid.uuid4().hex}'
+
+
+class PostQuerySet(models.QuerySet):
+    def bulk_create(self, objs, batch_size=None, **kwargs):
+        """
+        Gives every post without a slug a "<base>--<pk>" slug.
+
+        The rows go in with unique placeholder slugs and get their final
+        slugs in one bulk UPDATE per batch, so a batch costs two statements
+        however many slugs clash. On backends that do not return primary
+        keys from bulk inserts the placeholders are kept.
+        """
+        objs = list(objs)
+        pending = []
+        for post in objs:
+            if not post.slug:
+                base_slug = base_slug_for(post.content)
+                post.slug = placeholder_slug(base_slug)
+                pending.append((post, base_slug))
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            created = super().bulk_create(objs, batch_size=batch_size, **kwargs)
+            renamed = []
+            for post, base_slug in pending:
+                if post.pk is not None:
+                    post.slug = pk_slug(base_slug, post.pk)
+                    renamed.append(post)
+            if renamed:
+                self.bulk_update(renamed, ['slug'], batch_size=batch_size)
+        return created
+
 
 class Post(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content = models.TextField()
-    image = models.ImageField(upload_to='post_images/', blank=True, null=True)
+    image = models.ImageField(upload_to='post_images/', storage=blob_storage, blank=True, null=True)
+    # Resized copies of `image`, filled in by posts/images.py.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     slug = models.SlugField(max_length=200, unique=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized counters, kept in step by the receivers in posts/signals.py.
+    # Use `manage.py reconcile_post_counters` to repair any drift.
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    COUNTER_FIELDS = ('like_count', 'comment_count')
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Backs the keyset-paginated news feed.
+            models.Index(fields=['-created_at', '-id'], name='post_feed_idx'),
+        ]
 
     def __str__(self):
         return f"Post by {self.user.email} on {self.created_at}"
@@ -20,30 +82,54 @@ class Post(models.Model):
         return reverse('posts:post-detail', kwargs={'slug': self.slug})
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.content[:50] or "post")
-            unique_slug = base_slug
-            while Post.objects.filter(slug=unique_slug).exists():
-                unique_slug = f'{base_slug}-{uuid.uuid4().hex[:4]}'
-            self.slug = unique_slug
-        super().save(*args, **kwargs)
-
-    @property
-    def comment_count(self):
-        return self.comment_set.count()
-
-    @property
-    def like_count(self):
-        return self.like_set.count()
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            if not self.slug:
+                self.slug = pk_slug(base_slug_for(self.content), self.pk)
+            # Never write the counters back from a possibly stale instance.
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        if self._state.adding and not self.slug:
+            self._insert_with_new_slug(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+
+    def _insert_with_new_slug(self, *args, **kwargs):
+        base_slug = base_slug_for(self.content)
+        self.slug = base_slug
+        try:
+            # Let the unique index decide instead of checking first, which
+            # could race with another insert anyway.
+            with transaction.atomic(using=kwargs.get('using')):
+                super().save(*args, **kwargs)
+            return
+        except IntegrityError:
+            self.pk = None
+
+        # The bare slug is taken, so suffix it with our own primary key.
+        with transaction.atomic(using=kwargs.get('using')):
+            self.slug = placeholder_slug(base_slug)
+            super().save(*args, **kwargs)
+            self.slug = pk_slug(base_slug, self.pk)
+            Post.objects.filter(pk=self.pk).update(slug=self.slug)
 
 class Comment(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    # Replies are one level deep: a reply to a reply joins its thread.
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pages of a post's comments, newest first.
+            models.Index(fields=['post', '-created_at', '-id'], name='comment_post_recent_idx'),
+            # Replies of a page of comments, oldest first.
+            models.Index(fields=['parent', 'created_at', 'id'], name='comment_reply_idx'),
+        ]
 
     def __str__(self):
         return f'Comment by {self.user.email} on {self.post}'
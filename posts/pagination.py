@@ -0,0 +1,81 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(created_at, pk):
+    raw = f'{created_at.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset ordered newest first on (created_at, id), or
+    oldest first with ``descending=False``.
+
+    Each page is a single indexed range scan, so its cost does not depend
+    on how deep the reader has scrolled the way an OFFSET would.
+    """
+
+    def __init__(self, queryset, per_page, field='created_at', descending=True):
+        sign = '-' if descending else ''
+        self.queryset = queryset.order_by(f'{sign}{field}', f'{sign}id')
+        self.per_page = per_page
+        self.field = field
+        self.lookup = 'lt' if descending else 'gt'
+
+    def _slice(self, cursor):
+        queryset = self.queryset
+        if cursor:
+            value, pk = decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{self.lookup}': value}) |
+                Q(**{self.field: value, f'id__{self.lookup}': pk})
+            )
+        # One extra row tells us whether there is a next page without a COUNT.
+        return queryset[:self.per_page + 1]
+
+    def _make_page(self, rows):
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            last = rows[-1]
+            next_cursor = encode_cursor(getattr(last, self.field), last.pk)
+        return KeysetPage(rows, next_cursor)
+
+    def page(self, cursor=None):
+        return self._make_page(list(self._slice(cursor)))
+
+    async def apage(self, cursor=None):
+        """Async version of page() for async views."""
+        return self._make_page([row async for row in self._slice(cursor)])
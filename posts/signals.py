@@ -1,19 +1,73 @@
-import random
-import string
-from django.utils.text import slugify
-
-def random_string_generator(size=10, chars=string.ascii_lowercase + string.digits):
-    return ''.join(random.choice(chars) for _ in range(size))
-
-def unique_slug_generator(instance, new_slug=None):
-    if new_slug is not None:
-        slug = new_slug
-    else:
-        slug = slugify(instance.title)
-
-    Klass = instance.__class__
-    qs = Klass.objects.filter(slug=slug)
-    if qs.exists():
-        new_slug = f"{slug}-{random_string_generator(size=4)}"
-        return unique_slug_generator(instance, new_slug=new_slug)
-    return slug
\ No newline at end of file
+import contextvars
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from . import live
+from .likes import invalidate_liked_post
+from .models import Post, Comment, Like
+
+
+# Set while posts/like_batch.py deletes likes whose counters and cached
+# like state it updates for the whole batch at once.
+_batch_counted = contextvars.ContextVar('likes_batch_counted', default=False)
+
+
+@contextmanager
+def likes_counted_by_caller():
+    token = _batch_counted.set(True)
+    try:
+        yield
+    finally:
+        _batch_counted.reset(token)
+
+
+# The posts a delete() is removing, kept on the object it was called on,
+# e.g. a user whose posts cascade. Their likes and comments go with them
+# and leave their counters alone.
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, origin=None, **kwargs):
+    if origin is not None:
+        if not hasattr(origin, '_deleting_post_ids'):
+            origin._deleting_post_ids = set()
+        origin._deleting_post_ids.add(instance.pk)
+
+
+def _post_deleted_too(instance, origin):
+    return instance.post_id in getattr(origin, '_deleting_post_ids', ())
+
+
+def _bump_counter(post_id, field, delta):
+    Post.objects.filter(pk=post_id).update(**{field: Greatest(F(field) + delta, 0)})
+    transaction.on_commit(lambda: live.publish(post_id))
+
+
+@receiver(post_save, sender=Like)
+def like_created(sender, instance, created, **kwargs):
+    if created:
+        _bump_counter(instance.post_id, 'like_count', 1)
+        invalidate_liked_post(instance.user_id, instance.post_id)
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, origin=None, **kwargs):
+    if _batch_counted.get() or _post_deleted_too(instance, origin):
+        return
+    _bump_counter(instance.post_id, 'like_count', -1)
+    invalidate_liked_post(instance.user_id, instance.post_id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        _bump_counter(instance.post_id, 'comment_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, origin=None, **kwargs):
+    if _post_deleted_too(instance, origin):
+        return
+    _bump_counter(instance.post_id, 'comment_count', -1)
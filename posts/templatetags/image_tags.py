@@ -0,0 +1,35 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(field_file, variants, sizes='100vw', **attrs):
+    """
+    Renders an uploaded image with WebP and JPEG srcsets of its derivatives.
+
+    Usage: {% responsive_image post.image post.image_variants sizes="(min-width: 992px) 640px, 100vw" class="img-fluid" alt="" %}
+
+    Until the derivatives exist the original is served as a plain <img>.
+    """
+    if not field_file:
+        return ''
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    if not variants:
+        return format_html('<img src="{}"{}>', field_file.url, flatatt(attrs))
+
+    storage = field_file.storage
+    widths = sorted(variants, key=int)
+
+    def srcset(ext):
+        return ', '.join(f'{storage.url(variants[width][ext])} {width}w' for width in widths)
+
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        srcset('webp'), sizes,
+        storage.url(variants[widths[-1]]['jpg']), srcset('jpg'), sizes, flatatt(attrs),
+    )
@@ -0,0 +1,87 @@
+"""
+Feed cards, rendered once per version of a post and cached whole.
+
+posts/post_card.html holds everything about a post that is the same for
+every viewer: the author, the content, the image and the links. Where a
+card differs per viewer or per moment, the relative timestamp, the
+owner's menu and the like state with the counters, the template has a
+``<!--slot-->`` marker. The cached card is kept split at those markers
+and the slots are filled in for each request. Post content is escaped,
+so it can never contain a marker.
+
+A feed page fetches all of its cards with one ``get_many()`` and renders
+only the missing ones.
+"""
+import zlib
+
+from django import template
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils.html import escape, format_html
+from django.utils.safestring import mark_safe
+from django.utils.timesince import timesince
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/post_card.html'
+CARD_TIMEOUT = 60 * 60 * 24
+SLOT = '<!--slot-->'
+
+
+def card_key(post):
+    # updated_at moves on every edit and when image variants are stored;
+    # the checksum covers a change of the author's email.
+    email = zlib.crc32(post.user.email.encode())
+    return f'posts:card:{post.pk}:{post.updated_at.timestamp()}:{email:x}'
+
+
+def _owner_menu(post):
+    return format_html(
+        '<div class="dropdown ms-auto">'
+        '<button class="btn btn-light btn-sm rounded-circle" type="button" data-bs-toggle="dropdown">'
+        '<i class="bi bi-three-dots"></i></button>'
+        '<ul class="dropdown-menu dropdown-menu-end">'
+        '<li><a class="dropdown-item" href="{}">Edit</a></li>'
+        '<li><a class="dropdown-item text-danger" href="{}">Delete</a></li>'
+        '</ul></div>',
+        reverse('posts:post-update', args=[post.slug]), reverse('posts:post-delete', args=[post.slug]),
+    )
+
+
+def _counts(post, liked):
+    return format_html(
+        '<span class="me-3{}"><i class="bi {} me-1"></i><span data-live-likes="{}">{}</span></span>'
+        '<span class="me-3"><i class="bi bi-chat me-1"></i><span data-live-comments="{}">{}</span></span>',
+        ' text-primary' if liked else '', 'bi-hand-thumbs-up-fill' if liked else 'bi-hand-thumbs-up',
+        post.pk, post.like_count, post.pk, post.comment_count,
+    )
+
+
+@register.simple_tag(takes_context=True)
+def feed_cards(context, posts):
+    """Usage: {% feed_cards object_list %}, with liked_post_ids in the context."""
+    posts = list(posts)
+    keys = {post.pk: card_key(post) for post in posts}
+    cards = cache.get_many(keys.values())
+
+    missing = {}
+    card_template = context.template.engine.get_template(CARD_TEMPLATE)
+    for post in posts:
+        if keys[post.pk] not in cards:
+            parts = card_template.render(template.Context({'post': post}, autoescape=context.autoescape)).split(SLOT)
+            cards[keys[post.pk]] = missing[keys[post.pk]] = parts
+    if missing:
+        cache.set_many(missing, CARD_TIMEOUT)
+
+    user = context['request'].user
+    liked_post_ids = context.get('liked_post_ids', ())
+    html = []
+    for post in posts:
+        before_since, before_menu, before_counts, rest = cards[keys[post.pk]]
+        html += [
+            before_since, escape(timesince(post.created_at)),
+            before_menu, _owner_menu(post) if post.user_id == user.pk else '',
+            before_counts, _counts(post, post.pk in liked_post_ids),
+            rest,
+        ]
+    return mark_safe(''.join(html))
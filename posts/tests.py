@@ -1,3 +1,541 @@
-from django.test import TestCase
+import asyncio
+from datetime import timedelta
+import os
+import tempfile
+from unittest import mock
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from .forms import PostForm
+from . import live
+from .comments import COMMENTS_PER_PAGE, REPLY_PREVIEW
+from .like_batch import MAX_OPS, like_count_buffer
+from .likes import CHUNK_SIZE, liked_post_ids
+from .models import Post, Comment, Like, pk_slug
+from .pagination import KeysetPaginator, encode_cursor
+from .templatetags.post_cards import card_key
+
+
+class FeedPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='feed@example.com', password='pass12345')
+        posts = [Post.objects.create(user=cls.user, content=f'post {i}') for i in range(45)]
+        # Pairs of posts share a timestamp so the id tiebreaker matters.
+        base = timezone.now()
+        for i, post in enumerate(posts):
+            Post.objects.filter(pk=post.pk).update(created_at=base - timedelta(minutes=i // 2))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_pages_cover_every_post_once(self):
+        paginator = KeysetPaginator(Post.objects.all(), 20)
+        seen = []
+        cursor = None
+        while True:
+            page = paginator.page(cursor)
+            seen.extend(post.pk for post in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        expected = list(Post.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_feed_renders_first_page_with_next_link(self):
+        response = self.client.get(reverse('posts:post-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['object_list']), 20)
+        self.assertContains(response, 'data-next-url')
+
+    def test_query_count_does_not_grow_with_depth(self):
+        first_page = self.client.get(reverse('posts:post-feed-page'))
+        with CaptureQueriesContext(connection) as shallow:
+            self.client.get(reverse('posts:post-feed-page'))
+        cursor = first_page.context['page_obj'].next_cursor
+        second_page = self.client.get(reverse('posts:post-feed-page'), {'cursor': cursor})
+        cursor = second_page.context['page_obj'].next_cursor
+        with CaptureQueriesContext(connection) as deep:
+            response = self.client.get(reverse('posts:post-feed-page'), {'cursor': cursor})
+        self.assertEqual(len(response.context['object_list']), 5)
+        self.assertEqual(len(shallow.captured_queries), len(deep.captured_queries))
+
+    def test_anonymous_feed_page_redirects_to_signin(self):
+        self.client.logout()
+        response = self.client.get(reverse('posts:post-feed-page'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('auth:signin'), response['Location'])
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(reverse('posts:post-feed-page'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_feed_and_comment_queries_use_indexes(self):
+        feed = KeysetPaginator(Post.objects.all(), 20)._slice(None)
+        self.assertIn('INDEX post_feed_idx', feed.explain())
+        comments = Comment.objects.filter(post=Post.objects.first())[:20]
+        self.assertIn('INDEX comment_post_recent_idx', comments.explain())
+
+    def test_cursor_round_trip(self):
+        post = Post.objects.first()
+        page = KeysetPaginator(Post.objects.all(), 100).page(encode_cursor(post.created_at, post.pk))
+        self.assertNotIn(post, list(page))
+
+
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='thread@example.com')
+        cls.post = Post.objects.create(user=cls.user, content='a viral post')
+        cls.other_post = Post.objects.create(user=cls.user, content='another post')
+        base = timezone.now()
+        comments = Comment.objects.bulk_create(
+            Comment(post=cls.post, user=CustomUser.objects.create_user(email=f'c{i}@example.com'), content=f'comment {i}')
+            for i in range(COMMENTS_PER_PAGE + 5)
+        )
+        for i, comment in enumerate(comments):
+            Comment.objects.filter(pk=comment.pk).update(created_at=base - timedelta(minutes=i))
+        cls.newest = comments[0]
+        cls.replies = Comment.objects.bulk_create(
+            Comment(post=cls.post, parent=cls.newest, user=cls.user, content=f'reply {i}')
+            for i in range(REPLY_PREVIEW + 2)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def comments_url(self, **params):
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+        return f"{reverse('posts:post-comments', args=[self.post.slug])}?{query}"
+
+    def test_detail_renders_one_page_with_reply_previews(self):
+        response = self.client.get(self.post.get_absolute_url())
+        page = response.context['comments']
+        self.assertEqual(len(page), COMMENTS_PER_PAGE)
+        self.assertTrue(page.has_next)
+        self.assertEqual(page.object_list[0], self.newest)
+        self.assertEqual(page.object_list[0].preview_replies, self.replies[:REPLY_PREVIEW])
+        self.assertEqual(page.object_list[0].reply_count, len(self.replies))
+        self.assertContains(response, 'View more replies')
+
+    def test_detail_query_count_does_not_grow_with_comments(self):
+        self.client.get(self.post.get_absolute_url())
+        # Post, comment page, reply previews; the liked state is cached by now.
+        with self.assertNumQueries(3):
+            self.client.get(self.post.get_absolute_url())
+
+    def test_endpoint_serves_older_comments_by_cursor(self):
+        first = self.client.get(self.post.get_absolute_url()).context['comments']
+        data = self.client.get(self.comments_url(cursor=first.next_cursor)).json()
+        self.assertEqual(len(data['comments']), 5)
+        self.assertIsNone(data['next_cursor'])
+        self.assertFalse({c['id'] for c in data['comments']} & {c.pk for c in first})
+        self.assertIn('comment 24', data['html'])
+
+    def test_endpoint_serves_the_rest_of_a_thread_oldest_first(self):
+        preview = self.client.get(self.post.get_absolute_url()).context['comments'].object_list[0]
+        data = self.client.get(self.comments_url(parent=self.newest.pk, cursor=preview.replies_cursor)).json()
+        self.assertEqual([c['id'] for c in data['comments']], [r.pk for r in self.replies[REPLY_PREVIEW:]])
+
+    def test_invalid_cursor_is_404(self):
+        self.assertEqual(self.client.get(self.comments_url(cursor='bogus')).status_code, 404)
+        self.assertEqual(self.client.get(self.comments_url(parent='x')).status_code, 404)
+
+    def test_reply_to_a_reply_joins_the_thread(self):
+        self.client.post(self.post.get_absolute_url(), {'content': 'nested', 'parent': self.replies[0].pk})
+        self.assertEqual(Comment.objects.get(content='nested').parent, self.newest)
+
+    def test_cannot_reply_to_a_comment_on_another_post(self):
+        foreign = Comment.objects.create(post=self.other_post, user=self.user, content='elsewhere')
+        response = self.client.post(self.post.get_absolute_url(), {'content': 'hijack', 'parent': foreign.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Comment.objects.filter(content='hijack').exists())
+
+    def test_thread_queries_use_indexes(self):
+        top_level = Comment.objects.filter(post=self.post, parent=None).order_by('-created_at', '-id')[:21]
+        self.assertIn('INDEX comment_post_recent_idx', top_level.explain())
+        replies = Comment.objects.filter(parent__in=[self.newest.pk]).order_by('parent', 'created_at', 'id')
+        self.assertIn('INDEX comment_reply_idx', replies.explain())
+
+
+@override_settings(POSTS_LIVE_MAX_EVENTS_PER_SECOND=50)
+class LiveCountsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='live@example.com')
+        cls.post = Post.objects.create(user=cls.user, content='watched')
+
+    def url(self, *post_ids):
+        return reverse('posts:live-counts') + '?' + '&'.join(f'post={pk}' for pk in post_ids)
+
+    def test_wsgi_sends_the_counts_once_and_asks_the_browser_to_poll(self):
+        response = self.client.get(self.url(self.post.pk))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(
+            response.content.decode(),
+            f'retry: 15000\nevent: counts\ndata: {{"{self.post.pk}": {{"likes": 0, "comments": 0}}}}\n\n',
+        )
+
+    def test_post_ids_are_validated(self):
+        self.assertEqual(self.client.get(self.url()).status_code, 400)
+        self.assertEqual(self.client.get(self.url('x')).status_code, 400)
+        self.assertEqual(self.client.get(self.url(*range(51))).status_code, 400)
+
+    async def test_asgi_streams_changes(self):
+        response = await self.async_client.get(self.url(self.post.pk))
+        events = aiter(response.streaming_content)
+        self.assertIn('"likes": 0', (await anext(events)).decode())
+        await Post.objects.filter(pk=self.post.pk).aupdate(like_count=3)
+        live.publish(self.post.pk)
+        self.assertIn('"likes": 3', (await anext(events)).decode())
+        # ASGI servers cancel the stream when the browser goes away.
+        waiting = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(live.get_backend().listeners, set())
+
+    async def test_bursts_are_coalesced_into_one_update_per_tick(self):
+        await Post.objects.filter(pk=self.post.pk).aupdate(like_count=50)
+        async with live.watch([self.post.pk]) as watcher:
+            for _ in range(50):
+                live.publish(self.post.pk)
+            self.assertEqual(await watcher.next_update(1), {self.post.pk: {'likes': 50, 'comments': 0}})
+            self.assertEqual(await watcher.next_update(0.1), {})
+
+    async def test_unwatched_posts_are_not_fetched(self):
+        async with live.watch([self.post.pk]) as watcher:
+            live.publish(self.post.pk + 1000)
+            self.assertEqual(await watcher.next_update(0.1), {})
+
+    def test_counter_changes_are_published_after_commit(self):
+        with mock.patch.object(live, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                Like.objects.create(user=self.user, post=self.post)
+            publish.assert_called_once_with(self.post.pk)
+
+
+class LikeBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='batch@example.com')
+        cls.posts = [Post.objects.create(user=cls.user, content=f'batched {i}') for i in range(5)]
+        Like.objects.create(user=cls.user, post=cls.posts[0])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def send(self, *ops):
+        payload = {'ops': [{'post': post.pk, 'liked': liked} for post, liked in ops]}
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('posts:like-batch'), payload, content_type='application/json')
+
+    def like_counts(self):
+        return list(Post.objects.filter(pk__in=[p.pk for p in self.posts]).order_by('pk').values_list('like_count', flat=True))
+
+    def test_applies_likes_and_unlikes(self):
+        response = self.send((self.posts[0], False), (self.posts[1], True), (self.posts[2], True))
+        self.assertEqual(response.json()['posts'][str(self.posts[1].pk)], {'liked': True, 'like_count': 1})
+        self.assertEqual(self.like_counts(), [0, 1, 1, 0, 0])
+        self.assertEqual(liked_post_ids(self.user, [p.pk for p in self.posts]), {self.posts[1].pk, self.posts[2].pk})
+
+    def test_repeating_a_batch_changes_nothing(self):
+        ops = [(self.posts[0], True), (self.posts[1], True)]
+        self.send(*ops)
+        self.send(*ops)
+        self.assertEqual(self.like_counts(), [1, 1, 0, 0, 0])
+        self.assertEqual(Like.objects.filter(user=self.user).count(), 2)
+
+    def test_last_operation_on_a_post_wins(self):
+        self.send((self.posts[1], True), (self.posts[1], False), (self.posts[2], False), (self.posts[2], True))
+        self.assertEqual(self.like_counts(), [1, 0, 1, 0, 0])
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        self.send((self.posts[0], True))  # Caches the user.
+        with CaptureQueriesContext(connection) as small:
+            self.send((self.posts[0], False), (self.posts[1], True))
+        with CaptureQueriesContext(connection) as large:
+            self.send((self.posts[0], True), (self.posts[1], False), *[(post, True) for post in self.posts[2:]])
+        self.assertEqual(len(small), len(large))
+
+    def test_invalid_batches_are_rejected(self):
+        url = reverse('posts:like-batch')
+        bodies = [
+            'nope', '{}', '{"ops": []}', '{"ops": [{"post": "1", "liked": true}]}',
+            '{"ops": [{"post": 0, "liked": true}]}', f'{{"ops": [{{"post": {2 ** 70}, "liked": true}}]}}',
+        ]
+        for body in bodies:
+            with self.subTest(body=body):
+                response = self.client.post(url, body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+        too_many = {'ops': [{'post': n, 'liked': True} for n in range(MAX_OPS + 1)]}
+        self.assertEqual(self.client.post(url, too_many, content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.client.logout()
+        self.assertEqual(self.client.post(url, {'ops': []}, content_type='application/json').status_code, 401)
+
+    def test_unlikes_are_counted_once_per_batch(self):
+        self.send((self.posts[1], True), (self.posts[2], True))
+        with mock.patch('posts.signals._bump_counter') as bump:
+            self.send((self.posts[0], False), (self.posts[1], False), (self.posts[2], False))
+        bump.assert_not_called()
+        self.assertEqual(self.like_counts(), [0, 0, 0, 0, 0])
+        # Outside a batch a deleted like still updates its counter.
+        Like.objects.create(user=self.user, post=self.posts[3])
+        Like.objects.filter(user=self.user).delete()
+        self.assertEqual(self.like_counts(), [0, 0, 0, 0, 0])
+
+    @override_settings(POSTS_LIKE_WRITE_BEHIND=True, POSTS_LIKE_FLUSH_INTERVAL=3600)
+    def test_write_behind_buffers_counts_until_flushed(self):
+        self.addCleanup(like_count_buffer.flush)
+        self.send((self.posts[1], True), (self.posts[2], True))
+        self.assertEqual(like_count_buffer.pending(self.posts[1].pk), 1)
+        self.send((self.posts[1], False))
+        self.assertEqual(self.like_counts(), [1, 0, 0, 0, 0])
+        self.assertEqual(Like.objects.filter(user=self.user).count(), 2)
+
+        with self.assertNumQueries(1):
+            like_count_buffer.flush()
+        self.assertEqual(self.like_counts(), [1, 0, 1, 0, 0])
+
+
+class PostCounterTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='counter@example.com', password='pass12345')
+        self.post = Post.objects.create(user=self.user, content='counted')
+        self.client.force_login(self.user)
+
+    def test_toggle_like_updates_stored_count(self):
+        url = reverse('posts:toggle-like', args=[self.post.slug])
+        response = self.client.post(url)
+        self.assertEqual(response.json(), {'liked': True, 'like_count': 1})
+        response = self.client.post(url)
+        self.assertEqual(response.json(), {'liked': False, 'like_count': 0})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    async def test_toggle_like_under_async_client(self):
+        await self.async_client.aforce_login(self.user)
+        url = reverse('posts:toggle-like', args=[self.post.slug])
+        response = await self.async_client.post(url)
+        self.assertEqual(response.json(), {'liked': True, 'like_count': 1})
+        self.assertTrue(await Like.objects.filter(user=self.user, post=self.post).aexists())
+
+    def test_comments_update_stored_count(self):
+        comment = Comment.objects.create(user=self.user, post=self.post, content='hi')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_deleting_posts_skips_their_counters(self):
+        other = CustomUser.objects.create_user(email='other@example.com', password='pass12345')
+        others_post = Post.objects.create(user=other, content='liked by the deleted user')
+        Like.objects.create(user=self.user, post=others_post)
+        for i in range(3):
+            liker = CustomUser.objects.create_user(email=f'liker{i}@example.com')
+            Like.objects.create(user=liker, post=self.post)
+            Comment.objects.create(user=liker, post=self.post, content=f'comment {i}')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.user.delete()
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "posts_post"')]
+        # Only the like on the surviving post is counted down.
+        self.assertEqual(len(updates), 1)
+        others_post.refresh_from_db()
+        self.assertEqual(others_post.like_count, 0)
+
+    def test_saving_a_stale_instance_keeps_counters(self):
+        stale = Post.objects.get(pk=self.post.pk)
+        Like.objects.create(user=self.user, post=self.post)
+        stale.content = 'edited'
+        stale.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(self.post.content, 'edited')
+
+    def test_reconcile_repairs_drift(self):
+        Like.objects.create(user=self.user, post=self.post)
+        Post.objects.filter(pk=self.post.pk).update(like_count=7, comment_count=3)
+        out = StringIO()
+        call_command('reconcile_post_counters', batch_size=1, stdout=out)
+        self.assertIn('Repaired 1', out.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 0))
+
+
+class LikedPostCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='liker@example.com', password='pass12345')
+        self.posts = [Post.objects.create(user=self.user, content=f'post {i}') for i in range(3)]
+        Like.objects.create(user=self.user, post=self.posts[0])
+        Like.objects.create(user=self.user, post=self.posts[2])
+
+    def test_lookup_is_scoped_and_cached(self):
+        ids = [post.pk for post in self.posts]
+        with self.assertNumQueries(1):
+            self.assertEqual(liked_post_ids(self.user, ids), {ids[0], ids[2]})
+        with self.assertNumQueries(0):
+            self.assertEqual(liked_post_ids(self.user, ids[1:]), {ids[2]})
+
+    def test_ids_in_other_chunks_are_not_liked(self):
+        far_id = self.posts[0].pk + CHUNK_SIZE
+        self.assertEqual(liked_post_ids(self.user, [far_id]), set())
+
+    def test_toggle_like_invalidates_cache(self):
+        post = self.posts[1]
+        self.assertEqual(liked_post_ids(self.user, [post.pk]), set())
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('posts:toggle-like', args=[post.slug]))
+        self.assertEqual(liked_post_ids(self.user, [post.pk]), {post.pk})
+
+
+class PostSlugTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='slugs@example.com', password='pass12345')
+
+    def test_free_slug_is_taken_in_one_insert(self):
+        with self.assertNumQueries(3):  # SAVEPOINT, INSERT, RELEASE
+            post = Post.objects.create(user=self.user, content='Hello world')
+        self.assertEqual(post.slug, 'hello-world')
+
+    def test_clashing_slug_gets_pk_suffix(self):
+        Post.objects.create(user=self.user, content='Hello world')
+        post = Post.objects.create(user=self.user, content='Hello world!')
+        self.assertEqual(post.slug, pk_slug('hello-world', post.pk))
+        self.assertEqual(Post.objects.get(pk=post.pk).slug, post.slug)
+
+    def test_content_without_letters_falls_back_to_post(self):
+        post = Post.objects.create(user=self.user, content='!!!')
+        self.assertEqual(post.slug, 'post')
+
+    def test_bulk_create_assigns_unique_slugs(self):
+        posts = Post.objects.bulk_create(
+            [Post(user=self.user, content='Same text') for _ in range(5)], batch_size=2,
+        )
+        slugs = set(Post.objects.values_list('slug', flat=True))
+        self.assertEqual(slugs, {pk_slug('same-text', post.pk) for post in posts})
+
+
+class PostBulkCommandTests(TestCase):
+    def test_import_and_export_posts(self):
+        user = CustomUser.objects.create_user(email='bulk@example.com', password='pass12345')
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'posts.jsonl')
+            with open(source, 'w') as f:
+                f.write('{"user_email": "bulk@example.com", "content": "Same"}\n')
+                f.write('{"user_email": "nobody@example.com", "content": "Lost"}\n')
+                f.write('{"user_email": "BULK@example.com", "content": "Same"}\n')
+            call_command('import_posts', source, stdout=StringIO(), stderr=StringIO())
+            self.assertEqual(Post.objects.filter(user=user).count(), 2)
+            self.assertEqual(len(set(Post.objects.values_list('slug', flat=True))), 2)
+
+            out = StringIO()
+            call_command('export_posts', format='csv', stdout=out)
+            lines = out.getvalue().splitlines()
+            self.assertEqual(lines[0], 'id,user_email,slug,content,created_at,like_count,comment_count')
+            self.assertEqual(len(lines), 3)
+
+
+class FeedCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = CustomUser.objects.create_user(email='author@example.com')
+        self.reader = CustomUser.objects.create_user(email='reader@example.com')
+        self.post = Post.objects.create(user=self.author, content='Original text')
+
+    def cached_card(self, post):
+        return ''.join(cache.get(card_key(Post.objects.select_related('user').get(pk=post.pk))))
+
+    def test_whole_card_is_cached_and_refreshed_on_edit(self):
+        self.client.force_login(self.reader)
+        self.client.get(reverse('posts:post-list'))
+        card = self.cached_card(self.post)
+        self.assertIn('Original text', card)
+        self.assertIn('author@example.com', card)
+        self.assertIn(reverse('posts:post-detail', args=[self.post.slug]), card)
+
+        self.post.content = 'Edited text'
+        self.post.save()
+        response = self.client.get(reverse('posts:post-list'))
+        self.assertContains(response, 'Edited text')
+        self.assertNotContains(response, 'Original text')
+
+    def test_per_viewer_parts_are_not_cached(self):
+        Like.objects.create(user=self.reader, post=self.post)
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('posts:post-list'))
+        self.assertNotContains(response, reverse('posts:post-update', args=[self.post.slug]))
+        self.assertContains(response, 'bi-hand-thumbs-up-fill')
+        self.assertContains(response, f'<span data-live-likes="{self.post.pk}">1</span>')
+        self.assertNotIn('bi-hand-thumbs-up', self.cached_card(self.post))
+
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('posts:post-list'))
+        self.assertContains(response, reverse('posts:post-update', args=[self.post.slug]))
+        self.assertNotContains(response, 'bi-hand-thumbs-up-fill')
+
+    def test_cards_of_a_page_are_fetched_in_one_round_trip(self):
+        Post.objects.create(user=self.author, content='Second')
+        self.client.force_login(self.reader)
+        self.client.get(reverse('posts:post-list'))
+        with mock.patch('posts.templatetags.post_cards.cache') as card_cache:
+            card_cache.get_many.return_value = {}
+            self.client.get(reverse('posts:post-list'))
+        self.assertEqual(card_cache.get_many.call_count, 1)
+        self.assertEqual(card_cache.get.call_count, 0)
+
+
+def make_jpeg(width, height):
+    from PIL import Image
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'teal').save(buffer, 'JPEG')
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=tmp.name, TASKS_EAGER=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media_root = tmp.name
+        self.user = CustomUser.objects.create_user(email='photos@example.com')
+        self.client.force_login(self.user)
+
+    def test_upload_builds_derivatives_and_srcset(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('posts:post-create'), {'content': 'Photo', 'image': make_jpeg(800, 600)})
+        post = Post.objects.get()
+        # 1024 is wider than the original, so the full width is used instead.
+        self.assertEqual(sorted(post.image_variants, key=int), ['320', '640', '800'])
+        for names in post.image_variants.values():
+            for name in names.values():
+                self.assertTrue(os.path.exists(os.path.join(self.media_root, name)))
+
+        response = self.client.get(reverse('posts:post-list'))
+        self.assertContains(response, '<source type="image/webp" srcset=')
+        self.assertContains(response, 'w640.webp 640w')
+
+    def test_too_many_pixels_is_rejected(self):
+        with mock.patch('posts.images.MAX_PIXELS', 100):
+            form = PostForm(data={'content': 'Big'}, files={'image': make_jpeg(20, 20)})
+            self.assertFalse(form.is_valid())
+        self.assertIn('too many pixels', str(form.errors['image']))
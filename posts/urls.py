@@ -6,6 +6,10 @@ from .views import (
     PostDeleteView,
     PostUpdateView,
     PostCreateView,
+    like_batch,
+    live_counts,
+    post_comments,
+    post_feed_page,
     toggle_like
 )
 
@@ -14,11 +18,15 @@ app_name = 'posts'
 urlpatterns = [
     path('', PostListView.as_view(), name='post-list'),
     path('create/', PostCreateView.as_view(), name='post-create'),
+    path('feed/page/', post_feed_page, name='post-feed-page'),
+    path('feed/live/', live_counts, name='live-counts'),
 
     # ✅ 2. ADD THE NEW URL FOR LIKING POSTS
     path('like/<slug:slug>/', toggle_like, name='toggle-like'),
+    path('likes/batch/', like_batch, name='like-batch'),
 
     path('<str:slug>/', PostDetailSlugView.as_view(), name='post-detail'),
+    path('<str:slug>/comments/', post_comments, name='post-comments'),
     path('<str:slug>/edit/', PostUpdateView.as_view(), name='post-update'),
     path('<str:slug>/delete/', PostDeleteView.as_view(), name='post-delete'),
 ]
\ No newline at end of file
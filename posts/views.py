@@ -1,76 +1,225 @@
-from django.shortcuts import render, redirect, get_object_or_404
+import json
+
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.views.generic import ListView, DetailView, DeleteView, UpdateView, CreateView
-from django.http import Http404, JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.views import redirect_to_login
 from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.template.loader import render_to_string
 from django.urls import reverse_lazy
+from django.views.decorators.http import require_POST
+
+from Quiz4.db_router import replica_reads
 # ✅ 1. IMPORT THE NEW MODELS AND FORMS
-from .models import Post, Comment, Like
+from .models import Post, Like
 from .forms import PostForm, CommentForm
+from .comments import comment_data, comment_page, reply_page
+from .images import POST_IMAGE_WIDTHS, schedule_derivatives
+from .like_batch import apply_like_ops, like_count_buffer, parse_ops
+from .live import fetch_counts, watch
+from .likes import aliked_post_ids, liked_post_ids
+from .pagination import KeysetPaginator, InvalidCursor
 
 
 # ✅ 2. ADD THIS NEW VIEW TO HANDLE LIKES
-def toggle_like(request, slug):
-    if not request.user.is_authenticated:
+async def toggle_like(request, slug):
+    # Async, so a burst of like clicks does not tie up a worker thread each.
+    user = await request.auser()
+    if not user.is_authenticated:
         return JsonResponse({'error': 'Authentication required'}, status=401)
 
-    post = get_object_or_404(Post, slug=slug)
-    like, created = Like.objects.get_or_create(user=request.user, post=post)
-
+    post = await aget_object_or_404(Post.objects.only('pk'), slug=slug)
+    # get_or_create() and delete() each commit the Like together with the
+    # counter bump in posts/signals.py.
+    like, created = await Like.objects.aget_or_create(user=user, post=post)
     if not created:
-        like.delete()
-        liked = False
-    else:
-        liked = True
+        await like.adelete()
+
+    like_count = await Post.objects.filter(pk=post.pk).values_list('like_count', flat=True).aget()
+    return JsonResponse({'liked': created, 'like_count': like_count})
+
+
+@require_POST
+def like_batch(request):
+    """
+    Sets the liked state of many posts at once, see posts/like_batch.py.
+
+    Synchronous, unlike toggle_like, because the whole batch is one
+    transaction.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    try:
+        wanted = parse_ops(json.loads(request.body))
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
 
-    return JsonResponse({'liked': liked, 'like_count': post.like_count})
+    liked = apply_like_ops(request.user, wanted)
+    counts = Post.objects.filter(pk__in=liked).values_list('pk', 'like_count')
+    return JsonResponse({
+        'posts': {
+            # Includes this process's deltas that are not written yet.
+            str(pk): {'liked': liked[pk], 'like_count': like_count + like_count_buffer.pending(pk)}
+            for pk, like_count in counts
+        },
+    })
 
 
 class PostListView(LoginRequiredMixin, ListView):
     model = Post
     template_name = 'posts/post_list.html'
-    # Order posts by newest first
-    queryset = Post.objects.order_by('-created_at')
+    paginate_by = 20
+    replica_reads = True
+
+    def get_queryset(self):
+        return Post.objects.select_related('user')
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Invalid feed cursor.')
+        return paginator, page, page.object_list, page.has_next
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Get a set of post slugs that the current user has liked
-        liked_posts = Like.objects.filter(user=self.request.user).values_list('post__slug', flat=True)
-        context['liked_posts'] = set(liked_posts)
+        # Only look up the liked state of the posts on this page
+        post_ids = [post.pk for post in context['object_list']]
+        context['liked_post_ids'] = liked_post_ids(self.request.user, post_ids)
         return context
 
 
+@replica_reads
+async def post_feed_page(request):
+    """Renders just the cards of one feed page for infinite scroll."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    # The template reads request.user, which would otherwise load it again
+    # with a synchronous query.
+    request.user = user
+
+    paginator = KeysetPaginator(Post.objects.select_related('user'), PostListView.paginate_by)
+    try:
+        page = await paginator.apage(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404('Invalid feed cursor.')
+    context = {
+        'object_list': page.object_list,
+        'page_obj': page,
+        'liked_post_ids': await aliked_post_ids(user, [post.pk for post in page]),
+    }
+    return render(request, 'posts/post_feed_page.html', context)
+
+
+LIVE_MAX_POSTS = 50
+# Seconds between keep-alive comments on an idle stream, and before a
+# browser reconnects when the server cannot hold the stream open.
+LIVE_KEEPALIVE = 15
+
+
+def _sse(data, event='counts'):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+async def _live_stream(post_ids):
+    async with watch(post_ids) as watcher:
+        yield _sse(await fetch_counts(post_ids))
+        while True:
+            counts = await watcher.next_update(LIVE_KEEPALIVE)
+            yield _sse(counts) if counts else ': keep-alive\n\n'
+
+
+async def live_counts(request):
+    """
+    Streams the like and comment counts of ``?post=<id>&post=<id>...`` as
+    Server-Sent Events, see posts/live.py.
+    """
+    try:
+        post_ids = sorted({int(pk) for pk in request.GET.getlist('post')})
+    except ValueError:
+        return HttpResponseBadRequest('Invalid post id.')
+    if not post_ids or len(post_ids) > LIVE_MAX_POSTS:
+        return HttpResponseBadRequest(f'Give between 1 and {LIVE_MAX_POSTS} post ids.')
+
+    if not hasattr(request, 'scope'):
+        # Under WSGI a stream would hold a worker thread for as long as the
+        # page is open, so send the counts once and let the browser poll.
+        body = f'retry: {LIVE_KEEPALIVE * 1000}\n' + _sse(await fetch_counts(post_ids))
+        return HttpResponse(body, content_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+    return StreamingHttpResponse(
+        _live_stream(post_ids), content_type='text/event-stream',
+        # No proxy buffering, or events would arrive in bursts.
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
 # ✅ 3. UPDATE THIS VIEW TO HANDLE COMMENTS
 class PostDetailSlugView(DetailView):
     model = Post
     template_name = 'posts/post_detail.html'
 
+    def get_queryset(self):
+        return Post.objects.select_related('user')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        post = self.get_object()
-        context['comments'] = Comment.objects.filter(post=post).order_by('-created_at')
-        context['comment_form'] = CommentForm()
-        if self.request.user.is_authenticated:
-            context['user_has_liked'] = Like.objects.filter(post=post, user=self.request.user).exists()
+        post = self.object
+        try:
+            context['comments'] = comment_page(post, self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Invalid comment cursor.')
+        context.setdefault('comment_form', CommentForm(post=post))
+        context['user_has_liked'] = post.pk in liked_post_ids(self.request.user, [post.pk])
         return context
 
     def post(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
             return redirect('auth:signin')
 
-        post = self.get_object()
-        form = CommentForm(request.POST)
+        post = self.object = self.get_object()
+        form = CommentForm(request.POST, post=post)
         if form.is_valid():
             comment = form.save(commit=False)
             comment.post = post
             comment.user = request.user
-            comment.save()
+            with transaction.atomic():
+                comment.save()
             return redirect('posts:post-detail', slug=post.slug)
         else:
             # If the form is invalid, re-render the page with the form and its errors
-            context = self.get_context_data()
-            context['comment_form'] = form
-            return self.render_to_response(context)
+            return self.render_to_response(self.get_context_data(comment_form=form))
+
+
+@replica_reads
+def post_comments(request, slug):
+    """
+    Older comments of a post, or with ``?parent=<id>`` more replies in a
+    thread, as JSON with the rendered HTML for the detail page.
+    """
+    post = get_object_or_404(Post.objects.only('pk', 'slug'), slug=slug)
+    parent = request.GET.get('parent')
+    cursor = request.GET.get('cursor')
+    try:
+        if parent:
+            page = reply_page(post, int(parent), cursor)
+            template_name = 'posts/comment_replies.html'
+        else:
+            page = comment_page(post, cursor)
+            template_name = 'posts/comment_list.html'
+    except (InvalidCursor, ValueError):
+        raise Http404('Invalid comment cursor.')
+
+    context = {'object': post, 'comments': page, 'replies': page, 'parent_id': parent, 'next_cursor': page.next_cursor}
+    return JsonResponse({
+        'comments': [comment_data(comment) for comment in page],
+        'html': render_to_string(template_name, context, request=request),
+        'next_cursor': page.next_cursor,
+    })
 
 
 class PostDeleteView(LoginRequiredMixin, DeleteView):
@@ -96,6 +245,15 @@ class PostUpdateView(LoginRequiredMixin, UpdateView):
             raise PermissionDenied("You don't have permission to edit this post.")
         return obj
 
+    def form_valid(self, form):
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            form.instance.image_variants = {}
+        response = super().form_valid(form)
+        if image_changed:
+            schedule_derivatives(self.object, 'image', POST_IMAGE_WIDTHS)
+        return response
+
     def get_success_url(self):
         return reverse_lazy('posts:post-detail', kwargs={'slug': self.object.slug})
 
@@ -107,4 +265,6 @@ class PostCreateView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         form.instance.user = self.request.user
-        return super().form_valid(form)
\ No newline at end of file
+        response = super().form_valid(form)
+        schedule_derivatives(self.object, 'image', POST_IMAGE_WIDTHS)
+        return response
\ No newline at end of file
@@ -0,0 +1,49 @@
+// Keeps like and comment counts current. Elements marked with
+// data-live-likes="<post id>" or data-live-comments="<post id>" are
+// updated from the Server-Sent Events stream named by the page's
+// data-live-url attribute. Call liveCounts.refresh() after adding more
+// marked elements to the page.
+(function() {
+    const MAX_POSTS = 50;
+    let source = null;
+    let watched = '';
+
+    function postIds() {
+        const ids = new Set();
+        document.querySelectorAll('[data-live-likes], [data-live-comments]').forEach(function(el) {
+            ids.add(el.dataset.liveLikes || el.dataset.liveComments);
+        });
+        // The feed lists the newest posts first, and those are the ones most likely in view.
+        return Array.from(ids).slice(0, MAX_POSTS);
+    }
+
+    function update(event) {
+        const counts = JSON.parse(event.data);
+        Object.keys(counts).forEach(function(id) {
+            document.querySelectorAll(`[data-live-likes="${id}"]`).forEach(el => el.textContent = counts[id].likes);
+            document.querySelectorAll(`[data-live-comments="${id}"]`).forEach(el => el.textContent = counts[id].comments);
+        });
+    }
+
+    function refresh() {
+        const root = document.querySelector('[data-live-url]');
+        if (!root || !('EventSource' in window)) {
+            return;
+        }
+        const ids = postIds();
+        const key = ids.join(',');
+        if (!ids.length || key === watched) {
+            return;
+        }
+        if (source) {
+            source.close();
+        }
+        watched = key;
+        const query = ids.map(id => `post=${encodeURIComponent(id)}`).join('&');
+        source = new EventSource(`${root.dataset.liveUrl}?${query}`);
+        source.addEventListener('counts', update);
+    }
+
+    window.liveCounts = {refresh: refresh};
+    document.addEventListener('DOMContentLoaded', refresh);
+})();
@@ -0,0 +1,82 @@
+import multiprocessing
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from tasks.processes import process_main
+from tasks.queue import VISIBILITY_TIMEOUT, make_worker_id, queue_stats, work
+
+
+def _thread_main(worker_id, stop_event, burst, poll_interval, visibility_timeout):
+    try:
+        work(worker_id, stop_event, burst, poll_interval, visibility_timeout)
+    finally:
+        # Connections are per thread; don't leave this one behind.
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Runs a pool of workers that execute queued tasks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Run workers as processes instead of threads, for CPU-bound tasks.',
+        )
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty.')
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--visibility-timeout', type=int, default=VISIBILITY_TIMEOUT)
+
+    def handle(self, *args, workers, processes, burst, poll_interval, visibility_timeout, **options):
+        self.stdout.write(f'Starting {workers} {"process" if processes else "thread"} workers.')
+        if processes:
+            self.run_processes(workers, burst, poll_interval, visibility_timeout)
+        else:
+            self.run_threads(workers, burst, poll_interval, visibility_timeout)
+
+        stats = queue_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Workers stopped. Queue depth: {stats['depth']}, "
+            f"oldest ready task waited {stats['oldest_ready_age']:.1f}s."
+        ))
+
+    def run_threads(self, workers, burst, poll_interval, visibility_timeout):
+        stop_event = threading.Event()
+        threads = [
+            threading.Thread(
+                target=_thread_main, args=(make_worker_id(index), stop_event, burst, poll_interval, visibility_timeout),
+                daemon=True,
+            )
+            for index in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping after the current tasks...')
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+
+    def run_processes(self, workers, burst, poll_interval, visibility_timeout):
+        # Children must not share the parent's open connection.
+        connections.close_all()
+        children = [
+            multiprocessing.Process(target=process_main, args=(index, burst, poll_interval, visibility_timeout))
+            for index in range(workers)
+        ]
+        for child in children:
+            child.start()
+        try:
+            for child in children:
+                child.join()
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping workers...')
+            for child in children:
+                child.terminate()
+                child.join()
@@ -0,0 +1,24 @@
+"""
+Entry point of the worker processes started by ``run_workers --processes``.
+
+Under the spawn and forkserver start methods a child imports the module
+of its target afresh, before Django is set up. This module imports
+nothing that needs the app registry, and the target sets Django up before
+it loads the queue, the same as provision_users' ``initializer=django.setup``.
+"""
+import signal
+
+import django
+
+
+def process_main(index, burst, poll_interval, visibility_timeout):
+    django.setup()
+    from django.db import connection
+    from tasks.queue import make_worker_id, work
+
+    # The parent handles Ctrl+C and terminates its children.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        work(make_worker_id(index), None, burst, poll_interval, visibility_timeout)
+    finally:
+        connection.close()
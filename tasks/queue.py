@@ -0,0 +1,216 @@
+"""
+A small task queue stored in the project database.
+
+Views and signals call ``enqueue()``; the row is written in the caller's
+transaction, so a task never runs for data that was rolled back. Workers
+started by ``manage.py run_workers`` claim tasks with a conditional UPDATE
+and hold them for a visibility timeout; a worker that dies simply lets the
+lock expire and the task is picked up again. While a task runs, a
+heartbeat extends its lock every third of the timeout, so a task that
+outlives the timeout is not claimed a second time. Failed tasks are
+retried with exponential backoff until ``max_attempts`` is reached; a
+task whose lock expires on its last attempt is failed, not claimed again.
+
+Delivery is still at least once: a worker can die after a task's work
+is done but before it is recorded, or stall past the timeout. Tasks must
+be safe to run twice.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+VISIBILITY_TIMEOUT = getattr(settings, 'TASKS_VISIBILITY_TIMEOUT', 300)
+BACKOFF_BASE = getattr(settings, 'TASKS_BACKOFF_BASE', 10)
+BACKOFF_MAX = getattr(settings, 'TASKS_BACKOFF_MAX', 60 * 60)
+
+
+def task(func):
+    """Marks a module-level function as safe to run from the queue."""
+    func.task_name = f'{func.__module__}.{func.__qualname__}'
+    return func
+
+
+def _resolve(name):
+    func = import_string(name)
+    if getattr(func, 'task_name', None) != name:
+        raise ValueError(f'{name} is not a registered task.')
+    return func
+
+
+def enqueue(func, *args, delay=0, max_attempts=5, **kwargs):
+    """
+    Queues ``func(*args, **kwargs)``; arguments must be JSON serialisable.
+
+    With ``settings.TASKS_EAGER`` the task runs in-process as soon as the
+    current transaction commits instead, which is what the tests use.
+    """
+    name = func.task_name
+    if getattr(settings, 'TASKS_EAGER', False):
+        transaction.on_commit(lambda: func(*args, **kwargs))
+        return None
+    return Task.objects.create(
+        name=name, args=list(args), kwargs=kwargs, max_attempts=max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def _ready(now):
+    return (
+        Q(status=Task.QUEUED, run_after__lte=now) |
+        Q(status=Task.RUNNING, locked_until__lt=now, attempts__lt=F('max_attempts'))
+    )
+
+
+def fail_abandoned(now=None):
+    """
+    Fails tasks whose worker died on their last attempt.
+
+    An expired lock is otherwise taken as a retry; a task that keeps
+    killing its worker would be claimed forever.
+    """
+    now = now or timezone.now()
+    return Task.objects.filter(
+        status=Task.RUNNING, locked_until__lt=now, attempts__gte=F('max_attempts'),
+    ).update(
+        status=Task.FAILED, last_error='The worker stopped before the task finished.',
+        locked_until=None, finished_at=now,
+    )
+
+
+def claim_next(worker_id, visibility_timeout=VISIBILITY_TIMEOUT):
+    """Claims the oldest ready task for ``worker_id``, or returns None."""
+    now = timezone.now()
+    fail_abandoned(now)
+    candidates = Task.objects.filter(_ready(now)).order_by('run_after', 'pk').values_list('pk', flat=True)[:10]
+    for pk in candidates:
+        # Only one worker's UPDATE can still match the ready condition.
+        claimed = Task.objects.filter(_ready(now), pk=pk).update(
+            status=Task.RUNNING,
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=visibility_timeout),
+            attempts=F('attempts') + 1,
+            started_at=now,
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _beat(owned, visibility_timeout, stop_event):
+    try:
+        while not stop_event.wait(visibility_timeout / 3):
+            try:
+                if not owned.update(locked_until=timezone.now() + timedelta(seconds=visibility_timeout)):
+                    return  # Finished, or the lock was lost.
+            except Exception:
+                logger.exception('Could not extend the lock of a running task.')
+    finally:
+        connections.close_all()
+
+
+@contextmanager
+def heartbeat(owned, visibility_timeout):
+    """Keeps extending the lock of the ``owned`` task row while the block runs."""
+    stop_event = threading.Event()
+    thread = threading.Thread(target=_beat, args=(owned, visibility_timeout, stop_event), daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop_event.set()
+        thread.join()
+
+
+def execute(task_row, worker_id, visibility_timeout=VISIBILITY_TIMEOUT):
+    owned = Task.objects.filter(pk=task_row.pk, locked_by=worker_id, status=Task.RUNNING)
+    try:
+        with heartbeat(owned, visibility_timeout):
+            _resolve(task_row.name)(*task_row.args, **task_row.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Task %s #%s failed (attempt %s).', task_row.name, task_row.pk, task_row.attempts)
+        if task_row.attempts >= task_row.max_attempts:
+            owned.update(status=Task.FAILED, last_error=error, locked_until=None, finished_at=timezone.now())
+        else:
+            owned.update(
+                status=Task.QUEUED, last_error=error, locked_until=None,
+                run_after=timezone.now() + timedelta(seconds=backoff(task_row.attempts)),
+            )
+        return False
+    owned.update(status=Task.DONE, locked_until=None, finished_at=timezone.now())
+    return True
+
+
+def make_worker_id(index=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+def work(worker_id, stop_event=None, burst=False, poll_interval=1.0, visibility_timeout=VISIBILITY_TIMEOUT):
+    """
+    Runs tasks until ``stop_event`` is set, or the queue is empty if ``burst``.
+
+    Returns the number of tasks processed.
+    """
+    stop_event = stop_event or threading.Event()
+    processed = 0
+    while not stop_event.is_set():
+        if not connection.in_atomic_block:
+            # Recover from dropped connections like a request would.
+            close_old_connections()
+        task_row = claim_next(worker_id, visibility_timeout)
+        if task_row is None:
+            if burst:
+                break
+            stop_event.wait(poll_interval)
+            continue
+        execute(task_row, worker_id, visibility_timeout)
+        processed += 1
+    return processed
+
+
+def queue_stats():
+    """Queue depth by status, plus how long ready tasks have been waiting."""
+    now = timezone.now()
+    depth = {status: 0 for status, _ in Task.STATUS_CHOICES}
+    depth.update(Task.objects.order_by().values_list('status').annotate(total=Count('pk')))
+
+    oldest = (
+        Task.objects.filter(status=Task.QUEUED, run_after__lte=now)
+        .order_by('run_after').values_list('run_after', flat=True).first()
+    )
+    recent = Task.objects.filter(
+        status=Task.DONE, finished_at__gte=now - timedelta(hours=1),
+    ).order_by('-finished_at').values_list('run_after', 'started_at', 'finished_at')[:1000]
+    waits, runtimes = [], []
+    for run_after, started_at, finished_at in recent:
+        waits.append((started_at - run_after).total_seconds())
+        runtimes.append((finished_at - started_at).total_seconds())
+
+    return {
+        'depth': depth,
+        'oldest_ready_age': (now - oldest).total_seconds() if oldest else 0.0,
+        'avg_wait_last_hour': sum(waits) / len(waits) if waits else 0.0,
+        'avg_runtime_last_hour': sum(runtimes) / len(runtimes) if runtimes else 0.0,
+        'done_last_hour': len(waits),
+    }
+
@@ -0,0 +1,115 @@
+import time
+from datetime import timedelta
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .models import Task
+from .queue import claim_next, enqueue, execute, queue_stats, task, work
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task
+def explode():
+    raise RuntimeError('boom')
+
+
+@task
+def outlive_lock(seconds):
+    # Another worker looks for ready tasks after this one's lock would have expired.
+    time.sleep(seconds)
+    calls.append(claim_next('w2'))
+
+
+def not_a_task():
+    pass
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_work_in_burst_mode(self):
+        enqueue(record, 'a')
+        enqueue(record, 'b')
+        self.assertEqual(work('w1', burst=True), 2)
+        self.assertEqual(calls, ['a', 'b'])
+        self.assertEqual(Task.objects.filter(status=Task.DONE).count(), 2)
+
+    def test_delayed_task_waits(self):
+        enqueue(record, 'later', delay=60)
+        self.assertIsNone(claim_next('w1'))
+
+    def test_claimed_task_is_invisible_until_lock_expires(self):
+        enqueue(record, 'x')
+        claimed = claim_next('w1', visibility_timeout=30)
+        self.assertIsNotNone(claimed)
+        self.assertIsNone(claim_next('w2'))
+        Task.objects.filter(pk=claimed.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = claim_next('w2')
+        self.assertEqual((reclaimed.pk, reclaimed.attempts), (claimed.pk, 2))
+        # The first worker lost its lock, so its result is discarded.
+        execute(claimed, 'w1')
+        self.assertEqual(Task.objects.get(pk=claimed.pk).locked_by, 'w2')
+
+    def test_lock_expiring_on_last_attempt_fails_the_task(self):
+        row = enqueue(record, 'x', max_attempts=1)
+        claim_next('w1')
+        Task.objects.filter(pk=row.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(claim_next('w2'))
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts, row.locked_until), (Task.FAILED, 1, None))
+        self.assertIsNotNone(row.finished_at)
+        self.assertEqual(calls, [])
+
+    def test_failures_back_off_then_give_up(self):
+        row = enqueue(explode, max_attempts=2)
+        before = timezone.now()
+        self.assertFalse(execute(claim_next('w1'), 'w1'))
+        row.refresh_from_db()
+        self.assertEqual(row.status, Task.QUEUED)
+        self.assertGreater(row.run_after, before)
+        self.assertIn('boom', row.last_error)
+
+        Task.objects.filter(pk=row.pk).update(run_after=timezone.now())
+        execute(claim_next('w1'), 'w1')
+        row.refresh_from_db()
+        self.assertEqual(row.status, Task.FAILED)
+
+    def test_only_registered_tasks_run(self):
+        Task.objects.create(name=f'{__name__}.not_a_task', max_attempts=1)
+        work('w1', burst=True)
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode_runs_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue(record, 'now')
+        self.assertEqual(calls, ['now'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_stats(self):
+        enqueue(record, 'a')
+        enqueue(record, 'b', delay=60)
+        work('w1', burst=True)
+        stats = queue_stats()
+        self.assertEqual(stats['depth'], {'queued': 1, 'running': 0, 'done': 1, 'failed': 0})
+        self.assertEqual(stats['done_last_hour'], 1)
+
+
+class HeartbeatTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_long_task_keeps_its_lock(self):
+        row = enqueue(outlive_lock, 0.45)
+        self.assertEqual(work('w1', burst=True, visibility_timeout=0.3), 1)
+        self.assertEqual(calls, [None])
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), (Task.DONE, 1))